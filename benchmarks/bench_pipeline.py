@@ -0,0 +1,447 @@
+"""
+Load test for the whole voice pipeline and each service endpoint.
+
+Starts every service as a local uvicorn process: the real orchestrator and
+validator, plus the stand-ins from fakes.py for STT, LLM and TTS (or the real
+services with --real). It then drives each target at each concurrency level
+with a closed loop of workers and reports throughput, p50/p95/p99 latency and
+CPU / RSS of every service process while that target ran. Results go to a
+JSON file that compare.py can diff against an earlier run.
+
+Targets:
+    voice_flow   POST orchestrator /voice_flow (all services)
+    text_flow    POST orchestrator /text_flow (LLM, validator, TTS)
+    stt          POST /transcribe/raw
+    llm          POST /command
+    validator    POST /execute_command
+    tts          POST /speak
+
+Usage (from the repository root, with each service's requirements installed):
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --targets voice_flow --concurrency 1,8,32 --duration 30
+    python benchmarks/bench_pipeline.py --real stt --stt-latency-ms 0 --out results/whisper.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import wave
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import psutil  # type: ignore
+    _PROCESS_ERRORS = (OSError, psutil.Error)
+except ImportError:  # fall back to /proc (Linux only)
+    psutil = None
+    _PROCESS_ERRORS = (OSError, ValueError, IndexError)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+TARGETS = ["voice_flow", "text_flow", "stt", "llm", "validator", "tts"]
+# Services each target needs running
+TARGET_SERVICES = {
+    "voice_flow": ["stt", "llm", "validator", "tts", "orchestrator"],
+    "text_flow": ["llm", "validator", "tts", "orchestrator"],
+    "stt": ["stt"],
+    "llm": ["llm"],
+    "validator": ["validator"],
+    "tts": ["tts"],
+}
+
+
+# ---------- Services ----------
+
+class Service:
+    """One uvicorn process: how to start it and where it answers."""
+
+    def __init__(self, name: str, cwd: str, app: str, port: int, health_path: str, endpoint: str, env=None):
+        self.name = name
+        self.cwd = cwd
+        self.app = app
+        self.port = port
+        self.health_path = health_path
+        self.endpoint = endpoint
+        self.env = env or {}
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def url(self) -> str:
+        return self.base_url + self.endpoint
+
+    def start(self, log_dir: str) -> None:
+        env = {**os.environ, **self.env}
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.join(REPO_ROOT, "common"), env.get("PYTHONPATH")]))
+        log = open(os.path.join(log_dir, f"{self.name}.log"), "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=self.cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with code {self.process.returncode} (see its log)")
+            try:
+                if httpx.get(self.base_url + self.health_path, timeout=1.0).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"{self.name} not ready after {timeout:.0f}s")
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def build_services(args) -> Dict[str, Service]:
+    port = args.base_port
+    real = set(args.real)
+
+    def model_service(name, real_dir, real_app, fake_app, offset, health, endpoint, latency):
+        if name in real:
+            return Service(name, os.path.join(REPO_ROOT, real_dir), real_app, port + offset, health, endpoint)
+        env = {
+            "FAKE_LATENCY_MS": str(latency),
+            "FAKE_JITTER_MS": str(args.jitter_ms),
+            "FAKE_CONCURRENCY": str(args.model_concurrency),
+            "FAKE_STT_PARTIAL_MISMATCH": str(args.stt_partial_mismatch),
+        }
+        return Service(name, BENCH_DIR, fake_app, port + offset, health, endpoint, env)
+
+    services = {
+        "stt": model_service("stt", "stt-api", "api.main:app", "fakes:stt_app", 2, "/", "/transcribe/raw", args.stt_latency_ms),
+        "llm": model_service("llm", "llm-api", "api.main:app", "fakes:llm_app", 0, "/health", "/command", args.llm_latency_ms),
+        "tts": model_service("tts", "tts-api", "api.main:app", "fakes:tts_app", 3, "/health", "/speak", args.tts_latency_ms),
+        "validator": Service(
+            "validator", os.path.join(REPO_ROOT, "robot-validator-api"), "api.main:app", port + 1, "/", "/execute_command",
+            {"ROBOT_BACKEND": "stub"},
+        ),
+    }
+    services["orchestrator"] = Service(
+        "orchestrator", os.path.join(REPO_ROOT, "orchestrator-api"), "main:app", port + 4, "/", "/voice_flow",
+        {
+            "stt_url": services["stt"].url,
+            "llm_url": services["llm"].url,
+            "validator_url": services["validator"].url,
+            "tts_url": services["tts"].url,
+            "log_level": "WARNING",
+            "enable_metrics": "false",
+            "speculative_llm": str(args.speculative).lower(),
+        },
+    )
+    return services
+
+
+# ---------- Resource sampling ----------
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _cpu_rss(pid: int):
+    """(cpu seconds, rss bytes) of a process and its children."""
+    if psutil is not None:
+        proc = psutil.Process(pid)
+        cpu, rss = 0.0, 0
+        for p in [proc, *proc.children(recursive=True)]:
+            times = p.cpu_times()
+            cpu += times.user + times.system
+            rss += p.memory_info().rss
+        return cpu, rss
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    with open(f"/proc/{pid}/statm") as f:
+        rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+class ResourceSampler:
+    """Samples CPU time and RSS of each service process in a background thread."""
+
+    def __init__(self, services: List[Service], interval: float = 0.25):
+        self.services = services
+        self.interval = interval
+        self._stop = threading.Event()
+        self._start_cpu: Dict[str, float] = {}
+        self._rss_max: Dict[str, int] = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> Dict[str, tuple]:
+        samples = {}
+        for service in self.services:
+            try:
+                samples[service.name] = _cpu_rss(service.process.pid)
+            except _PROCESS_ERRORS:  # process gone
+                pass
+        return samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            for name, (_, rss) in self._sample().items():
+                self._rss_max[name] = max(self._rss_max.get(name, 0), rss)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        for name, (cpu, rss) in self._sample().items():
+            self._start_cpu[name] = cpu
+            self._rss_max[name] = rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self._t0
+        self.end = self._sample()
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for name, (cpu, rss) in self.end.items():
+            cpu_seconds = cpu - self._start_cpu.get(name, cpu)
+            out[name] = {
+                "cpu_seconds": round(cpu_seconds, 3),
+                "cpu_percent": round(100 * cpu_seconds / self.elapsed, 1) if self.elapsed else 0.0,
+                "rss_mb_max": round(max(self._rss_max.get(name, 0), rss) / 2**20, 1),
+            }
+        return out
+
+
+# ---------- Load generation ----------
+
+def speech_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """16 kHz mono PCM WAV of a voice-like tone, what the UI uploads."""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        value = 0.3 * math.sin(2 * math.pi * 140 * t) * (0.5 + 0.5 * math.sin(2 * math.pi * 3 * t))
+        frames += int(value * 32767).to_bytes(2, "little", signed=True)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+def request_factory(target: str, services: Dict[str, Service], audio: bytes):
+    """Returns ``send(client) -> awaitable response`` for one request of ``target``."""
+    if target == "voice_flow":
+        url = services["orchestrator"].url
+        return lambda client: client.post(url, files={"audio": ("bench.wav", audio, "audio/wav")})
+    if target == "text_flow":
+        url = services["orchestrator"].base_url + "/text_flow"
+        return lambda client: client.post(url, json={"text": "turn ninety degrees clockwise"})
+    if target == "stt":
+        url = services["stt"].url
+        return lambda client: client.post(url, content=audio, headers={"Content-Type": "audio/wav"})
+    if target == "llm":
+        url = services["llm"].url
+        return lambda client: client.post(url, json={"text": "turn ninety degrees clockwise"})
+    if target == "tts":
+        url = services["tts"].url
+        return lambda client: client.post(url, json={"text": "Rotating ninety degrees clockwise."})
+    url = services["validator"].url
+    counter = iter(range(10**9))
+    # Distinct angles so the validator's duplicate-command cache is not what gets measured
+    return lambda client: client.post(url, json={
+        "command": "rotate", "command_params": {"angle": next(counter) % 360, "direction": "clockwise"},
+    })
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (q in [0, 100]) of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    pos = (len(sorted_values) - 1) * q / 100
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+async def drive(send, concurrency: int, duration: float, max_requests: Optional[int], warmup: int, timeout: float):
+    """Closed loop: ``concurrency`` workers each send the next request as soon as the last one returns."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        for _ in range(warmup):
+            await send(client)
+
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        deadline = time.perf_counter() + duration
+        issued = 0
+
+        async def worker():
+            nonlocal issued
+            while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+                issued += 1
+                start = time.perf_counter()
+                try:
+                    resp = await send(client)
+                    ok, kind = resp.is_success, str(resp.status_code)
+                except httpx.HTTPError as e:
+                    ok, kind = False, type(e).__name__
+                if ok:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors[kind] = errors.get(kind, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+
+def run_target(target, concurrency, services, audio, args) -> dict:
+    running = [services[name] for name in TARGET_SERVICES[target]]
+    with ResourceSampler(running) as sampler:
+        latencies, errors, elapsed = asyncio.run(drive(
+            request_factory(target, services, audio), concurrency, args.duration, args.requests,
+            args.warmup, args.timeout,
+        ))
+    latencies.sort()
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(latencies) + sum(errors.values()),
+        "errors": errors,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "services": sampler.summary(),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def port_free(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) != 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma-separated subset of " + ", ".join(TARGETS))
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per (target, concurrency) run")
+    parser.add_argument("--requests", type=int, default=None, help="Stop each run after this many requests")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests before each run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--audio-seconds", type=float, default=3.0, help="Length of the uploaded utterance")
+    parser.add_argument("--real", default="", help="Comma-separated services to run for real instead of faked: stt,llm,tts")
+    parser.add_argument("--stt-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=400.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter of fake model latency")
+    parser.add_argument("--model-concurrency", type=int, default=1, help="Requests each fake model serves at once")
+    parser.add_argument("--speculative", action="store_true", help="Start the LLM on STT's partial transcript (speculative_llm)")
+    parser.add_argument("--stt-partial-mismatch", type=float, default=0.0,
+                        help="Share of fake STT partials that differ from the final transcript")
+    parser.add_argument("--base-port", type=int, default=18000)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--out", default=None, help="Write results JSON here (default: benchmarks/results/<time>.json)")
+    args = parser.parse_args()
+
+    targets = [t for t in args.targets.split(",") if t]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {sorted(unknown)}")
+    args.real = [s for s in args.real.split(",") if s]
+    if set(args.real) - {"stt", "llm", "tts"}:
+        parser.error("--real accepts stt, llm and tts")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    services = build_services(args)
+    needed = [services[name] for name in dict.fromkeys(s for t in targets for s in TARGET_SERVICES[t])]
+    busy = [s.port for s in needed if not port_free(s.port)]
+    if busy:
+        sys.exit(f"ports already in use: {busy} (try --base-port)")
+
+    log_dir = os.path.join(BENCH_DIR, "results", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    results = []
+    try:
+        for service in needed:
+            service.start(log_dir)
+        for service in needed:
+            service.wait_ready(args.startup_timeout)
+
+        audio = speech_wav(args.audio_seconds)
+        for target in targets:
+            for concurrency in levels:
+                result = run_target(target, concurrency, services, audio, args)
+                results.append(result)
+                lat = result["latency_ms"]
+                print(
+                    f"{target:<11} c={concurrency:<3} {result['throughput_rps']:>8.2f} req/s  "
+                    f"p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']} ms  "
+                    f"errors {sum(result['errors'].values())}",
+                    flush=True,
+                )
+    finally:
+        for service in needed:
+            service.stop()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "duration_sec": args.duration,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "audio_seconds": args.audio_seconds,
+                "real": args.real,
+                "fake_latency_ms": {"stt": args.stt_latency_ms, "llm": args.llm_latency_ms, "tts": args.tts_latency_ms},
+                "jitter_ms": args.jitter_ms,
+                "model_concurrency": args.model_concurrency,
+                "speculative": args.speculative,
+                "stt_partial_mismatch": args.stt_partial_mismatch,
+            },
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
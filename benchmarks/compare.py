@@ -0,0 +1,86 @@
+"""
+Compare two bench_pipeline.py result files and flag regressions.
+
+Runs are matched on (target, concurrency). A row regresses when a latency
+percentile grows, or throughput drops, by more than --threshold (relative).
+Exits with status 1 if anything regressed, so it can gate CI.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+    python benchmarks/compare.py before.json after.json --threshold 0.05 --json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# (metric, higher_is_better)
+METRICS = [
+    ("p50", False),
+    ("p95", False),
+    ("p99", False),
+    ("throughput_rps", True),
+]
+
+
+def load(path: str) -> Dict[Tuple[str, int], dict]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["target"], r["concurrency"]): r for r in report["results"]}
+
+
+def metric(result: dict, name: str) -> Optional[float]:
+    if name == "throughput_rps":
+        return result.get("throughput_rps")
+    return result.get("latency_ms", {}).get(name)
+
+
+def compare(before: Dict, after: Dict, threshold: float) -> List[dict]:
+    rows = []
+    for key in sorted(set(before) & set(after)):
+        for name, higher_is_better in METRICS:
+            old, new = metric(before[key], name), metric(after[key], name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = -change > threshold if higher_is_better else change > threshold
+            rows.append({
+                "target": key[0],
+                "concurrency": key[1],
+                "metric": name,
+                "before": old,
+                "after": new,
+                "change": round(change, 4),
+                "regressed": regressed,
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change that counts as a regression")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    rows = compare(before, after, args.threshold)
+    for key in sorted(set(before) ^ set(after)):
+        print(f"only in {'before' if key in before else 'after'}: {key[0]} c={key[1]}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{'target':<11} {'conc':>4} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}")
+        for r in rows:
+            flag = "  REGRESSION" if r["regressed"] else ""
+            print(
+                f"{r['target']:<11} {r['concurrency']:>4} {r['metric']:<15} "
+                f"{r['before']:>10.2f} {r['after']:>10.2f} {r['change']:>+8.1%}{flag}"
+            )
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Stand-in STT, LLM and TTS services for pipeline benchmarks.
+
+Each app speaks the same HTTP contract as the real service (paths, request
+and response shapes, X-Correlation-ID and Server-Timing headers) but replaces
+the model with a configurable delay, so the orchestrator, the validator and
+the network path can be load-tested without GPUs or model downloads.
+
+Configuration (environment, per process):
+
+- ``FAKE_LATENCY_MS``: mean model time per request (default 50)
+- ``FAKE_JITTER_MS``: uniform +/- jitter around the mean (default 0)
+- ``FAKE_CONCURRENCY``: requests the "model" serves at once (default 1, like a
+  single loaded model; further requests queue by X-Priority and X-Client-ID,
+  as in the real LLM and TTS services)
+- ``FAKE_TTS_SAMPLE_RATE``: sample rate of the generated speech (default 22050)
+- ``FAKE_STT_PARTIAL_AT``: with ``Accept: application/x-ndjson``, STT sends its
+  partial transcript after this fraction of the model time (default 0.3)
+- ``FAKE_STT_PARTIAL_MISMATCH``: probability that the partial differs from the
+  final transcript, i.e. that a speculative LLM call is wasted (default 0)
+
+A caller that disconnects while queued or "computing" frees the model at once,
+as in the real LLM service.
+
+Run one with uvicorn from this directory, e.g. ``uvicorn fakes:stt_app``;
+bench_pipeline.py does this for you.
+"""
+import asyncio
+import base64
+import io
+import itertools
+import json
+import os
+import random
+import time
+import wave
+
+from fastapi import FastAPI, File, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+
+from shato_common import ClientDisconnected, CorrelationMiddleware, PriorityGate, cancel_on_disconnect, get_correlation_id
+from shato_common.priority import from_headers as priority_from_headers
+
+LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "50"))
+JITTER_MS = float(os.getenv("FAKE_JITTER_MS", "0"))
+CONCURRENCY = int(os.getenv("FAKE_CONCURRENCY", "1"))
+TTS_SAMPLE_RATE = int(os.getenv("FAKE_TTS_SAMPLE_RATE", "22050"))
+STT_PARTIAL_AT = float(os.getenv("FAKE_STT_PARTIAL_AT", "0.3"))
+STT_PARTIAL_MISMATCH = float(os.getenv("FAKE_STT_PARTIAL_MISMATCH", "0"))
+
+# Roughly 15 characters of text per second of speech
+TTS_SECONDS_PER_CHAR = 0.066
+
+
+def _server_timing(app: FastAPI) -> None:
+    @app.middleware("http")
+    async def server_timing_middleware(request: Request, call_next):
+        start = request.state.start = time.perf_counter()
+        response = await call_next(request)
+        entries = [f"app;dur={(time.perf_counter() - start) * 1000:.1f}"]
+        compute_ms = getattr(request.state, "compute_ms", None)
+        if compute_ms is not None:
+            entries.append(f"compute;dur={compute_ms:.1f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    app.add_middleware(CorrelationMiddleware)
+
+
+class FakeModel:
+    """A model that takes FAKE_LATENCY_MS per call and serves FAKE_CONCURRENCY calls at once."""
+
+    def __init__(self, name: str):
+        self.gate = PriorityGate(name, CONCURRENCY)
+
+    @staticmethod
+    def delay_ms() -> float:
+        return max(LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS), 0.0)
+
+    async def _compute(self, request: Request) -> None:
+        async with self.gate.slot(*priority_from_headers(request.headers)):
+            delay_ms = self.delay_ms()
+            await asyncio.sleep(delay_ms / 1000)
+            request.state.compute_ms = delay_ms
+
+    async def run(self, request: Request) -> None:
+        """Raises ClientDisconnected if the caller goes away first (its slot or queue place is freed)."""
+        await cancel_on_disconnect(request.receive, self._compute(request))
+
+
+def _wav_silence(seconds: float, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buf.getvalue()
+
+
+# ---------- STT ----------
+
+stt_app = FastAPI(title="fake_stt")
+_server_timing(stt_app)
+_stt_model = FakeModel("stt")
+STT_TEXT = "turn ninety degrees clockwise"
+STT_PARTIAL_MISHEARD = "turn nineteen degrees clockwise"
+
+
+@stt_app.get("/")
+async def stt_health():
+    return {"message": "server is running"}
+
+
+@stt_app.post("/transcribe")
+async def transcribe(request: Request, audio: UploadFile = File(...)):
+    await audio.read()
+    await _stt_model.run(request)
+    return {"id_correlation": get_correlation_id(), "text": STT_TEXT}
+
+
+@stt_app.post("/transcribe/raw")
+async def transcribe_raw(request: Request):
+    async for _ in request.stream():
+        pass
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_stt_events(request), media_type="application/x-ndjson")
+    await _stt_model.run(request)
+    return {"id_correlation": get_correlation_id(), "text": STT_TEXT}
+
+
+async def _stt_events(request: Request):
+    """Partial transcript part way through the model time, then the final one."""
+    async with _stt_model.gate.slot(*priority_from_headers(request.headers)):
+        delay_ms = _stt_model.delay_ms()
+        await asyncio.sleep(delay_ms * STT_PARTIAL_AT / 1000)
+        partial = STT_PARTIAL_MISHEARD if random.random() < STT_PARTIAL_MISMATCH else STT_TEXT
+        yield json.dumps({"type": "partial", "text": partial, "confidence": 0.9}).encode() + b"\n"
+        await asyncio.sleep(delay_ms * (1 - STT_PARTIAL_AT) / 1000)
+    # Like the real STT: the stream's headers are already sent, so the timing rides on the final event
+    app_ms = (time.perf_counter() - request.state.start) * 1000
+    final = {"type": "final", "id_correlation": get_correlation_id(), "text": STT_TEXT, "confidence": 0.95,
+             "server_timing": f"app;dur={app_ms:.1f}, compute;dur={delay_ms:.1f}"}
+    yield json.dumps(final).encode() + b"\n"
+
+
+# ---------- LLM ----------
+
+llm_app = FastAPI(title="fake_llm")
+_server_timing(llm_app)
+_llm_model = FakeModel("llm")
+# Vary the angle so the validator's duplicate-command cache does not short-circuit the run
+_angles = itertools.cycle(range(5, 360, 7))
+
+
+@llm_app.get("/health")
+async def llm_health():
+    return {"message": "Service is healthy", "correlation_id": get_correlation_id()}
+
+
+@llm_app.get("/ready")
+async def llm_ready():
+    return {"status": "ready", "load_ms": 0.0}
+
+
+@llm_app.get("/queue")
+async def llm_queue():
+    return _llm_model.gate.snapshot()
+
+
+@llm_app.post("/command")
+async def command(request: Request):
+    body = await request.json()
+    try:
+        await _llm_model.run(request)
+    except ClientDisconnected:
+        return Response(status_code=499)
+    angle = float(next(_angles))
+    return {
+        "command": "rotate",
+        "command_params": {"angle": angle, "direction": "clockwise"},
+        "verbal_response": f"Rotating {angle:.0f} degrees clockwise.",
+        "correlation_id": body.get("correlation_id") or get_correlation_id(),
+    }
+
+
+# ---------- TTS ----------
+
+tts_app = FastAPI(title="fake_tts")
+_server_timing(tts_app)
+_tts_model = FakeModel("tts")
+
+
+@tts_app.get("/health")
+async def tts_health():
+    return {"status": "healthy", "model_loaded": True}
+
+
+@tts_app.post("/speak")
+async def speak(request: Request):
+    body = await request.json()
+    await _tts_model.run(request)
+    duration = round(len(body.get("text", "")) * TTS_SECONDS_PER_CHAR, 3)
+    audio = _wav_silence(duration, TTS_SAMPLE_RATE)
+    return {
+        "correlation_id": get_correlation_id(),
+        "audio_base64": base64.b64encode(audio).decode(),
+        "model": "fake",
+        "format": "wav",
+        "media_type": "audio/wav",
+        "sample_rate": TTS_SAMPLE_RATE,
+        "duration_sec": duration,
+        "estimated_duration_sec": duration,
+    }
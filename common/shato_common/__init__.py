@@ -0,0 +1,52 @@
+"""Code shared by the SHATO services."""
+from .correlation import (
+    CORRELATION_HEADER,
+    TRACEPARENT_HEADER,
+    Correlation,
+    CorrelationIdFilter,
+    CorrelationMiddleware,
+    add_correlation_id,
+    bind,
+    bind_child,
+    current,
+    get_correlation_id,
+    outgoing_headers,
+)
+from .priority import (
+    CLIENT_ID_HEADER,
+    PRIORITIES,
+    PRIORITY_HEADER,
+    ClientDisconnected,
+    PriorityGate,
+    bind_priority,
+    cancel_on_disconnect,
+    current_priority,
+    escalate,
+    parse_priority,
+    priority_headers,
+)
+
+__all__ = [
+    "CORRELATION_HEADER",
+    "TRACEPARENT_HEADER",
+    "Correlation",
+    "CorrelationIdFilter",
+    "CorrelationMiddleware",
+    "add_correlation_id",
+    "bind",
+    "bind_child",
+    "current",
+    "get_correlation_id",
+    "outgoing_headers",
+    "CLIENT_ID_HEADER",
+    "PRIORITIES",
+    "PRIORITY_HEADER",
+    "ClientDisconnected",
+    "PriorityGate",
+    "bind_priority",
+    "cancel_on_disconnect",
+    "current_priority",
+    "escalate",
+    "parse_priority",
+    "priority_headers",
+]
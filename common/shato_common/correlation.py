@@ -0,0 +1,176 @@
+# shato_common/correlation.py
+"""
+Correlation ID and trace context propagation shared by every SHATO service.
+
+One pure-ASGI middleware reads ``X-Correlation-ID`` and W3C ``traceparent``
+from the incoming request, binds them to a single contextvar for the
+lifetime of the request and echoes the correlation ID on the response.
+Downstream calls copy the context with :func:`outgoing_headers`, so one ID
+follows a voice turn from the UI through STT, LLM, validator and TTS.
+
+Per-request cost is kept small:
+
+- IDs are generated only when the caller did not send one, from a single
+  ``os.urandom`` draw (the trace ID doubles as the correlation ID);
+- no BaseHTTPMiddleware (no extra task, no request/response wrappers);
+- log records get the ID through :class:`CorrelationIdFilter` or
+  :func:`add_correlation_id`, so nothing is formatted unless a record is
+  actually emitted.
+"""
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, NamedTuple, Optional
+
+CORRELATION_HEADER = "X-Correlation-ID"
+TRACEPARENT_HEADER = "traceparent"
+
+# Longer or non-printable incoming IDs are replaced rather than logged verbatim
+MAX_CORRELATION_ID_LENGTH = 128
+
+_HEX = frozenset("0123456789abcdef")
+
+
+class Correlation(NamedTuple):
+    correlation_id: str
+    trace_id: str   # 32 hex chars, shared by every hop of the request
+    span_id: str    # 16 hex chars, this service's hop
+    flags: str = "01"
+
+    @property
+    def traceparent(self) -> str:
+        """``traceparent`` for calls made from this hop (our span becomes the parent)."""
+        return f"00-{self.trace_id}-{self.span_id}-{self.flags}"
+
+
+_current: ContextVar[Optional[Correlation]] = ContextVar("shato_correlation", default=None)
+
+
+def _is_hex(value: str, length: int) -> bool:
+    return len(value) == length and _HEX.issuperset(value) and value != "0" * length
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """``"00-<trace_id>-<parent_id>-<flags>"`` -> (trace_id, flags), or None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, parent_id, flags = parts[1], parts[2], parts[3]
+    if not (_is_hex(trace_id, 32) and _is_hex(parent_id, 16) and len(flags) == 2):
+        return None
+    return trace_id, flags
+
+
+def from_headers(correlation_id: Optional[str] = None, traceparent: Optional[str] = None) -> Correlation:
+    """Build the context for one request, generating only what the caller did not send."""
+    parsed = parse_traceparent(traceparent)
+    if parsed is not None:
+        trace_id, flags = parsed
+        span_id = os.urandom(8).hex()
+    else:
+        random = os.urandom(24).hex()
+        trace_id, span_id, flags = random[:32], random[32:], "01"
+    if not correlation_id or len(correlation_id) > MAX_CORRELATION_ID_LENGTH or not correlation_id.isprintable():
+        correlation_id = trace_id
+    return Correlation(correlation_id, trace_id, span_id, flags)
+
+
+def bind(correlation_id: Optional[str] = None, traceparent: Optional[str] = None) -> Correlation:
+    """Bind a context for code running outside the middleware (background jobs, the UI)."""
+    ctx = from_headers(correlation_id, traceparent)
+    _current.set(ctx)
+    return ctx
+
+
+def bind_child(suffix: str) -> Correlation:
+    """
+    Bind ``<current id>.<suffix>`` in the same trace, for fan-out work (e.g. batch
+    items) that needs distinct IDs downstream. Call it inside the child task so
+    the parent's context is left untouched.
+    """
+    parent = _current.get() or from_headers()
+    ctx = Correlation(f"{parent.correlation_id}.{suffix}", parent.trace_id, os.urandom(8).hex(), parent.flags)
+    _current.set(ctx)
+    return ctx
+
+
+def current() -> Optional[Correlation]:
+    return _current.get()
+
+
+def get_correlation_id() -> str:
+    """Correlation ID of the current request, or ``""`` outside of one."""
+    ctx = _current.get()
+    return ctx.correlation_id if ctx is not None else ""
+
+
+def outgoing_headers(header: str = CORRELATION_HEADER) -> Dict[str, str]:
+    """Headers for a downstream call; outside a request a fresh context is started."""
+    ctx = _current.get() or bind()
+    return {header: ctx.correlation_id, TRACEPARENT_HEADER: ctx.traceparent}
+
+
+class CorrelationMiddleware:
+    """
+    Pure ASGI middleware binding :class:`Correlation` for each HTTP request.
+
+    Add it last (``app.add_middleware`` after any ``@app.middleware``) so it
+    wraps the other middlewares and they log with the ID already bound.
+    The ID is also exposed as ``request.state.correlation_id``.
+    """
+
+    def __init__(self, app, header: str = CORRELATION_HEADER):
+        self.app = app
+        self.header = header
+        self._header_key = header.lower().encode("latin-1")
+        self._response_header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        correlation_id = traceparent = None
+        for name, value in scope["headers"]:
+            if name == self._header_key:
+                correlation_id = value.decode("latin-1")
+            elif name == b"traceparent":
+                traceparent = value.decode("latin-1")
+
+        ctx = from_headers(correlation_id, traceparent)
+        scope.setdefault("state", {})["correlation_id"] = ctx.correlation_id
+        response_header = (self._response_header, ctx.correlation_id.encode("latin-1"))
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), response_header]
+            await send(message)
+
+        token = _current.set(ctx)
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current.reset(token)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Stamp ``record.correlation_id`` for ``%(correlation_id)s`` in log formats.
+    Attach it to handlers on the emitting thread (e.g. a QueueHandler).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _current.get()
+        record.correlation_id = ctx.correlation_id if ctx is not None else "-"
+        return True
+
+
+def add_correlation_id(logger: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """structlog processor adding ``correlation_id`` (and ``trace_id``) from the bound context."""
+    ctx = _current.get()
+    if ctx is not None:
+        event_dict.setdefault("correlation_id", ctx.correlation_id)
+        event_dict.setdefault("trace_id", ctx.trace_id)
+    return event_dict
@@ -0,0 +1,270 @@
+# shato_common/priority.py
+"""
+Priority classes and per-client fairness for model worker queues.
+
+The orchestrator tags each downstream call with ``X-Priority`` (critical,
+high, normal, low) and ``X-Client-ID``. Services that serialize access to a
+model (LLM, TTS) admit requests through a :class:`PriorityGate`:
+
+- a free slot is taken immediately;
+- otherwise the request waits, and a released slot goes to the highest
+  class with waiters;
+- within a class, clients take turns (round robin over per-client FIFOs), so
+  one client flooding the queue delays only its own requests.
+
+Queue wait is recorded per class: :meth:`PriorityGate.snapshot` for a
+``/queue`` endpoint, plus a Prometheus histogram when prometheus_client is
+installed.
+
+A caller that gives up (the orchestrator dropping a speculative call) closes
+its connection; :func:`cancel_on_disconnect` turns that into cancellation of
+the request's work, so a queued request leaves the queue instead of holding a
+place in it.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+try:
+    from prometheus_client import Histogram  # type: ignore
+except ImportError:
+    Histogram = None
+
+PRIORITY_HEADER = "X-Priority"
+CLIENT_ID_HEADER = "X-Client-ID"
+
+# Most urgent first; the index is the scheduling rank
+PRIORITIES = ("critical", "high", "normal", "low")
+CRITICAL, HIGH, NORMAL, LOW = PRIORITIES
+_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+
+# Client IDs end up in logs and as queue keys; cap what a caller can send
+MAX_CLIENT_ID_LENGTH = 64
+
+if Histogram is not None:
+    QUEUE_WAIT_SECONDS = Histogram(
+        "shato_queue_wait_seconds",
+        "Time a request waited for a model worker, by priority class",
+        ["queue", "priority"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+    )
+else:
+    QUEUE_WAIT_SECONDS = None
+
+
+def parse_priority(value: Optional[str], default: str = NORMAL) -> str:
+    """Header value (name or rank 0-3, any case) -> priority name; missing or unknown -> ``default``."""
+    if not value:
+        return default
+    value = value.strip().lower()
+    if value.isdigit() and int(value) < len(PRIORITIES):
+        return PRIORITIES[int(value)]
+    return value if value in _RANK else default
+
+
+def parse_client_id(value: Optional[str], default: str = "anonymous") -> str:
+    if not value or len(value) > MAX_CLIENT_ID_LENGTH or not value.isprintable():
+        return default
+    return value
+
+
+def from_headers(headers: Mapping[str, str], default_client: str = "anonymous",
+                 default_priority: str = NORMAL) -> Tuple[str, str]:
+    """(priority, client_id) from request headers."""
+    return (
+        parse_priority(headers.get(PRIORITY_HEADER), default_priority),
+        parse_client_id(headers.get(CLIENT_ID_HEADER), default_client),
+    )
+
+
+def more_urgent(a: str, b: str) -> str:
+    return a if _RANK[a] <= _RANK[b] else b
+
+
+def cap_priority(priority: str, ceiling: str) -> str:
+    """``priority``, but never more urgent than ``ceiling``."""
+    return ceiling if _RANK[priority] < _RANK[ceiling] else priority
+
+
+# ---------- Propagation (orchestrator side) ----------
+
+_current: ContextVar[Tuple[str, str]] = ContextVar("shato_priority", default=(NORMAL, "anonymous"))
+
+
+def bind_priority(priority: str = NORMAL, client_id: str = "anonymous") -> None:
+    _current.set((priority, client_id))
+
+
+def escalate(priority: str) -> str:
+    """Raise the bound priority to at least ``priority`` (never lowers it); returns the result."""
+    current, client_id = _current.get()
+    priority = more_urgent(current, priority)
+    _current.set((priority, client_id))
+    return priority
+
+
+def current_priority() -> Tuple[str, str]:
+    return _current.get()
+
+
+def priority_headers() -> Dict[str, str]:
+    priority, client_id = _current.get()
+    return {PRIORITY_HEADER: priority, CLIENT_ID_HEADER: client_id}
+
+
+# ---------- Scheduling (service side) ----------
+
+class _WaitStats:
+    """Queue wait of the last ``window`` admissions of one class."""
+
+    def __init__(self, window: int = 512):
+        self.admitted = 0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.admitted += 1
+        self.samples.append(seconds)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def ms(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+        return {"admitted": self.admitted, "wait_p50_ms": ms(0.5), "wait_p95_ms": ms(0.95), "wait_max_ms": ms(1.0)}
+
+
+class PriorityGate:
+    """
+    At most ``slots`` holders at a time; waiters are admitted by priority class,
+    then round robin across clients, then FIFO per client.
+
+    Usage::
+
+        async with gate.slot(priority, client_id) as waited_sec:
+            result = await asyncio.to_thread(run_model, ...)
+    """
+
+    def __init__(self, name: str, slots: int = 1):
+        self.name = name
+        self.slots = max(1, slots)
+        self._busy = 0
+        self._waiting = 0
+        self.cancelled = 0  # waiters that gave up before being admitted
+        # rank -> client_id -> FIFO of futures; the OrderedDict order is the client rotation
+        self._queues: List[OrderedDict] = [OrderedDict() for _ in PRIORITIES]
+        self._stats = {priority: _WaitStats() for priority in PRIORITIES}
+
+    @asynccontextmanager
+    async def slot(self, priority: str = NORMAL, client_id: str = "anonymous") -> AsyncIterator[float]:
+        priority = priority if priority in _RANK else NORMAL
+        start = time.perf_counter()
+        await self._acquire(_RANK[priority], client_id)
+        waited = time.perf_counter() - start
+        self._stats[priority].record(waited)
+        if QUEUE_WAIT_SECONDS is not None:
+            QUEUE_WAIT_SECONDS.labels(queue=self.name, priority=priority).observe(waited)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    async def _acquire(self, rank: int, client_id: str) -> None:
+        if self._busy < self.slots and not self._waiting:
+            self._busy += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queues[rank].setdefault(client_id, deque()).append(future)
+        self._waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self._release()
+            else:
+                self._discard(rank, client_id, future)
+            raise
+
+    def _discard(self, rank: int, client_id: str, future: asyncio.Future) -> None:
+        clients = self._queues[rank]
+        fifo = clients.get(client_id)
+        if fifo is not None and future in fifo:
+            fifo.remove(future)
+            self._waiting -= 1
+            self.cancelled += 1
+            if not fifo:
+                del clients[client_id]
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next waiter, so nobody can jump the queue
+        for clients in self._queues:
+            while clients:
+                client_id, fifo = next(iter(clients.items()))
+                future = fifo.popleft()
+                self._waiting -= 1
+                if fifo:
+                    clients.move_to_end(client_id)
+                else:
+                    del clients[client_id]
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self._busy -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "slots": self.slots,
+            "busy": self._busy,
+            "waiting": {
+                priority: sum(len(fifo) for fifo in self._queues[rank].values())
+                for rank, priority in enumerate(PRIORITIES)
+            },
+            "cancelled": self.cancelled,
+            "classes": {priority: stats.snapshot() for priority, stats in self._stats.items()},
+        }
+
+
+# ---------- Cancellation (service side) ----------
+
+class ClientDisconnected(Exception):
+    """The caller closed the connection before the answer was ready."""
+
+
+async def cancel_on_disconnect(receive: Callable[[], Awaitable[Dict[str, Any]]], work: Awaitable) -> Any:
+    """
+    Await ``work`` (a coroutine or future) unless the client disconnects
+    first: then ``work`` is cancelled and :class:`ClientDisconnected` raised.
+    ``receive`` is the request's ASGI receive (``request.receive``); call this
+    once the body has been read.
+
+    Cancelling only stops what ``work`` awaits. Work handed to a thread must
+    notice the cancellation itself (e.g. a stop flag the model checks per token).
+    """
+    task = asyncio.ensure_future(work)
+
+    async def disconnected() -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        raise ClientDisconnected()
+    return task.result()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+
+# Ensure shato_common is importable when running tests without installing the package
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
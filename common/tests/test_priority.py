@@ -0,0 +1,231 @@
+import asyncio
+
+import pytest
+
+from shato_common.priority import (
+    ClientDisconnected,
+    PriorityGate,
+    cancel_on_disconnect,
+    cap_priority,
+    from_headers,
+    parse_client_id,
+    parse_priority,
+)
+
+
+async def _settle():
+    """Let every ready task run until it blocks again."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def _hold(gate, order, name, priority="normal", client_id="anonymous", release=None):
+    async with gate.slot(priority, client_id):
+        order.append(name)
+        if release is not None:
+            await release.wait()
+
+
+def test_parse_priority_accepts_names_and_ranks():
+    assert parse_priority("HIGH") == "high"
+    assert parse_priority("0") == "critical"
+    assert parse_priority("9") == "normal"
+    assert parse_priority("urgent", default="low") == "low"
+    assert parse_priority(None) == "normal"
+
+
+def test_parse_client_id_rejects_unusable_values():
+    assert parse_client_id("ui-1") == "ui-1"
+    assert parse_client_id("x" * 65) == "anonymous"
+    assert parse_client_id("bad\nid") == "anonymous"
+    assert from_headers({"X-Priority": "low", "X-Client-ID": "ui"}) == ("low", "ui")
+
+
+def test_cap_priority_never_raises_above_ceiling():
+    assert cap_priority("critical", "high") == "high"
+    assert cap_priority("low", "high") == "low"
+
+
+@pytest.mark.asyncio
+async def test_free_slot_is_taken_immediately():
+    gate = PriorityGate("test", slots=2)
+    async with gate.slot() as waited:
+        async with gate.slot():
+            assert gate.snapshot()["busy"] == 2
+    assert waited < 0.1
+    assert gate.snapshot()["busy"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority_class():
+    gate = PriorityGate("test")
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.create_task(_hold(gate, order, "holder", release=release))
+    await _settle()
+    waiters = [
+        asyncio.create_task(_hold(gate, order, name, priority))
+        for name, priority in [("low", "low"), ("normal", "normal"), ("critical", "critical"), ("high", "high")]
+    ]
+    await _settle()
+    assert gate.snapshot()["waiting"] == {"critical": 1, "high": 1, "normal": 1, "low": 1}
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["holder", "critical", "high", "normal", "low"]
+    assert gate.snapshot()["busy"] == 0
+
+
+@pytest.mark.asyncio
+async def test_clients_take_turns_within_a_class():
+    gate = PriorityGate("test")
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.create_task(_hold(gate, order, "holder", release=release))
+    await _settle()
+    waiters = [
+        asyncio.create_task(_hold(gate, order, name, client_id=name[0]))
+        for name in ["a1", "a2", "a3", "b1", "c1"]
+    ]
+    await _settle()
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["holder", "a1", "b1", "c1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    gate = PriorityGate("test")
+    release = asyncio.Event()
+    order = []
+    holder = asyncio.create_task(_hold(gate, order, "holder", release=release))
+    await _settle()
+    gone = asyncio.create_task(_hold(gate, order, "gone"))
+    stays = asyncio.create_task(_hold(gate, order, "stays"))
+    await _settle()
+
+    gone.cancel()
+    await _settle()
+    assert gone.cancelled()
+    assert gate.snapshot()["waiting"]["normal"] == 1
+    assert gate.cancelled == 1
+
+    release.set()
+    await asyncio.gather(holder, stays)
+    assert order == ["holder", "stays"]
+    assert gate.snapshot()["busy"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    gate = PriorityGate("test")
+    order = []
+    holder = gate.slot()
+    await holder.__aenter__()
+    first = asyncio.create_task(_hold(gate, order, "first"))
+    second = asyncio.create_task(_hold(gate, order, "second"))
+    await _settle()
+
+    # Releasing hands the slot to "first", which is cancelled before it gets to run
+    await holder.__aexit__(None, None, None)
+    first.cancel()
+    # A leaked slot would leave "second" waiting forever
+    await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), timeout=1)
+
+    assert first.cancelled()
+    assert order == ["second"]
+    assert gate.snapshot()["busy"] == 0
+    assert gate.snapshot()["waiting"]["normal"] == 0
+    # The next caller gets the slot straight away
+    async with gate.slot():
+        assert gate.snapshot()["busy"] == 1
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reports_admissions_per_class():
+    gate = PriorityGate("test")
+    async with gate.slot("high"):
+        pass
+    classes = gate.snapshot()["classes"]
+    assert classes["high"]["admitted"] == 1
+    assert classes["high"]["wait_p50_ms"] is not None
+    assert classes["low"] == {"admitted": 0, "wait_p50_ms": None, "wait_p95_ms": None, "wait_max_ms": None}
+
+
+def _receive_disconnect_after(event: asyncio.Event):
+    async def receive():
+        await event.wait()
+        return {"type": "http.disconnect"}
+    return receive
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_returns_the_result():
+    async def work():
+        return 42
+
+    assert await cancel_on_disconnect(_receive_disconnect_after(asyncio.Event()), work()) == 42
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_the_work():
+    disconnect = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    call = asyncio.create_task(cancel_on_disconnect(_receive_disconnect_after(disconnect), work()))
+    await _settle()
+    disconnect.set()
+    with pytest.raises(ClientDisconnected):
+        await call
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_frees_a_queued_slot():
+    gate = PriorityGate("test")
+    release = asyncio.Event()
+    disconnect = asyncio.Event()
+    order = []
+    holder = asyncio.create_task(_hold(gate, order, "holder", release=release))
+    await _settle()
+    call = asyncio.create_task(
+        cancel_on_disconnect(_receive_disconnect_after(disconnect), _hold(gate, order, "dropped"))
+    )
+    await _settle()
+    assert gate.snapshot()["waiting"]["normal"] == 1
+
+    disconnect.set()
+    with pytest.raises(ClientDisconnected):
+        await call
+    assert gate.snapshot()["waiting"]["normal"] == 0
+    release.set()
+    await holder
+    assert order == ["holder"]
+
+
+@pytest.mark.asyncio
+async def test_outer_cancellation_cancels_the_work():
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    call = asyncio.create_task(cancel_on_disconnect(_receive_disconnect_after(asyncio.Event()), work()))
+    await _settle()
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    await _settle()
+    assert cancelled.is_set()
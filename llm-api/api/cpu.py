@@ -0,0 +1,48 @@
+"""
+CPU budget of the container, for sizing llama.cpp's thread pools.
+
+``os.cpu_count()`` reports the host's cores, not what the container may use.
+On a node where a 4-CPU quota runs on 32 cores, 8 (or 32) spinning llama.cpp
+threads get throttled by CFS every period, and tokens/sec drops well below
+what 4 threads would reach. The usable count is the smallest of the CPU
+affinity mask and the cgroup quota (v2 ``cpu.max``, or v1
+``cpu.cfs_quota_us`` / ``cpu.cfs_period_us``).
+"""
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def cgroup_cpu_quota(root: Path = CGROUP_ROOT) -> Optional[float]:
+    """CPUs allowed by the cgroup quota (e.g. 2.5), or None when unlimited or unknown."""
+    try:
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for v1 in (root / "cpu", root / "cpu,cpuacct"):
+        try:
+            quota = int((v1 / "cpu.cfs_quota_us").read_text())
+            period = int((v1 / "cpu.cfs_period_us").read_text())
+        except (OSError, ValueError):
+            continue
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """Cores this process can keep busy without being throttled (at least 1)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota is not None:
+        # Round down: a thread per fractional CPU would spend part of each period throttled
+        cpus = min(cpus, math.floor(quota))
+    return max(1, cpus)
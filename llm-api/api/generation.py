@@ -0,0 +1,135 @@
+"""
+Generation profiles (config/generation.yaml): sampling parameters, stop
+conditions and the max_tokens policy for generate_command.
+
+With ``max_tokens: auto`` the limit follows the observed output lengths
+instead of a fixed 256: the model rarely needs more than a few dozen tokens
+for a command, and a tight limit bounds the cost of a run-away generation.
+StopAtJsonEnd ends generation at the closing brace of the command, where the
+model would otherwise keep talking until a stop string.
+"""
+import math
+from collections import deque
+from pathlib import Path
+
+import yaml
+from llama_cpp import Llama
+from loguru import logger
+
+SAMPLING_KEYS = ("temperature", "top_p", "top_k", "min_p", "repeat_penalty")
+
+def load_generation_profiles() -> dict:
+    config_path = Path("/app/config/generation.yaml")
+    if not config_path.exists():
+        logger.warning("Generation profiles not found at /app/config/generation.yaml, using the built-in default")
+        return {"default": {"temperature": 0.5, "stop": ["</s>", "User:"], "max_tokens": 256}}
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f).get("profiles", {})
+
+class OutputLengthTracker:
+    """Completion lengths of the last ``window`` generations -> max_tokens for the next one."""
+
+    def __init__(self, floor: int = 48, ceiling: int = 256, quantile: float = 0.99, headroom: float = 1.25,
+                 window: int = 256, min_samples: int = 20):
+        self.floor = floor
+        self.ceiling = max(floor, ceiling)
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+        self.truncated = 0
+
+    def record(self, tokens: int, truncated: bool = False) -> None:
+        if truncated:
+            # The real length is unknown: count it as twice the cut, so the limit grows quickly
+            self.truncated += 1
+            tokens = min(2 * tokens, self.ceiling)
+        self.samples.append(tokens)
+
+    def max_tokens(self) -> int:
+        if len(self.samples) < self.min_samples:
+            return self.ceiling
+        ordered = sorted(self.samples)
+        observed = ordered[min(int(self.quantile * len(ordered)), len(ordered) - 1)]
+        return min(max(math.ceil(observed * self.headroom), self.floor), self.ceiling)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "p50": ordered[len(ordered) // 2] if ordered else None,
+            "p99": ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)] if ordered else None,
+            "max": ordered[-1] if ordered else None,
+            "truncated": self.truncated,
+        }
+
+class GenerationProfile:
+    """Sampling parameters, stop conditions and max_tokens policy from config/generation.yaml."""
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.sampling = {key: settings[key] for key in SAMPLING_KEYS if key in settings}
+        self.stop = list(settings.get("stop", ["</s>", "User:"]))
+        self.stop_at_json_end = bool(settings.get("stop_at_json_end", True))
+        max_tokens = settings.get("max_tokens", "auto")
+        self.fixed_max_tokens = None if max_tokens == "auto" else int(max_tokens)
+        self.lengths = OutputLengthTracker(
+            floor=int(settings.get("max_tokens_floor", 48)),
+            ceiling=int(settings.get("max_tokens_ceiling", 256)),
+            quantile=float(settings.get("quantile", 0.99)),
+            headroom=float(settings.get("headroom", 1.25)),
+            window=int(settings.get("window", 256)),
+            min_samples=int(settings.get("min_samples", 20)),
+        )
+
+    def max_tokens(self) -> int:
+        return self.fixed_max_tokens or self.lengths.max_tokens()
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "sampling": self.sampling,
+            "stop": self.stop,
+            "stop_at_json_end": self.stop_at_json_end,
+            "max_tokens": self.max_tokens(),
+            "max_tokens_policy": "fixed" if self.fixed_max_tokens else "auto",
+            "output_tokens": self.lengths.snapshot(),
+        }
+
+class StopAtJsonEnd:
+    """
+    llama.cpp stopping criterion: stop once the first top-level JSON object of
+    the output is closed, instead of letting the model talk on until a stop
+    string or max_tokens. Braces inside string values do not count. llama.cpp
+    may run one token past the closing brace; extract_first_json ignores it.
+    """
+
+    def __init__(self, model: Llama, prompt_tokens: int):
+        self.model = model
+        self.seen = prompt_tokens
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+
+    def __call__(self, input_ids, logits) -> bool:
+        new_tokens = list(input_ids[self.seen:])
+        self.seen = len(input_ids)
+        for char in self.model.detokenize(new_tokens).decode("utf-8", errors="ignore"):
+            if self.closed:
+                break
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.depth:
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}" and self.depth:
+                self.depth -= 1
+                self.closed = self.depth == 0
+        return self.closed
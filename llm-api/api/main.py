@@ -1,51 +1,152 @@
 from fastapi import FastAPI, Request, Header, HTTPException
 from fastapi.responses import JSONResponse
-from typing import Optional
-from api.schema import HealthResponse, CommandRequest, SuccessResponse
+from typing import Optional, Tuple
+from api.schema import HealthResponse, CommandRequest, SuccessResponse, VerbalTemplatesResponse
 from api.utils import (
-    get_correlation_id,
     log_request,
     log_response,
     generate_command,
+    GenerationCancelled,
+    generation_settings,
+    model_loader,
+    command_grammar,
+    LLM_LOAD_ON_STARTUP,
+    verbal_templates,
+    USE_VERBAL_TEMPLATES,
 )
 from pydantic import BaseModel
+from shato_common import ClientDisconnected, CorrelationMiddleware, PriorityGate, cancel_on_disconnect, get_correlation_id
+from shato_common.priority import from_headers as priority_from_headers
+import asyncio
+import os
+import threading
+import time
 
 # Enable arbitrary types for Pydantic models (if needed for future extensions)
 BaseModel.model_config = {"arbitrary_types_allowed": True}
 
 app = FastAPI(title="Robot Command API")
 
+# One generation at a time by default (the model is not thread-safe and uses every core);
+# waiting requests are admitted by X-Priority, then round robin across X-Client-ID
+llm_gate = PriorityGate("llm", slots=int(os.getenv("LLM_CONCURRENCY", "1")))
+
+# Status for requests whose caller disconnected (nginx's "client closed request"); nobody reads it
+CLIENT_CLOSED_REQUEST = 499
+
+async def generate_in_slot(text: str, priority: str, client_id: str) -> Tuple[dict, float]:
+    """
+    Wait for a generation slot, then generate in a worker thread so the event
+    loop keeps serving health checks and the queue. Returns the command and
+    the generation time in ms (without the queue wait). If cancelled (the caller
+    disconnected), the slot is held until the model has actually stopped, so
+    the next request never shares the model with a dying one.
+    """
+    async with llm_gate.slot(priority, client_id):
+        start = time.perf_counter()
+        cancel = threading.Event()
+        generation = asyncio.ensure_future(asyncio.to_thread(generate_command, text, cancel))
+        try:
+            command_json = await asyncio.shield(generation)
+        except asyncio.CancelledError:
+            cancel.set()
+            try:
+                await generation
+            except GenerationCancelled:
+                pass
+            raise
+        return command_json, (time.perf_counter() - start) * 1000
+
 @app.middleware("http")
-async def add_correlation_id_header(request: Request, call_next):
-    correlation_id = get_correlation_id(request)
-    log_request(request, correlation_id)
+async def log_and_time_request(request: Request, call_next):
+    log_request(request)
+    start = time.perf_counter()
     response = await call_next(request)
-    response.headers["X-Correlation-ID"] = correlation_id
+    # app = time in this service, compute = generation (set by the endpoint)
+    timings = [f"app;dur={(time.perf_counter() - start) * 1000:.1f}"]
+    compute_ms = getattr(request.state, "compute_ms", None)
+    if compute_ms is not None:
+        timings.append(f"compute;dur={compute_ms:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
     return response
 
+# Added last so it wraps the middleware above; it also sets the X-Correlation-ID response header
+app.add_middleware(CorrelationMiddleware)
+
+def _load_model() -> None:
+    try:
+        model_loader.load()
+    except Exception:
+        pass  # logged by the loader; /ready reports "failed" and the first /command retries
+
+@app.on_event("startup")
+async def load_model_in_background():
+    # The app answers /health while the model loads; /ready turns 200 once it is loaded
+    if LLM_LOAD_ON_STARTUP:
+        app.state.model_load = asyncio.create_task(asyncio.to_thread(_load_model))
+    # Fetches the command grammar (with retries) and follows the validator's reloads
+    if command_grammar is not None:
+        app.state.grammar_refresh = asyncio.create_task(command_grammar.keep_fresh())
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check(request: Request):
-    correlation_id = get_correlation_id(request)
-    log_response(correlation_id, 200, "Service is healthy")
+    """Liveness: the process is up and serving, whether or not the model is loaded yet."""
+    correlation_id = get_correlation_id()
+    log_response(200, "Service is healthy")
     return HealthResponse(message="Service is healthy", correlation_id=correlation_id)
 
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness: 200 once the model is loaded (or, with LLM_LOAD_ON_STARTUP=false,
+    until a load fails, since the first request loads it), 503 otherwise.
+    The body has the load state, load time and this worker's memory (rss / pss).
+    """
+    state = model_loader.snapshot()
+    ready = model_loader.loaded or (not LLM_LOAD_ON_STARTUP and state["status"] != "failed")
+    return JSONResponse(status_code=200 if ready else 503, content=state)
+
+@app.get("/verbal_templates", response_model=VerbalTemplatesResponse)
+async def list_verbal_templates():
+    """Template replies (VERBAL_RESPONSE_MODE=template); the TTS service pre-synthesizes static_replies."""
+    return VerbalTemplatesResponse(
+        mode="template" if USE_VERBAL_TEMPLATES else "generate",
+        policy=verbal_templates.policy,
+        templates=verbal_templates.templates,
+        static_replies=verbal_templates.static_replies(),
+    )
+
+@app.get("/generation")
+async def generation_config():
+    """Active generation profile, current adaptive max_tokens, observed output lengths and thread settings."""
+    return generation_settings()
+
+@app.get("/queue")
+async def queue_stats():
+    """Generation slots in use, waiters and queue wait per priority class."""
+    return llm_gate.snapshot()
+
 @app.post("/command", response_model=SuccessResponse)
 async def generate_robot_command(
     request: Request,
     body: CommandRequest,
     x_correlation_id: Optional[str] = Header(None, alias="X-Correlation-ID"),
 ):
-    # Prioritize correlation_id from body, then header, then generate a new one
-    correlation_id = body.correlation_id or x_correlation_id or get_correlation_id(request)
+    # Prioritize correlation_id from body, then the one bound from the header (generated if absent)
+    correlation_id = body.correlation_id or get_correlation_id()
     
     # Log warning if body and header correlation IDs differ
     if body.correlation_id and x_correlation_id and body.correlation_id != x_correlation_id:
-        log_response(correlation_id, 400, f"Correlation ID mismatch: body={body.correlation_id}, header={x_correlation_id}, using body")
+        log_response(400, "Correlation ID mismatch: body={}, header={}, using body", body.correlation_id, x_correlation_id)
     
+    priority, client_id = priority_from_headers(request.headers, request.client.host if request.client else "anonymous")
     try:
-        command_json = generate_command(body.text)
+        # A caller that gives up (e.g. a dropped speculative call) frees its queue place or stops its generation
+        command_json, request.state.compute_ms = await cancel_on_disconnect(
+            request.receive, generate_in_slot(body.text, priority, client_id)
+        )
         if "error" in command_json:
-            log_response(correlation_id, 500, f"[ROBOT-VALIDATOR-ERROR] Failed to parse JSON from model: {command_json['raw_output']}")
+            log_response(500, "[ROBOT-VALIDATOR-ERROR] Failed to parse JSON from model: {}", command_json["raw_output"])
             raise HTTPException(
                 status_code=500,
                 detail={"error": command_json["error"], "raw_output": command_json["raw_output"]},
@@ -53,22 +154,26 @@ async def generate_robot_command(
             )
         
         # Validate required fields for SuccessResponse
-        if "command" not in command_json or "command_params" not in command_json or "verbal_response" not in command_json:
-            log_response(correlation_id, 422, f"[ROBOT-VALIDATOR-ERROR] Invalid command structure: missing {['command', 'command_params', 'verbal_response'] - set(command_json.keys())}")
+        missing_fields = sorted({'command', 'command_params', 'verbal_response'} - set(command_json.keys()))
+        if missing_fields:
+            log_response(422, "[ROBOT-VALIDATOR-ERROR] Invalid command structure: missing {}", missing_fields)
             raise HTTPException(
                 status_code=422,
-                detail={"error": "Invalid command structure", "missing_fields": ['command', 'command_params', 'verbal_response'] - set(command_json.keys()), "raw_output": str(command_json)},
+                detail={"error": "Invalid command structure", "missing_fields": missing_fields, "raw_output": str(command_json)},
                 headers={"X-Correlation-ID": correlation_id},
             )
         
         # Merge correlation_id into the response
         command_json["correlation_id"] = correlation_id
-        log_response(correlation_id, 200, f"[ROBOT-VALIDATOR-SUCCESS] Generated command: {command_json}")
+        log_response(200, "[ROBOT-VALIDATOR-SUCCESS] Generated command: {}", command_json)
         return command_json
     except HTTPException as e:
         raise e
+    except ClientDisconnected:
+        log_response(CLIENT_CLOSED_REQUEST, "Client disconnected, generation cancelled")
+        return JSONResponse(status_code=CLIENT_CLOSED_REQUEST, content={"error": "Client closed request"})
     except Exception as e:
-        log_response(correlation_id, 500, f"[ROBOT-VALIDATOR-ERROR] Unexpected error: {str(e)}")
+        log_response(500, "[ROBOT-VALIDATOR-ERROR] Unexpected error: {}", e)
         raise HTTPException(
             status_code=500,
             detail={"error": "Internal server error", "message": str(e)},
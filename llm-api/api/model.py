@@ -0,0 +1,99 @@
+"""
+Explicit, lazy loading of the GGUF model.
+
+The model used to be created when api.utils was imported, so every uvicorn
+worker (and every import, e.g. from a benchmark) paid the full load before
+serving anything. ModelLoader loads on demand (``get``), or in the background
+at startup (see api.main), and reports its state for ``/ready``.
+
+The weights are memory-mapped read-only (``use_mmap``, llama.cpp's default,
+now explicit). Their pages live in the page cache, so several workers or
+replicas on one host that load the same file share them instead of each
+holding a private copy. ``use_mlock`` pins those pages in RAM so they are
+never paged out under memory pressure (needs CAP_IPC_LOCK or a high enough
+memlock ulimit; llama.cpp only warns otherwise).
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from llama_cpp import Llama
+from loguru import logger
+
+NOT_LOADED, LOADING, READY, FAILED = "not_loaded", "loading", "ready", "failed"
+
+
+def process_memory() -> dict:
+    """
+    This process's memory in MB from /proc/self/smaps_rollup: rss, pss (shared
+    pages split across the processes mapping them) and the shared/private parts.
+    Empty where /proc is not available.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_clean_mb",
+              "Private_Clean": "private_clean_mb", "Private_Dirty": "private_dirty_mb"}
+    memory = {}
+    try:
+        for line in Path("/proc/self/smaps_rollup").read_text().splitlines():
+            key, _, rest = line.partition(":")
+            if key in fields:
+                memory[fields[key]] = round(int(rest.split()[0]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        return {}
+    return memory
+
+
+class ModelLoader:
+    """Loads the model once, on first use or when ``load`` is called, from any thread."""
+
+    def __init__(self, model_path: str, use_mmap: bool = True, use_mlock: bool = False, **llama_kwargs):
+        self.model_path = model_path
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        self.llama_kwargs = llama_kwargs
+        self.state = NOT_LOADED
+        self.load_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._model: Optional[Llama] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> Llama:
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                model = Llama(
+                    model_path=self.model_path, use_mmap=self.use_mmap, use_mlock=self.use_mlock, **self.llama_kwargs
+                )
+            except Exception as e:
+                self.state, self.error = FAILED, str(e)
+                logger.bind(correlation_id="startup").error("Model load failed: {}", e)
+                raise
+            self.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            self._model, self.state, self.error = model, READY, None
+            logger.bind(correlation_id="startup").info(
+                "Loaded {} in {} ms (mmap={}, mlock={}), memory {}",
+                self.model_path, self.load_ms, self.use_mmap, self.use_mlock, process_memory(),
+            )
+            return model
+
+    def get(self) -> Llama:
+        """The model, loading it first if needed (blocks; call from a worker thread)."""
+        return self._model if self._model is not None else self.load()
+
+    def snapshot(self) -> dict:
+        return {
+            "status": self.state,
+            "model_path": self.model_path,
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+            "load_ms": self.load_ms,
+            "error": self.error,
+            "memory": process_memory(),
+        }
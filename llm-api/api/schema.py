@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Literal, Optional
 
 class HealthResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
@@ -21,6 +21,18 @@ class CommandRequest(BaseModel):
         json_schema_extra={"example": "123e4567-e89b-12d3-a456-426614174000"},
     )
 
+class GenerationStats(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    verbal_source: Literal["model", "template"] = Field(..., description="Who wrote verbal_response")
+    prompt_tokens: int
+    completion_tokens: int
+    tokens_saved: int = Field(0, description="Tokens verbal_response would have cost the model (template mode)")
+    generation_ms: float
+    tokens_per_sec: Optional[float] = Field(None, description="Completion tokens per second of generation time")
+    profile: Optional[str] = Field(None, description="Generation profile (GENERATION_PROFILE)")
+    max_tokens: Optional[int] = Field(None, description="Token limit applied to this generation")
+    finish_reason: Optional[str] = Field(None, description="stop (stop string, JSON end, grammar) or length (hit max_tokens)")
+
 class SuccessResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
     command: str = Field(..., description="The command name (e.g., 'move_to', 'rotate', 'start_patrol')")
@@ -39,4 +51,11 @@ class SuccessResponse(BaseModel):
         description="Natural spoken confirmation for TTS",
         json_schema_extra={"example": "Heading over there now—adventure awaits!"}
     )
-    correlation_id: str = Field(..., description="Unique correlation ID for tracing requests")
\ No newline at end of file
+    correlation_id: str = Field(..., description="Unique correlation ID for tracing requests")
+    generation: Optional[GenerationStats] = Field(None, description="Token usage and latency of this generation")
+
+class VerbalTemplatesResponse(BaseModel):
+    mode: Literal["generate", "template"]
+    policy: str
+    templates: Dict[str, list]
+    static_replies: list = Field(..., description="Replies without placeholders, for TTS pre-synthesis")
@@ -1,31 +1,42 @@
-import uuid
+import os
 import yaml
+import asyncio
 import json
+import time
+import random
+import itertools
+import threading
+import httpx
 from pathlib import Path
 from fastapi import Request
 from loguru import logger
-from llama_cpp import Llama
+from llama_cpp import LlamaGrammar, StoppingCriteriaList
+from shato_common import get_correlation_id
+
+from api.cpu import available_cpus, cgroup_cpu_quota
+from api.generation import GenerationProfile, StopAtJsonEnd, load_generation_profiles
+from api.model import ModelLoader
 
 # ---------- Logging setup ----------
+def _add_correlation_id(record):
+    # Explicit logger.bind(correlation_id=...) wins; otherwise use the request's bound ID
+    record["extra"].setdefault("correlation_id", get_correlation_id() or "-")
+
 logger.remove()
+logger.configure(patcher=_add_correlation_id)
 logger.add(
     sink="logs/app.log",
     level="INFO",
     format="{time} [{level}] [correlation_id={extra[correlation_id]}] {message}",
 )
 
-def get_correlation_id(req: Request) -> str:
-    return req.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-
-def log_request(req: Request, correlation_id: str):
-    logger.bind(correlation_id=correlation_id).info(
-        f"Incoming request: {req.method} {req.url}"
-    )
+# Messages use loguru's lazy "{}" formatting: arguments are only rendered if the record is emitted
+def log_request(req: Request):
+    logger.info("Incoming request: {} {}", req.method, req.url)
 
-def log_response(correlation_id: str, status_code: int, message: str = ""):
-    logger.bind(correlation_id=correlation_id).info(
-        f"Response status: {status_code}, message: {message}"
-    )
+def log_response(status_code: int, message: str = "", *args):
+    """``message`` is a ``str.format`` template filled with ``args``."""
+    logger.info("Response status: {}, message: " + message, status_code, *args)
 
 # ---------- JSON extraction helper ----------
 def extract_first_json(text: str) -> dict:
@@ -74,32 +85,285 @@ prompts_config = load_prompts()
 SYSTEM_PROMPT = prompts_config.get("system_prompt")
 USER_PROMPT_TEMPLATE = prompts_config.get("user_prompt_template")
 
-# Load Llama-3.2-3B-Instruct (Q4_K_S) model
-llm = Llama(
-    model_path="/app/models/llama-3.2-3b-instruct-q4ks.gguf",
+# ---------- Verbal responses ----------
+# generate: the model writes verbal_response; template: it stops after command_params
+# and the reply is picked from verbal_templates in prompts.yaml
+VERBAL_RESPONSE_MODE = os.getenv("VERBAL_RESPONSE_MODE", "generate").lower()
+# random | cycle (rotate through a command's replies) | fixed (always the first, best TTS cache hit rate)
+VERBAL_TEMPLATE_POLICY = os.getenv("VERBAL_TEMPLATE_POLICY", "random").lower()
+
+class VerbalTemplates:
+    """Spoken replies keyed by command ("none" for no command), picked per VERBAL_TEMPLATE_POLICY."""
+
+    def __init__(self, templates: dict, policy: str = "random"):
+        self.templates = {str(key): [str(t) for t in replies] for key, replies in (templates or {}).items() if replies}
+        self.policy = policy
+        self._cycles = {key: itertools.cycle(replies) for key, replies in self.templates.items()}
+
+    def pick(self, command, params: dict):
+        """Reply for ``command`` filled from ``params``, or None if there is no template for it."""
+        key = command or "none"
+        replies = self.templates.get(key)
+        if not replies:
+            return None
+        if self.policy == "fixed":
+            template = replies[0]
+        elif self.policy == "cycle":
+            template = next(self._cycles[key])
+        else:
+            template = random.choice(replies)
+        values = {k: v.replace("_", " ") if isinstance(v, str) else v for k, v in (params or {}).items()}
+        try:
+            return template.format(**values)
+        except (KeyError, IndexError, ValueError):
+            # Placeholder the params cannot fill: fall back to a reply without placeholders
+            return next((t for t in replies if "{" not in t), None)
+
+    def static_replies(self) -> list:
+        """Replies without placeholders, i.e. the ones whose audio can be synthesized ahead of time."""
+        return [t for replies in self.templates.values() for t in replies if "{" not in t]
+
+verbal_templates = VerbalTemplates(prompts_config.get("verbal_templates"), VERBAL_TEMPLATE_POLICY)
+USE_VERBAL_TEMPLATES = VERBAL_RESPONSE_MODE == "template" and bool(verbal_templates.templates)
+if USE_VERBAL_TEMPLATES:
+    USER_PROMPT_TEMPLATE = prompts_config.get("command_only_prompt_template", USER_PROMPT_TEMPLATE)
+
+# ---------- Grammar from the validator's command registry ----------
+# e.g. http://robot-validator:8001/commands/schema; empty disables constrained decoding
+COMMAND_SCHEMA_URL = os.getenv("COMMAND_SCHEMA_URL", "")
+
+def build_response_schema(command_schema: dict, verbal: bool = True) -> dict:
+    """
+    JSON schema of a full LLM reply: one of the validator's commands plus
+    verbal_response (unless ``verbal`` is false), or a null command for
+    instructions that map to none.
+    """
+    defs = dict(command_schema.get("$defs", {}))
+    members = command_schema.get("oneOf") or [{k: v for k, v in command_schema.items() if k != "$defs"}]
+    variants = []
+    for member in members:
+        model = dict(defs[member["$ref"].split("/")[-1]]) if "$ref" in member else dict(member)
+        if verbal:
+            model["properties"] = {**model["properties"], "verbal_response": {"type": "string"}}
+            model["required"] = [*model.get("required", []), "verbal_response"]
+        model.pop("discriminator", None)
+        variants.append(model)
+    none_variant = {
+        "type": "object",
+        "properties": {
+            "command": {"type": "null"},
+            "command_params": {"type": "object", "properties": {}, "additionalProperties": False},
+        },
+        "required": ["command", "command_params"],
+        "additionalProperties": False,
+    }
+    if verbal:
+        none_variant["properties"]["verbal_response"] = {"type": "string"}
+        none_variant["required"].append("verbal_response")
+    variants.append(none_variant)
+    return {"$defs": defs, "anyOf": variants}
+
+# Poll interval once a schema is loaded; the validator answers an unchanged version with 304
+COMMAND_SCHEMA_REFRESH_SEC = float(os.getenv("COMMAND_SCHEMA_REFRESH_SEC", "10"))
+
+class CommandGrammar:
+    """
+    Decoding grammar that follows the validator's live command registry.
+
+    ``keep_fresh`` (started with the app) fetches the schema, retrying with
+    exponential backoff until the validator answers, then revalidates it every
+    ``refresh_sec`` with If-None-Match, so commands added with the validator's
+    POST /commands/reload are picked up without restarting this service. A
+    failed refresh keeps the last grammar; until the first fetch succeeds,
+    generation is unconstrained.
+    """
+
+    def __init__(self, url: str, verbal: bool, refresh_sec: float = 10.0, max_backoff_sec: float = 30.0):
+        self.url = url
+        self.verbal = verbal
+        self.refresh_sec = refresh_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.grammar = None
+        self.version = None
+        self.commands = []
+        self.etag = None
+        self.failures = 0
+        self.error = None
+
+    def refresh(self) -> bool:
+        """Fetch the schema unless unchanged; True if the grammar was replaced. Blocking."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        try:
+            resp = httpx.get(self.url, headers=headers, timeout=5.0)
+            if resp.status_code == 304:
+                self.failures, self.error = 0, None
+                return False
+            resp.raise_for_status()
+            body = resp.json()
+            schema = build_response_schema(body["schema"], verbal=self.verbal)
+            grammar = LlamaGrammar.from_json_schema(json.dumps(schema), verbose=False)
+        except Exception as e:
+            self.failures += 1
+            self.error = str(e)
+            logger.bind(correlation_id="grammar").warning(
+                "Command schema fetch failed ({} in a row), {}: {}",
+                self.failures, "keeping the last grammar" if self.grammar else "decoding unconstrained", e,
+            )
+            return False
+        self.grammar, self.version, self.commands = grammar, body.get("version"), body.get("commands", [])
+        self.etag = resp.headers.get("ETag")
+        self.failures, self.error = 0, None
+        logger.bind(correlation_id="grammar").info("Loaded command grammar version {} for {}", self.version, self.commands)
+        return True
+
+    def next_delay(self) -> float:
+        if self.failures == 0:
+            return self.refresh_sec
+        # Exponential backoff with full jitter, so replicas don't hammer a validator that is coming up
+        return random.uniform(0, min(self.max_backoff_sec, 0.5 * 2 ** self.failures))
+
+    async def keep_fresh(self) -> None:
+        while True:
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(self.next_delay())
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "loaded": self.grammar is not None,
+            "version": self.version,
+            "commands": self.commands,
+            "refresh_sec": self.refresh_sec,
+            "failures": self.failures,
+            "error": self.error,
+        }
+
+# None when COMMAND_SCHEMA_URL is unset: decoding is never constrained
+command_grammar = (
+    CommandGrammar(COMMAND_SCHEMA_URL, verbal=not USE_VERBAL_TEMPLATES, refresh_sec=COMMAND_SCHEMA_REFRESH_SEC)
+    if COMMAND_SCHEMA_URL else None
+)
+
+# ---------- Generation profiles (config/generation.yaml) ----------
+generation_profiles = load_generation_profiles()
+# Template replies leave only the command to generate: a shorter, cheaper profile fits
+GENERATION_PROFILE = os.getenv("GENERATION_PROFILE", "command_only" if USE_VERBAL_TEMPLATES else "default")
+if GENERATION_PROFILE not in generation_profiles:
+    logger.bind(correlation_id="startup").warning(
+        "Unknown GENERATION_PROFILE {}, using {}", GENERATION_PROFILE, next(iter(generation_profiles))
+    )
+    GENERATION_PROFILE = next(iter(generation_profiles))
+profile = GenerationProfile(GENERATION_PROFILE, generation_profiles[GENERATION_PROFILE])
+
+# ---------- Model ----------
+# Threads follow the container's CPU quota (see api/cpu.py) unless set explicitly
+N_THREADS = int(os.getenv("LLM_N_THREADS", "0")) or available_cpus()
+N_THREADS_BATCH = int(os.getenv("LLM_N_THREADS_BATCH", "0")) or N_THREADS
+N_BATCH = int(os.getenv("LLM_N_BATCH", "512"))
+logger.bind(correlation_id="startup").info(
+    "llama.cpp threads: {} (batch {}), n_batch {}, CPU quota {}", N_THREADS, N_THREADS_BATCH, N_BATCH, cgroup_cpu_quota()
+)
+
+# Llama-3.2-3B-Instruct (Q4_K_S), loaded on first use or at startup (see api/model.py), not at import
+LLM_MODEL_PATH = os.getenv("LLM_MODEL_PATH", "/app/models/llama-3.2-3b-instruct-q4ks.gguf")
+# Background load when the app starts; otherwise the first /command loads it
+LLM_LOAD_ON_STARTUP = os.getenv("LLM_LOAD_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+model_loader = ModelLoader(
+    LLM_MODEL_PATH,
+    use_mmap=os.getenv("LLM_USE_MMAP", "true").lower() in ("1", "true", "yes"),  # pages shared between workers
+    use_mlock=os.getenv("LLM_USE_MLOCK", "false").lower() in ("1", "true", "yes"),
     n_ctx=4096,
-    n_threads=8,
+    n_threads=N_THREADS,
+    n_threads_batch=N_THREADS_BATCH,
+    n_batch=N_BATCH,
     n_gpu_layers=0,  # change >0 if you want GPU acceleration
 )
 
+def generation_settings() -> dict:
+    """Active profile (with the current adaptive max_tokens) and thread configuration."""
+    return {
+        "profile": profile.snapshot(),
+        "available_profiles": list(generation_profiles),
+        "n_threads": N_THREADS,
+        "n_threads_batch": N_THREADS_BATCH,
+        "n_batch": N_BATCH,
+        "cpu_quota": cgroup_cpu_quota(),
+        "grammar": command_grammar.snapshot() if command_grammar is not None else None,
+    }
+
 # ---------- Generation ----------
-def generate_command(instruction: str) -> dict:
-    correlation_id = str(uuid.uuid4())
-    logger.bind(correlation_id=correlation_id).info(f"Generating command for instruction: {instruction}")
+class GenerationCancelled(Exception):
+    """The caller went away; generation stopped at the next token."""
+
+def generate_command(instruction: str, cancel: threading.Event = None) -> dict:
+    """
+    Runs in a worker thread. Setting ``cancel`` from another thread stops
+    sampling at the next token and raises GenerationCancelled, freeing the
+    model for the next request.
+    """
+    logger.info("Generating command for instruction: {}", instruction)
+    llm = model_loader.get()
     
+    start = time.perf_counter()
     prompt = f"{SYSTEM_PROMPT}\n{USER_PROMPT_TEMPLATE.format(instruction=instruction)}"
+    max_tokens = profile.max_tokens()
+    criteria = []
+    if cancel is not None:
+        criteria.append(lambda input_ids, logits: cancel.is_set())
+    if profile.stop_at_json_end:
+        criteria.append(StopAtJsonEnd(llm, len(llm.tokenize(prompt.encode("utf-8"), special=True))))
     output = llm(
         prompt,
-        max_tokens=256,
-        temperature=0.5,  # Adjusted for some variety in verbal_response
-        stop=["</s>", "User:"]
+        max_tokens=max_tokens,
+        stop=profile.stop,
+        grammar=command_grammar.grammar if command_grammar is not None else None,
+        stopping_criteria=StoppingCriteriaList(criteria) if criteria else None,
+        **profile.sampling,
     )
+    if cancel is not None and cancel.is_set():
+        logger.info(
+            "Generation cancelled after {} tokens ({} ms)",
+            output.get("usage", {}).get("completion_tokens", 0), round((time.perf_counter() - start) * 1000, 1),
+        )
+        raise GenerationCancelled()
     raw_text = output["choices"][0]["text"].strip()
-    logger.bind(correlation_id=correlation_id).info(f"LLM raw output: {raw_text}")
+    finish_reason = output["choices"][0].get("finish_reason")
+    usage = output.get("usage", {})
+    profile.lengths.record(usage.get("completion_tokens", 0), truncated=finish_reason == "length")
+    logger.info("LLM raw output: {}", raw_text)
     
     command_json = extract_first_json(raw_text)
     if "error" in command_json:
-        logger.bind(correlation_id=correlation_id).warning(f"JSON extraction failed: {command_json['error']}")
+        logger.warning("JSON extraction failed: {}", command_json["error"])
         return {"error": command_json["error"], "raw_output": command_json["raw_output"]}
 
+    generation_ms = (time.perf_counter() - start) * 1000
+    generation = {
+        "verbal_source": "model",
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "tokens_saved": 0,
+        "generation_ms": round(generation_ms, 1),
+        "tokens_per_sec": round(usage.get("completion_tokens", 0) / (generation_ms / 1000), 2) if generation_ms else None,
+        "profile": profile.name,
+        "max_tokens": max_tokens,
+        "finish_reason": finish_reason,
+    }
+    if USE_VERBAL_TEMPLATES:
+        verbal = verbal_templates.pick(command_json.get("command"), command_json.get("command_params"))
+        if verbal is not None:
+            # Without a grammar the model may still have written one; the tokens are spent then
+            model_wrote_reply = "verbal_response" in command_json
+            command_json["verbal_response"] = verbal
+            generation["verbal_source"] = "template"
+            if not model_wrote_reply:
+                # What the model would have written for this reply
+                saved = f', "verbal_response": {json.dumps(verbal, ensure_ascii=False)}'
+                generation["tokens_saved"] = len(llm.tokenize(saved.encode(), add_bos=False))
+    command_json["generation"] = generation
+    logger.info(
+        "Generated {} tokens in {} ms ({} tok/s, max_tokens {}, {}), verbal_response from {} ({} tokens saved)",
+        generation["completion_tokens"], generation["generation_ms"], generation["tokens_per_sec"], max_tokens,
+        finish_reason, generation["verbal_source"], generation["tokens_saved"],
+    )
     return command_json
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Tokens/sec of command generation by llama.cpp thread count and generation profile.
+
+Loads the model once per thread count and generates commands for a fixed set
+of instructions, reporting tokens/sec, output length and latency. The
+default thread counts compare the old hard-coded 8 threads with what
+api/cpu.py derives from the container's CPU quota. Run it inside the
+container, or under ``docker run --cpus N``, to see the effect of
+oversubscription.
+
+Usage (from the llm-api directory, model at /app/models or --model):
+    python benchmarks/bench_threads.py
+    python benchmarks/bench_threads.py --threads 2,4,8 --profiles legacy,default --runs 3 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import yaml
+from llama_cpp import Llama, StoppingCriteriaList
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from api.cpu import available_cpus, cgroup_cpu_quota  # noqa: E402
+from api.generation import SAMPLING_KEYS, StopAtJsonEnd  # noqa: E402
+
+INSTRUCTIONS = [
+    "Shato move to coordinates 10 and -5",
+    "turn ninety degrees clockwise",
+    "start patrol route alpha and repeat it three times",
+    "what's the weather like?",
+]
+
+
+def load_profile(name: str) -> dict:
+    with open(os.path.join(PROJECT_ROOT, "config", "generation.yaml")) as f:
+        return yaml.safe_load(f)["profiles"][name]
+
+
+def load_prompt() -> str:
+    with open(os.path.join(PROJECT_ROOT, "config", "prompts.yaml")) as f:
+        prompts = yaml.safe_load(f)
+    return prompts["system_prompt"] + "\n" + prompts["user_prompt_template"]
+
+
+def run(llm: Llama, prompt_template: str, profile: dict, runs: int) -> dict:
+    sampling = {key: profile[key] for key in SAMPLING_KEYS if key in profile}
+    max_tokens = profile["max_tokens"] if profile.get("max_tokens") != "auto" else profile.get("max_tokens_ceiling", 256)
+    gen_rates, completion_tokens, latencies = [], [], []
+    for _ in range(runs):
+        for instruction in INSTRUCTIONS:
+            prompt = prompt_template.format(instruction=instruction)
+            criteria = None
+            if profile.get("stop_at_json_end", True):
+                criteria = StoppingCriteriaList([StopAtJsonEnd(llm, len(llm.tokenize(prompt.encode(), special=True)))])
+            start = time.perf_counter()
+            output = llm(prompt, max_tokens=max_tokens, stop=profile.get("stop"), stopping_criteria=criteria, **sampling)
+            elapsed = time.perf_counter() - start
+            tokens = output["usage"]["completion_tokens"]
+            latencies.append(elapsed * 1000)
+            completion_tokens.append(tokens)
+            gen_rates.append(tokens / elapsed)
+    return {
+        "tokens_per_sec": round(statistics.mean(gen_rates), 2),
+        "completion_tokens_mean": round(statistics.mean(completion_tokens), 1),
+        "latency_ms_p50": round(statistics.median(latencies), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="/app/models/llama-3.2-3b-instruct-q4ks.gguf")
+    parser.add_argument("--threads", default=None, help="Comma-separated thread counts (default: 8 and the detected CPUs)")
+    parser.add_argument("--profiles", default="legacy,default", help="Profiles from config/generation.yaml")
+    parser.add_argument("--runs", type=int, default=2, help="Passes over the instruction set")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    detected = available_cpus()
+    threads = [int(t) for t in args.threads.split(",")] if args.threads else sorted({8, detected})
+    prompt_template = load_prompt()
+    results = []
+    for n in threads:
+        llm = Llama(model_path=args.model, n_ctx=4096, n_threads=n, n_threads_batch=n, verbose=False)
+        for name in args.profiles.split(","):
+            results.append({"threads": n, "profile": name, **run(llm, prompt_template, load_profile(name), args.runs)})
+        del llm
+
+    if args.json:
+        print(json.dumps({"cpu_quota": cgroup_cpu_quota(), "available_cpus": detected, "results": results}, indent=2))
+        return
+    print(f"CPU quota {cgroup_cpu_quota()}, available CPUs {detected}")
+    print(f"{'threads':>7} {'profile':<14} {'tok/s':>8} {'tokens':>7} {'p50 ms':>9}")
+    for r in results:
+        print(f"{r['threads']:>7} {r['profile']:<14} {r['tokens_per_sec']:>8} {r['completion_tokens_mean']:>7} {r['latency_ms_p50']:>9}")
+
+
+if __name__ == "__main__":
+    main()
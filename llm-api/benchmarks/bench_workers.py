@@ -0,0 +1,120 @@
+"""
+Cold start and memory per worker for the LLM service.
+
+Starts ``uvicorn api.main:app --workers N`` for each N and mmap setting. It
+measures the time until /ready answers 200 from every worker (cold start),
+then reads each worker's /proc/<pid>/smaps_rollup. With the GGUF weights
+memory-mapped (LLM_USE_MMAP=true) the model's pages are shared, so an extra
+worker adds only its private memory (KV cache, scratch buffers) to the
+host's total PSS. Without mmap each worker holds its own copy of the weights.
+
+Linux only (reads /proc). Usage (from the llm-api directory, model at
+/app/models or LLM_MODEL_PATH):
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1,2,4 --mmap true,false --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def children(pid: int) -> List[int]:
+    pids = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        pids += [int(p) for p in (task / "children").read_text().split()]
+    return pids
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    wanted = {"Rss": "rss_mb", "Pss": "pss_mb", "Private_Clean": "private_clean_mb", "Private_Dirty": "private_dirty_mb"}
+    memory = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        key, _, rest = line.partition(":")
+        if key in wanted:
+            memory[wanted[key]] = int(rest.split()[0]) / 1024
+    return memory
+
+
+def wait_ready(base_url: str, workers: int, timeout: float) -> float:
+    """Seconds until /ready answered 200 often enough in a row that every worker is likely loaded."""
+    start = time.perf_counter()
+    streak = 0
+    with httpx.Client(base_url=base_url, timeout=5.0) as client:
+        while streak < 4 * workers:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"not ready after {timeout}s")
+            try:
+                ok = client.get("/ready").status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            streak = streak + 1 if ok else 0
+            if not ok:
+                time.sleep(0.1)
+    return time.perf_counter() - start
+
+
+def run(workers: int, mmap: bool, port: int, timeout: float) -> dict:
+    env = {**os.environ, "LLM_USE_MMAP": str(mmap).lower(), "LLM_LOAD_ON_STARTUP": "true"}
+    cmd = [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--workers", str(workers),
+           "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+    try:
+        cold_start = wait_ready(f"http://127.0.0.1:{port}", workers, timeout)
+        pids = children(proc.pid) if workers > 1 else [proc.pid]
+        per_worker = [memory_mb(pid) for pid in pids]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "workers": workers,
+        "mmap": mmap,
+        "cold_start_sec": round(cold_start, 2),
+        "total_rss_mb": round(sum(m["rss_mb"] for m in per_worker), 1),
+        "total_pss_mb": round(sum(m["pss_mb"] for m in per_worker), 1),
+        "private_mb_per_worker": round(
+            sum(m["private_clean_mb"] + m["private_dirty_mb"] for m in per_worker) / len(per_worker), 1
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--mmap", default="true,false", help="LLM_USE_MMAP settings to compare")
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for readiness")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for mmap in [m.strip().lower() == "true" for m in args.mmap.split(",")]:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            results.append(run(workers, mmap, args.port, args.timeout))
+        # Memory an additional worker adds to the host (total PSS), relative to one worker
+        base = next((r for r in results if r["mmap"] == mmap and r["workers"] == 1), None)
+        for r in results:
+            if base is not None and r["mmap"] == mmap and r["workers"] > 1:
+                r["pss_mb_per_extra_worker"] = round((r["total_pss_mb"] - base["total_pss_mb"]) / (r["workers"] - 1), 1)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mmap':>5} {'workers':>7} {'cold start s':>12} {'RSS MB':>9} {'PSS MB':>9} {'private/worker':>14} {'PSS/extra worker':>16}")
+    for r in results:
+        print(
+            f"{str(r['mmap']):>5} {r['workers']:>7} {r['cold_start_sec']:>12} {r['total_rss_mb']:>9} "
+            f"{r['total_pss_mb']:>9} {r['private_mb_per_worker']:>14} {r.get('pss_mb_per_extra_worker', '-'):>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
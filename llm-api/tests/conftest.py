@@ -0,0 +1,8 @@
+import os
+import sys
+
+
+# Ensure the API package is importable when running tests from the repo root
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
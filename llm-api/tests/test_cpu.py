@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from api.cpu import available_cpus, cgroup_cpu_quota
+
+
+def test_cgroup_v2_quota(tmp_path):
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert cgroup_cpu_quota(tmp_path) == 2.5
+
+
+def test_cgroup_v2_unlimited(tmp_path):
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+@pytest.mark.parametrize("directory", ["cpu", "cpu,cpuacct"])
+def test_cgroup_v1_quota(tmp_path, directory):
+    v1 = tmp_path / directory
+    v1.mkdir()
+    (v1 / "cpu.cfs_quota_us").write_text("150000\n")
+    (v1 / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_quota(tmp_path) == 1.5
+
+
+def test_cgroup_v1_unlimited(tmp_path):
+    v1 = tmp_path / "cpu"
+    v1.mkdir()
+    (v1 / "cpu.cfs_quota_us").write_text("-1\n")
+    (v1 / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_no_cgroup_files(tmp_path):
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_available_cpus_rounds_the_quota_down(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(32)), raising=False)
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert available_cpus(tmp_path) == 2
+    (tmp_path / "cpu.max").write_text("50000 100000\n")
+    assert available_cpus(tmp_path) == 1
+
+
+def test_available_cpus_follows_affinity_without_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 2}, raising=False)
+    assert available_cpus(tmp_path) == 3
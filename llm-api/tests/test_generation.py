@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from api.generation import GenerationProfile, OutputLengthTracker, StopAtJsonEnd  # noqa: E402
+
+
+class CharModel:
+    """One token per character, enough for StopAtJsonEnd's detokenize calls."""
+
+    def detokenize(self, tokens):
+        return "".join(chr(t) for t in tokens).encode()
+
+
+def _feed(criterion, text, prompt=""):
+    """Feed ``text`` one token at a time; returns how many tokens were generated before it stopped."""
+    ids = [ord(c) for c in prompt]
+    for count, char in enumerate(text, start=1):
+        ids.append(ord(char))
+        if criterion(ids, None):
+            return count
+    return None
+
+
+def test_tracker_uses_ceiling_until_enough_samples():
+    tracker = OutputLengthTracker(floor=16, ceiling=256, min_samples=3)
+    tracker.record(40)
+    tracker.record(40)
+    assert tracker.max_tokens() == 256
+    tracker.record(40)
+    assert tracker.max_tokens() == 50  # 40 * 1.25
+
+
+def test_tracker_stays_within_floor_and_ceiling():
+    tracker = OutputLengthTracker(floor=48, ceiling=64, min_samples=1)
+    tracker.record(5)
+    assert tracker.max_tokens() == 48
+    tracker.record(200)
+    assert tracker.max_tokens() == 64
+
+
+def test_truncated_output_raises_the_limit():
+    tracker = OutputLengthTracker(floor=16, ceiling=256, min_samples=1)
+    tracker.record(40, truncated=True)
+    assert tracker.truncated == 1
+    assert tracker.max_tokens() == 100  # counted as 80 tokens, plus headroom
+
+
+def test_profile_fixed_and_auto_max_tokens():
+    assert GenerationProfile("legacy", {"max_tokens": 256}).max_tokens() == 256
+    auto = GenerationProfile("default", {"max_tokens": "auto", "max_tokens_ceiling": 128, "temperature": 0.2})
+    assert auto.max_tokens() == 128
+    assert auto.sampling == {"temperature": 0.2}
+    assert auto.snapshot()["max_tokens_policy"] == "auto"
+
+
+def test_stop_at_json_end_stops_on_the_closing_brace():
+    output = '{"command": "rotate", "command_params": {"angle": 90}} and some chatter'
+    stopped_at = _feed(StopAtJsonEnd(CharModel(), prompt_tokens=0), output)
+    assert output[:stopped_at].endswith("}}")
+
+
+def test_stop_at_json_end_ignores_braces_in_strings():
+    output = '{"verbal_response": "a } and a \\" {", "command": null}'
+    assert _feed(StopAtJsonEnd(CharModel(), prompt_tokens=0), output) == len(output)
+
+
+def test_stop_at_json_end_skips_the_prompt():
+    prompt = 'Example: {"command": null}\n'
+    criterion = StopAtJsonEnd(CharModel(), prompt_tokens=len(prompt))
+    assert _feed(criterion, '{"command": null}', prompt=prompt) == len('{"command": null}')
+    assert _feed(StopAtJsonEnd(CharModel(), prompt_tokens=0), "no json here") is None
@@ -2,16 +2,63 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     orchestrator_port: int = 8500  
-    stt_url: str = "http://stt-service:8002/transcribe"
+    stt_url: str = "http://stt-service:8002/transcribe/raw"  # raw audio body, streamed
     llm_url: str = "http://llm-service:8000/command"
     validator_url: str = "http://robot-validator:8001/execute_command"
     tts_url: str = "http://tts-service:8003/speak"
+    # Replicas per service; when set they replace the single *_url above
+    stt_urls: list[str] = []
+    llm_urls: list[str] = []
+    validator_urls: list[str] = []
+    tts_urls: list[str] = []
+    tts_format: str | None = None  # wav | flac | mp3 | opus; TTS default (wav) if unset
+    tts_sample_rate: int | None = None
     service_name: str = "orchestrator"
     log_level: str = "INFO"
     enable_tracing: bool = False
     otlp_endpoint: str | None = None
     enable_metrics: bool = True
     correlation_header: str = "X-Correlation-ID"
+    stt_upload_chunk_bytes: int = 64 * 1024
+    # Start the LLM on STT's draft transcript when it is this confident (see speculation.py)
+    speculative_llm: bool = False
+    speculation_min_confidence: float = 0.8
+    # Priority classes (critical / high / normal / low) sent downstream as X-Priority
+    default_priority: str = "normal"
+    max_client_priority: str = "high"  # clients cannot claim more; "critical" comes from priority_keywords
+    priority_keywords: dict[str, list[str]] = {
+        "critical": ["stop", "halt", "freeze", "emergency", "abort"],
+        "high": ["rotate", "turn", "back"],
+    }
+    text_flow_batch_max_items: int = 32
+    text_flow_batch_concurrency: int = 4  # items of one /text_flow/batch in flight at once
+
+    # Downstream resilience (see resilience.py); per-service values are keyed stt / llm / validator / tts
+    timeout_ceiling_sec: dict[str, float] = {"stt": 60.0, "llm": 240.0, "validator": 10.0, "tts": 120.0}
+    # Generous for stages whose latency grows with the input (audio length, reply length)
+    timeout_floor_sec: dict[str, float] = {"stt": 15.0, "llm": 30.0, "validator": 1.0, "tts": 15.0}
+    timeout_p99_multiplier: float = 3.0
+    timeout_min_samples: int = 20
+    connect_timeout_sec: float = 5.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout_sec: float = 30.0
+    # Idempotent stages only. The validator executes commands: add it (or hedge it) only with a single
+    # replica and DEDUP_TTL_SEC > (retry_attempts + 1) * (timeout_ceiling_sec["validator"] + retry_backoff_max_sec)
+    retry_services: list[str] = ["stt"]
+    retry_attempts: int = 2
+    retry_backoff_base_sec: float = 0.1
+    retry_backoff_max_sec: float = 2.0
+    hedge_services: list[str] = []  # takes effect for services with several replicas
+    hedge_min_delay_sec: float = 0.05
+    downstream_max_connections: int = 100
+
+    # Load balancing across replicas
+    balancing: str = "least_outstanding"  # least_outstanding | p2c (power of two choices)
+    health_paths: dict[str, str] = {"stt": "/", "llm": "/ready", "validator": "/", "tts": "/health"}
+    health_check_interval_sec: float = 5.0  # 0 disables active checks
+    health_check_timeout_sec: float = 2.0
+    eject_after_failures: int = 3
+    eject_duration_sec: float = 30.0  # only used when active checks are off
 
     class Config:
         env_file = ".env"
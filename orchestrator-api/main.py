@@ -1,27 +1,49 @@
 # orchestrator.py
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, Callable
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, Field
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Optional, Callable
+import asyncio
 import httpx
-import uuid
+import json
+import re
+import threading
 import time
-import contextvars
 import structlog
 import logging
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+from shato_common import (
+    CorrelationMiddleware,
+    add_correlation_id,
+    bind_child,
+    bind_priority,
+    current_priority,
+    escalate,
+    get_correlation_id,
+    outgoing_headers,
+    priority_headers,
+)
+from shato_common.priority import PRIORITIES, cap_priority, from_headers as priority_from_headers, more_urgent
 
 from config import settings
+import resilience
+import speculation
+import timing
 
 
 # ---------- Logging / Observability Setup ----------
 
-correlation_id_ctx: contextvars.ContextVar[str] = contextvars.ContextVar("correlation_id", default="")
-
 def configure_logging() -> None:
     logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO))
     structlog.configure(
         processors=[
             structlog.contextvars.merge_contextvars,
+            add_correlation_id,
             structlog.processors.add_log_level,
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.JSONRenderer(),
@@ -37,19 +59,6 @@ def configure_logging() -> None:
 logger = structlog.get_logger(settings.service_name)
 
 
-def get_correlation_id(request: Request) -> str:
-    header_name = settings.correlation_header
-    cid = request.headers.get(header_name) or str(uuid.uuid4())
-    correlation_id_ctx.set(cid)
-    structlog.contextvars.bind_contextvars(correlation_id=cid)
-    return cid
-
-
-def correlation_header() -> tuple[str, str]:
-    cid = correlation_id_ctx.get() or str(uuid.uuid4())
-    return settings.correlation_header, cid
-
-
 def init_tracing(app: FastAPI) -> None:
     if not settings.enable_tracing:
         return
@@ -88,16 +97,24 @@ def init_metrics(app: FastAPI) -> None:
         logger.warning("metrics_init_failed", error=str(e))
 
 
-app = FastAPI(title="Orchestrator Service", version="1.0.0")
+# Encode responses with orjson when installed (several times faster on multi-MB audio payloads)
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+app = FastAPI(title="Orchestrator Service", version="1.0.0", default_response_class=FastJSONResponse)
 
 
 # ---------- Middleware ----------
 
 @app.middleware("http")
-async def correlation_and_logging_middleware(request: Request, call_next: Callable):
+async def logging_and_timing_middleware(request: Request, call_next: Callable):
     start_time = time.time()
-    cid = get_correlation_id(request)
+    call_timings = timing.start_request()
     structlog.contextvars.bind_contextvars(path=str(request.url.path), method=request.method)
+    priority, client_id = priority_from_headers(
+        request.headers, request.client.host if request.client else "anonymous", settings.default_priority
+    )
+    # Clients may ask for up to max_client_priority; more urgent classes only come from classify_text
+    bind_priority(cap_priority(priority, settings.max_client_priority), client_id)
     logger.info("request_start")
     try:
         response = await call_next(request)
@@ -106,9 +123,11 @@ async def correlation_and_logging_middleware(request: Request, call_next: Callab
         logger.error("request_exception", duration_ms=duration_ms, error=str(exc))
         raise
     duration_ms = int((time.time() - start_time) * 1000)
-    # Ensure header is set on the response (some responses may not have headers object)
+    # Some responses may not allow header mutation
     try:
-        response.headers[settings.correlation_header] = cid
+        response.headers["Server-Timing"] = timing.server_timing_header(
+            call_timings, (time.time() - start_time) * 1000
+        )
     except Exception:
         # if response doesn't allow header mutation, ignore but keep logging
         logger.warning("response_headers_not_mutable")
@@ -116,6 +135,11 @@ async def correlation_and_logging_middleware(request: Request, call_next: Callab
     return response
 
 
+# Binds the correlation ID / traceparent (generated when absent) and echoes the ID on responses.
+# Added last so it wraps the middleware above; call_service forwards both downstream.
+app.add_middleware(CorrelationMiddleware, header=settings.correlation_header)
+
+
 # ---------- Request / Response Schemas (Pydantic v2) ----------
 
 class InferRequest(BaseModel):
@@ -137,78 +161,342 @@ class SpeakRequest(BaseModel):
     text: str
     voice: Optional[str] = None
     speed: Optional[float] = None
+    format: Optional[str] = None
+    sample_rate: Optional[int] = None
     correlation_id: Optional[str] = None
 
     model_config = ConfigDict(extra="forbid")
 
 
+class TextFlowRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+    speak: bool = True  # false skips TTS: no synthesis time, no audio payload
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class TextFlowBatchRequest(BaseModel):
+    items: list[TextFlowRequest] = Field(..., min_length=1)
+
+    model_config = ConfigDict(extra="forbid")
+
+
 # ---------- Utility ----------
 
-async def call_service(method: str, url: str, **kwargs):
+def json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+# word -> priority class, from settings.priority_keywords
+_PRIORITY_WORDS = {
+    word.lower(): priority
+    for priority in reversed(PRIORITIES)  # more urgent classes win for words listed twice
+    for word in settings.priority_keywords.get(priority, ())
+}
+
+
+def classify_text(text: str) -> Optional[str]:
+    """Most urgent priority class whose keywords occur in ``text``, if any."""
+    found = None
+    for word in re.findall(r"[a-z']+", text.lower()):
+        priority = _PRIORITY_WORDS.get(word)
+        if priority is not None:
+            found = priority if found is None else more_urgent(found, priority)
+    return found
+
+
+def passthrough_json(body: bytes) -> Any:
+    """
+    Embed a downstream JSON body in our own response without decoding it
+    (orjson.Fragment is written out verbatim), so a multi-MB base64 TTS answer
+    is not parsed and re-serialized on the event loop. Without orjson >= 3.9
+    the body is decoded as usual.
     """
-    Generic helper to call downstream services using httpx.AsyncClient.
+    if orjson is not None and hasattr(orjson, "Fragment"):
+        return orjson.Fragment(body)
+    return json_loads(body)
+
+
+def build_downstream() -> dict[str, resilience.ServiceClient]:
+    urls = {
+        "stt": settings.stt_urls or [settings.stt_url],
+        "llm": settings.llm_urls or [settings.llm_url],
+        "validator": settings.validator_urls or [settings.validator_url],
+        "tts": settings.tts_urls or [settings.tts_url],
+    }
+    clients = {}
+    for service, replicas in urls.items():
+        clients[service] = resilience.ServiceClient(
+            service,
+            replicas,
+            breaker=resilience.CircuitBreaker(
+                service, settings.breaker_failure_threshold, settings.breaker_reset_timeout_sec
+            ),
+            latency=resilience.LatencyTracker(
+                min_samples=settings.timeout_min_samples,
+                multiplier=settings.timeout_p99_multiplier,
+                floor_sec=settings.timeout_floor_sec.get(service, 1.0),
+                ceiling_sec=settings.timeout_ceiling_sec.get(service, 240.0),
+            ),
+            retries=settings.retry_attempts if service in settings.retry_services else 0,
+            backoff_base_sec=settings.retry_backoff_base_sec,
+            backoff_max_sec=settings.retry_backoff_max_sec,
+            hedge=service in settings.hedge_services,
+            hedge_min_delay_sec=settings.hedge_min_delay_sec,
+            connect_timeout_sec=settings.connect_timeout_sec,
+            max_connections=settings.downstream_max_connections,
+            balancing=settings.balancing,
+            health_path=settings.health_paths.get(service),
+            health_check_interval_sec=settings.health_check_interval_sec,
+            health_check_timeout_sec=settings.health_check_timeout_sec,
+            eject_after_failures=settings.eject_after_failures,
+            eject_duration_sec=settings.eject_duration_sec,
+        )
+    return clients
+
+
+# One pooled client (replicas, breaker, adaptive timeout, retries) per downstream service
+downstream = build_downstream()
+
+
+class UploadBody:
+    """
+    Request body that streams an UploadFile to a downstream service in chunks,
+    straight from the spooled file the upload was parsed into (memory, then
+    disk past 1 MB), so memory use does not grow with the audio length.
+
+    Each iteration keeps its own offset, so retries and hedged copies each
+    send the whole upload.
+    """
+
+    def __init__(self, upload: UploadFile, chunk_size: int):
+        self._file = upload.file
+        self._chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.content_type = upload.content_type or "application/octet-stream"
+
+    def _read_at(self, offset: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(self._chunk_size)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        offset = 0
+        while True:
+            chunk = await run_in_threadpool(self._read_at, offset)
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+
+async def transcribe_upload(audio: UploadFile) -> dict:
+    """Send an upload to STT's raw-body endpoint as a chunked request."""
+    body = UploadBody(audio, settings.stt_upload_chunk_bytes)
+    return await call_service("POST", "stt", content=body, headers={"Content-Type": body.content_type})
+
+
+def downstream_headers(headers: Optional[dict] = None) -> dict:
+    """``headers`` plus the correlation and priority headers every downstream call carries."""
+    headers = headers or {}
+    for key, value in (*outgoing_headers(settings.correlation_header).items(), *priority_headers().items()):
+        headers.setdefault(key, value)
+    return headers
+
+
+def downstream_error(method: str, service: str, exc: Exception) -> HTTPException:
+    """Map an open circuit or a connection failure to 503 / 504."""
+    if isinstance(exc, resilience.CircuitOpenError):
+        logger.warning("service_call_circuit_open", service=service, retry_after_sec=round(exc.retry_after, 1))
+        return HTTPException(status_code=503, detail=f"{exc}, retry in {exc.retry_after:.0f}s")
+    url = str(exc.request.url) if exc.request is not None else service
+    logger.error("service_call_request_error", method=method, url=url, error=repr(exc))
+    if isinstance(exc, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail=f"Service timed out: {url} ({exc!r})")
+    return HTTPException(status_code=503, detail=f"Service unreachable: {url} ({exc})")
+
+
+async def call_service(method: str, service: str, raw: bool = False, **kwargs):
+    """
+    Call a downstream service through its ServiceClient (see resilience.py).
+    Each call gets an OpenTelemetry span and is timed; the service's
+    Server-Timing header splits it into transfer/queue/compute (see timing.py).
+    Returns the decoded JSON, or with ``raw`` the httpx.Response with its body
+    undecoded, for relaying as is.
     Raises HTTPException if service call fails.
     """
-    header_key, header_val = correlation_header()
-    headers = kwargs.pop("headers", {}) or {}
-    headers.setdefault(header_key, header_val)
-    async with httpx.AsyncClient(timeout=240, headers=headers) as client:
+    client = downstream[service]
+    headers = downstream_headers(kwargs.pop("headers", None))
+    priority, _ = current_priority()
+    with timing.span(f"call {service}", **{"peer.service": service, "http.method": method}) as span:
+        start = time.perf_counter()
         try:
-            resp = await client.request(method, url, **kwargs)
-            resp.raise_for_status()
-            # attempt to decode json; if not JSON, return text
-            try:
-                data = resp.json()
-            except ValueError:
-                data = {"text": resp.text}
-            logger.info("service_call_success", method=method, url=url, status=resp.status_code)
-            return data
+            resp = await client.request(method, headers=headers, **kwargs)
+        except resilience.CircuitOpenError as e:
+            raise downstream_error(method, service, e)
         except httpx.RequestError as e:
-            logger.error("service_call_request_error", method=method, url=url, error=str(e))
-            raise HTTPException(status_code=503, detail=f"Service unreachable: {url} ({e})")
-        except httpx.HTTPStatusError as e:
-            # prefer using the response on the exception
-            resp = getattr(e, "response", None)
-            body = None
-            status_code = None
-            if resp is not None:
-                status_code = resp.status_code
-                try:
-                    body = resp.text
-                except Exception:
-                    body = "<unreadable response body>"
-            logger.error(
-                "service_call_http_error",
-                method=method,
-                url=url,
-                status=status_code,
-                body=body,
-            )
+            timing.record_call(service, {"round_trip": (time.perf_counter() - start) * 1000})
+            raise downstream_error(method, service, e)
+
+        phases = timing.split_phases(
+            (time.perf_counter() - start) * 1000, timing.parse_server_timing(resp.headers.get("Server-Timing"))
+        )
+        call = timing.record_call(service, phases, priority)
+        if span is not None:
+            span.set_attribute("http.status_code", resp.status_code)
+            span.set_attribute("http.url", str(resp.request.url))
+            for key, value in call.items():
+                if key.endswith("_ms"):
+                    span.set_attribute(f"timing.{key}", value)
+
+        if resp.is_error:
+            try:
+                body = resp.text
+            except Exception:
+                body = "<unreadable response body>"
+            logger.error("service_call_http_error", method=method, url=str(resp.request.url), status=resp.status_code, body=body)
             # surface the service's error text when available
-            raise HTTPException(status_code=status_code or 502, detail=f"Service returned error: {body or str(e)}")
+            raise HTTPException(status_code=resp.status_code, detail=f"Service returned error: {body or resp.reason_phrase}")
+
+        logger.info("service_call_success", method=method, url=str(resp.request.url), status=resp.status_code, **call)
+        if raw:
+            return resp
+        # attempt to decode json; if not JSON, return text
+        try:
+            return json_loads(resp.content)
+        except ValueError:
+            return {"text": resp.text}
+
+
+async def transcribe_progress(audio: UploadFile) -> AsyncIterator[dict]:
+    """
+    Like transcribe_upload, asking STT for NDJSON progress: a ``partial`` event
+    (draft transcript and its confidence) when STT has a draft model, then the
+    ``final`` one. An STT answering with plain JSON is passed on as the final event.
+    """
+    body = UploadBody(audio, settings.stt_upload_chunk_bytes)
+    headers = downstream_headers({"Content-Type": body.content_type, "Accept": "application/x-ndjson"})
+    priority, _ = current_priority()
+    server_timing: dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        async with downstream["stt"].stream("POST", content=body, headers=headers) as resp:
+            if resp.is_error:
+                detail = (await resp.aread()).decode(errors="replace")
+                logger.error("service_call_http_error", method="POST", url=str(resp.request.url), status=resp.status_code, body=detail)
+                raise HTTPException(status_code=resp.status_code, detail=f"Service returned error: {detail or resp.reason_phrase}")
+            if "ndjson" not in resp.headers.get("content-type", ""):
+                server_timing = timing.parse_server_timing(resp.headers.get("server-timing"))
+                yield {"type": "final", **json_loads(await resp.aread())}
+                return
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    event = json_loads(line)
+                    # The stream's headers went out before STT did any work: its timing comes with the final event
+                    if event.get("type") == "final":
+                        server_timing = timing.parse_server_timing(event.pop("server_timing", None))
+                    yield event
+    except (resilience.CircuitOpenError, httpx.RequestError) as e:
+        raise downstream_error("POST", "stt", e)
+    finally:
+        timing.record_call("stt", timing.split_phases((time.perf_counter() - start) * 1000, server_timing), priority)
+
+
+async def transcribe_speculatively(audio: UploadFile) -> tuple[dict, Optional[speculation.Speculation]]:
+    """
+    STT that starts the LLM on the first partial transcript with at least
+    ``speculation_min_confidence`` (see speculation.py). Returns the final STT
+    result and the speculation, if one was started.
+    """
+    spec: Optional[speculation.Speculation] = None
+    try:
+        async with aclosing(transcribe_progress(audio)) as events:
+            async for event in events:
+                kind = event.pop("type", None)
+                if kind == "final":
+                    return event, spec
+                if kind == "error":
+                    raise HTTPException(status_code=500, detail=event.get("message") or "STT failed")
+                text = event.get("text") or ""
+                if (kind == "partial" and spec is None and text.strip()
+                        and event.get("confidence", 0.0) >= settings.speculation_min_confidence):
+                    urgency = classify_text(text)
+                    if urgency is not None:
+                        escalate(urgency)
+                    llm_payload = {"text": text, "correlation_id": get_correlation_id()}
+                    spec = speculation.Speculation(text, call_service("POST", "llm", json=llm_payload))
+                    logger.info("speculation_started", partial=text, confidence=event["confidence"])
+        raise HTTPException(status_code=502, detail="STT stream ended without a final transcript")
+    except BaseException:
+        if spec is not None:
+            await spec.cancel()
+        raise
+
+
+async def settle_speculation(spec: Optional[speculation.Speculation], text: str) -> tuple[Optional[Awaitable[Any]], dict]:
+    """
+    Keep the speculative LLM call if its partial matches the final transcript,
+    cancel it otherwise. Returns the call to await as the LLM stage (None on a
+    miss) and the outcome reported with the STT result.
+    """
+    if spec is None:
+        speculation.stats.record(speculation.SKIPPED)
+        return None, {"outcome": speculation.SKIPPED}
+    if spec.matches(text):
+        saved_ms = spec.saved_ms()
+        speculation.stats.record(speculation.HIT, saved_ms)
+        logger.info("speculation_hit", saved_ms=round(saved_ms, 1))
+        return spec.task, {"outcome": speculation.HIT, "partial": spec.text, "saved_ms": round(saved_ms, 1)}
+    await spec.cancel()
+    speculation.stats.record(speculation.MISS)
+    logger.info("speculation_miss", partial=spec.text, final=text)
+    return None, {"outcome": speculation.MISS, "partial": spec.text}
 
 
 # ---------- Endpoints ----------
 
+# Stage that runs after each voice-flow stage, for attributing stream errors
+_NEXT_STAGE = {"stt": "llm", "llm": "validator", "validator": "tts"}
+
 @app.get("/")
 async def root():
     """Basic health check."""
     return {"message": "Orchestrator service is running"}
 
 
+@app.get("/downstreams")
+async def downstreams():
+    """Per service: replicas (in flight, ejected), breaker state, observed latency and current timeout."""
+    return {service: client.snapshot() for service, client in downstream.items()}
+
+
+@app.get("/speculation")
+async def speculation_stats():
+    """Speculative LLM calls on partial transcripts: outcomes, hit rate and latency saved."""
+    return {
+        "enabled": settings.speculative_llm,
+        "min_confidence": settings.speculation_min_confidence,
+        **speculation.stats.snapshot(),
+    }
+
+
 @app.post("/transcribe")
 async def transcribe(audio: UploadFile = File(...)):
     """Send audio to STT service and return transcription."""
-    files = {"audio": (audio.filename, await audio.read(), audio.content_type)}
-    result = await call_service("POST", settings.stt_url, files=files)
-    return result
+    return await transcribe_upload(audio)
 
 
 @app.post("/infer")
 async def infer(request: InferRequest):
     """Send text to LLM service to get command + params."""
     payload = request.model_dump(exclude_none=True)
-    result = await call_service("POST", settings.llm_url, json=payload)
+    result = await call_service("POST", "llm", json=payload)
     return result
 
 
@@ -218,71 +506,260 @@ async def execute(request: ExecuteRequest):
     payload = request.model_dump(exclude_none=True)
     # Remove correlation_id if present so validator with extra="forbid" won't reject
     payload.pop("correlation_id", None)
-    result = await call_service("POST", settings.validator_url, json=payload)
+    result = await call_service("POST", "validator", json=payload)
     return result
 
 
+# Audio metadata the TTS service sends with a raw audio answer
+TTS_AUDIO_HEADERS = ("X-Model", "X-Sample-Rate", "X-Duration-Sec")
+
+
 @app.post("/speak")
-async def speak(request: SpeakRequest):
-    """Send text to TTS service and get back audio."""
+async def speak(request: SpeakRequest, http_request: Request):
+    """
+    Send text to TTS service and relay its answer byte for byte: the JSON with
+    base64 audio, or the audio itself when the client sends ``Accept: audio/*``.
+    """
     payload = request.model_dump(exclude_none=True)
     # keep correlation header at HTTP header level (call_service already adds it)
     payload.pop("correlation_id", None)
-    result = await call_service("POST", settings.tts_url, json=payload)
-    return result
+    accept = http_request.headers.get("accept", "")
+    headers = {"Accept": accept} if "audio/" in accept else {}
+    resp = await call_service("POST", "tts", raw=True, json=payload, headers=headers)
+    return Response(
+        content=resp.content,
+        media_type=resp.headers.get("content-type", "application/json"),
+        headers={name: resp.headers[name] for name in TTS_AUDIO_HEADERS if name in resp.headers},
+    )
 
 
-@app.post("/voice_flow")
-async def voice_flow(audio: UploadFile = File(...)):
+def _stage_elapsed_ms(stage: str, start: float) -> float:
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    timing.observe_stage(stage, elapsed_ms)
+    return elapsed_ms
+
+
+async def text_flow_stages(
+    text: str, speak: bool = True, llm_call: Optional[Awaitable[Any]] = None
+) -> AsyncIterator[tuple[str, dict, float]]:
     """
-    Full pipeline:
-    1. Transcribe audio -> text
-    2. Send text to LLM -> command
-    3. Validate command
-    4. Synthesize response to speech
+    LLM -> validation -> TTS (skipped when ``speak`` is false) for text that is
+    already transcribed, yielding (stage, result, elapsed_ms) as each stage
+    finishes. ``llm_call`` is an LLM call already under way for this text (a
+    speculation hit), awaited instead of calling the LLM. Failures raise
+    HTTPException, as call_service does.
     """
-    # Step 1: Transcribe
-    files = {"audio": (audio.filename, await audio.read(), audio.content_type)}
-    stt_result = await call_service("POST", settings.stt_url, files=files)
-
-    text = stt_result.get("text")
-    if not text:
-        raise HTTPException(status_code=500, detail="STT service did not return text")
+    # "stop" and the like jump the LLM and TTS queues (see priority_keywords)
+    urgency = classify_text(text)
+    if urgency is not None:
+        escalate(urgency)
 
-    # Step 2: LLM inference
-    current_cid = correlation_id_ctx.get() or str(uuid.uuid4())
+    # LLM inference
+    current_cid = get_correlation_id()
     llm_payload = {"text": text, "correlation_id": current_cid}
-    llm_result = await call_service("POST", settings.llm_url, json=llm_payload)
+    start = time.perf_counter()
+    llm_result = await (llm_call or call_service("POST", "llm", json=llm_payload))
 
     if not isinstance(llm_result, dict) or "command" not in llm_result or "command_params" not in llm_result or "verbal_response" not in llm_result:
         raise HTTPException(status_code=500, detail="LLM service returned invalid response")
+    yield "llm", llm_result, _stage_elapsed_ms("llm", start)
 
-    # Step 3: Validation
+    # Validation
     validator_payload = {
         "command": llm_result["command"],
         "command_params": llm_result["command_params"]
     }
-    validator_payload.pop("correlation_id", None)  # Remove if present to match ExecuteRequest
-    validator_result = await call_service("POST", settings.validator_url, json=validator_payload)
+    start = time.perf_counter()
+    validator_result = await call_service("POST", "validator", json=validator_payload)
 
     # Check if validation was successful (assuming 200 status indicates success)
     if validator_result.get("status_code", 200) != 200:
         logger.error("validation_failed", correlation_id=current_cid, detail=validator_result)
         raise HTTPException(status_code=400, detail="Command validation failed", headers={settings.correlation_header: current_cid})
+    yield "validator", validator_result, _stage_elapsed_ms("validator", start)
 
-    # Step 4: TTS with verbal_response
+    if not speak:
+        return
+
+    # TTS with verbal_response
     tts_payload = {
         "text": llm_result["verbal_response"],
         "correlation_id": current_cid
     }
-    tts_result = await call_service("POST", settings.tts_url, json=tts_payload)
+    if settings.tts_format:
+        tts_payload["format"] = settings.tts_format
+    if settings.tts_sample_rate:
+        tts_payload["sample_rate"] = settings.tts_sample_rate
+    start = time.perf_counter()
+    tts_resp = await call_service("POST", "tts", raw=True, json=tts_payload)
+    # Nothing here reads the audio: pass the body through instead of decoding it
+    yield "tts", passthrough_json(tts_resp.content), _stage_elapsed_ms("tts", start)
 
-    return {
-        "stt": stt_result,
-        "llm": llm_result,
-        "validator": validator_result,
-        "tts": tts_result,
-    }
+
+async def voice_flow_stages(audio: UploadFile) -> AsyncIterator[tuple[str, dict, float]]:
+    """
+    Run the pipeline one stage at a time, yielding (stage, result, elapsed_ms)
+    as soon as each stage finishes:
+    1. Transcribe audio -> text
+    2. Send text to LLM -> command
+    3. Validate command
+    4. Synthesize response to speech
+    With ``speculative_llm``, step 2 may already be under way during step 1,
+    on STT's partial transcript; the STT result then carries the
+    ``speculation`` outcome.
+    Failures raise HTTPException, as call_service does.
+    """
+    # Step 1: Transcribe
+    start = time.perf_counter()
+    spec = None
+    if settings.speculative_llm:
+        stt_result, spec = await transcribe_speculatively(audio)
+    else:
+        stt_result = await transcribe_upload(audio)
+    text = stt_result.get("text")
+    if not text:
+        if spec is not None:
+            await spec.cancel()
+        raise HTTPException(status_code=500, detail="STT service did not return text")
+    llm_call = None
+    if settings.speculative_llm:
+        llm_call, stt_result["speculation"] = await settle_speculation(spec, text)
+    yield "stt", stt_result, _stage_elapsed_ms("stt", start)
+
+    # Steps 2-4
+    try:
+        async for stage in text_flow_stages(text, llm_call=llm_call):
+            yield stage
+    finally:
+        if spec is not None and not spec.task.done():
+            spec.task.cancel()  # the flow was abandoned before the LLM stage
+
+
+@app.post("/voice_flow")
+async def voice_flow(audio: UploadFile = File(...)):
+    """Full pipeline (see voice_flow_stages); returns all stage results at once."""
+    start = time.perf_counter()
+    results = {stage: result async for stage, result, _ in voice_flow_stages(audio)}
+    _stage_elapsed_ms("voice_flow", start)
+    # Returned as a response so FastAPI does not walk the results with jsonable_encoder
+    return FastJSONResponse(results)
+
+
+@app.post("/text_flow")
+async def text_flow(request: TextFlowRequest):
+    """
+    Pipeline for clients that already have text: LLM -> validation -> TTS in one
+    call, TTS skipped with ``"speak": false``. Same result shape as /voice_flow
+    without the "stt" entry.
+    """
+    start = time.perf_counter()
+    results = {stage: result async for stage, result, _ in text_flow_stages(request.text, request.speak)}
+    _stage_elapsed_ms("text_flow", start)
+    return FastJSONResponse(results)
+
+
+async def _text_flow_item(index: int, item: TextFlowRequest, slots: asyncio.Semaphore) -> dict[str, Any]:
+    """One batch item; failures are reported in the item instead of failing the batch."""
+    async with slots:
+        # Own correlation ID per item (<request id>.<index>): the validator treats a
+        # repeated X-Correlation-ID as a retry and would replay the first item's answer
+        bind_child(str(index))
+        start = time.perf_counter()
+        entry: dict[str, Any] = {"index": index, "correlation_id": get_correlation_id()}
+        stage = "llm"
+        try:
+            async for stage, result, _ in text_flow_stages(item.text, item.speak):
+                entry[stage] = result
+                stage = _NEXT_STAGE.get(stage, stage)
+        except HTTPException as exc:
+            logger.warning("text_flow_item_failed", index=index, stage=stage, status_code=exc.status_code, detail=str(exc.detail))
+            entry.update(status="error", stage=stage, error={"status_code": exc.status_code, "message": str(exc.detail)})
+        else:
+            entry["status"] = "ok"
+        entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return entry
+
+
+@app.post("/text_flow/batch")
+async def text_flow_batch(request: TextFlowBatchRequest):
+    """
+    Run /text_flow for every item, at most ``text_flow_batch_concurrency`` at a
+    time. Results keep the request order; each carries its own status.
+    """
+    if len(request.items) > settings.text_flow_batch_max_items:
+        raise HTTPException(
+            status_code=422, detail=f"Batch too large: at most {settings.text_flow_batch_max_items} items"
+        )
+    start = time.perf_counter()
+    slots = asyncio.Semaphore(max(1, settings.text_flow_batch_concurrency))
+    results = await asyncio.gather(*(_text_flow_item(i, item, slots) for i, item in enumerate(request.items)))
+    failed = sum(1 for r in results if r["status"] != "ok")
+    total_ms = _stage_elapsed_ms("text_flow_batch", start)
+    return FastJSONResponse({
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "total_ms": round(total_ms, 1),
+        "results": results,
+    })
+
+
+def _ndjson(event: dict[str, Any]) -> bytes:
+    return json_dumps(event) + b"\n"
+
+
+@app.post("/voice_flow/stream")
+async def voice_flow_stream(audio: UploadFile = File(...)):
+    """
+    Same pipeline as /voice_flow, streamed as NDJSON: one line per stage as it
+    completes, {"stage", "status": "ok", "elapsed_ms", "total_ms", "data"},
+    then a final {"stage": "done"} line. A failing stage produces a
+    {"status": "error", "error": {...}} line and ends the stream.
+    """
+    flow_start = time.perf_counter()
+    stages = voice_flow_stages(audio)
+    # Run STT before returning: the upload is closed once the endpoint returns
+    try:
+        first: Any = await stages.__anext__()
+    except HTTPException as exc:
+        first = exc
+
+    async def remaining() -> AsyncIterator[tuple[str, dict, float]]:
+        if isinstance(first, HTTPException):
+            raise first
+        yield first
+        async for item in stages:
+            yield item
+
+    async def events() -> AsyncIterator[bytes]:
+        stage = "stt"
+        try:
+            async for stage, result, elapsed_ms in remaining():
+                yield _ndjson({
+                    "stage": stage,
+                    "status": "ok",
+                    "elapsed_ms": round(elapsed_ms, 1),
+                    "total_ms": round((time.perf_counter() - flow_start) * 1000, 1),
+                    "timing": timing.last_call(stage),
+                    "data": result,
+                })
+                stage = _NEXT_STAGE.get(stage, stage)
+        except HTTPException as exc:
+            logger.warning("voice_flow_stream_stage_failed", stage=stage, status_code=exc.status_code, detail=str(exc.detail))
+            yield _ndjson({
+                "stage": stage,
+                "status": "error",
+                "total_ms": round((time.perf_counter() - flow_start) * 1000, 1),
+                "error": {"status_code": exc.status_code, "message": str(exc.detail)},
+            })
+            return
+        total_ms = _stage_elapsed_ms("voice_flow", flow_start)
+        yield _ndjson({"stage": "done", "status": "ok", "total_ms": round(total_ms, 1)})
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 # ---------- Global Error Handlers ----------
@@ -294,7 +771,7 @@ def error_response(message: str, status_code: int, error_type: str = "Error") ->
             "error": {
                 "type": error_type,
                 "message": message,
-                "correlation_id": correlation_id_ctx.get() or "",
+                "correlation_id": get_correlation_id(),
             }
         },
     )
@@ -319,4 +796,12 @@ async def on_startup():
     configure_logging()
     init_tracing(app)
     init_metrics(app)
+    for client in downstream.values():
+        client.start_health_checks()
     logger.info("startup_complete")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for client in downstream.values():
+        await client.aclose()
@@ -0,0 +1,491 @@
+# resilience.py
+"""
+Downstream call protection for the orchestrator.
+
+Every service (stt, llm, validator, tts) gets one ServiceClient holding:
+
+- a pooled httpx.AsyncClient, reused across requests instead of one per call;
+- a CircuitBreaker: after ``failure_threshold`` consecutive failures
+  (connection errors, timeouts, 502/503/504) calls fail fast for
+  ``reset_timeout_sec``, then a single probe decides whether to close again.
+  A 500 is the service's answer to that request (e.g. the LLM's unparseable
+  output) and counts neither way;
+- a LatencyTracker: the timeout follows observed latency,
+  ``clamp(p99 * multiplier, floor, ceiling)``, so a stuck replica is given up
+  on in seconds instead of minutes; the configured ceiling applies until
+  enough samples exist. Timed-out calls are recorded too, so a run of fast
+  calls cannot shrink the timeout below what slower ones need for good;
+- bounded retries with full-jitter exponential backoff, only for services
+  listed as idempotent (STT by default). The validator's /execute_command
+  queues a robot command and is not retried: a reply lost after the command
+  ran would run it again on another replica, or once its replay cache
+  (per process, DEDUP_TTL_SEC) has expired;
+- optional hedging: when a service has several replicas and the first
+  attempt is slower than its p95, a second copy goes to another replica and
+  the first good answer wins.
+
+A service may have several replicas. Each call goes to the replica with the
+fewest requests in flight (``least_outstanding``) or the better of two random
+picks (``p2c``). Replicas failing ``eject_after_failures`` times in a row, on
+real calls or on the periodic health check, are ejected until a health check
+passes again (or ``eject_duration_sec`` elapses when checks are off). If every
+replica is ejected, all of them are used again rather than failing the call.
+
+Breaker state, timeouts, retries, hedges and per-replica in-flight counts are exported as Prometheus
+metrics when prometheus_client is installed.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    from prometheus_client import Counter, Gauge  # type: ignore
+except ImportError:
+    Counter = Gauge = None
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BALANCING_POLICIES = ("least_outstanding", "p2c")
+
+# Responses worth another attempt (the request never reached a healthy worker); also the only
+# statuses that count against the breaker and the replica
+RETRYABLE_STATUS = frozenset({502, 503, 504})
+
+if Gauge is not None:
+    BREAKER_STATE = Gauge(
+        "orchestrator_circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ["service"]
+    )
+    BREAKER_TRANSITIONS = Counter(
+        "orchestrator_circuit_breaker_transitions_total", "Circuit breaker state changes", ["service", "state"]
+    )
+    BREAKER_REJECTED = Counter(
+        "orchestrator_circuit_breaker_rejected_total", "Calls failed fast by an open breaker", ["service"]
+    )
+    TIMEOUT_SECONDS = Gauge(
+        "orchestrator_downstream_timeout_seconds", "Current adaptive timeout per service", ["service"]
+    )
+    RETRIES = Counter("orchestrator_downstream_retries_total", "Retried downstream calls", ["service"])
+    HEDGES = Counter(
+        "orchestrator_downstream_hedges_total", "Hedged downstream calls by winner", ["service", "winner"]
+    )
+    INFLIGHT = Gauge("orchestrator_downstream_inflight", "Requests in flight per replica", ["service", "replica"])
+    EJECTED = Gauge("orchestrator_downstream_ejected", "1 while a replica is ejected", ["service", "replica"])
+else:
+    BREAKER_STATE = BREAKER_TRANSITIONS = BREAKER_REJECTED = TIMEOUT_SECONDS = RETRIES = HEDGES = None
+    INFLIGHT = EJECTED = None
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"Circuit open for {service}")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> (after a cooldown) half-open -> closed/open."""
+
+    def __init__(self, service: str, failure_threshold: int = 5, reset_timeout_sec: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_sec = reset_timeout_sec
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._export()
+
+    def _export(self) -> None:
+        if BREAKER_STATE is not None:
+            BREAKER_STATE.labels(service=self.service).set(_STATE_VALUES[self.state])
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            self._export()
+            if BREAKER_TRANSITIONS is not None:
+                BREAKER_TRANSITIONS.labels(service=self.service, state=state).inc()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go out now."""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.reset_timeout_sec - self._clock()
+            if remaining > 0:
+                self._reject(remaining)
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self._reject(self.reset_timeout_sec)
+            self._probe_in_flight = True
+
+    def _reject(self, retry_after: float) -> None:
+        if BREAKER_REJECTED is not None:
+            BREAKER_REJECTED.labels(service=self.service).inc()
+        raise CircuitOpenError(self.service, retry_after)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+            self._transition(OPEN)
+
+    def record_cancelled(self) -> None:
+        """A call abandoned by the caller (e.g. the losing hedge) says nothing about health."""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class LatencyTracker:
+    """
+    Sliding window of round trips (seconds) and the timeout derived from it.
+    Holds successful calls and, at the timeout they hit, timed-out ones.
+    """
+
+    def __init__(self, window: int = 256, min_samples: int = 20, multiplier: float = 3.0,
+                 floor_sec: float = 1.0, ceiling_sec: float = 240.0):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.floor_sec = floor_sec
+        self.ceiling_sec = ceiling_sec
+        self._sorted: Optional[list] = None
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        return self._sorted[min(int(q * len(self._sorted)), len(self._sorted) - 1)]
+
+    def timeout(self) -> float:
+        p99 = self.quantile(0.99)
+        if p99 is None:
+            return self.ceiling_sec
+        return min(max(p99 * self.multiplier, self.floor_sec), self.ceiling_sec)
+
+    def snapshot(self) -> dict:
+        def ms(q):
+            value = self.quantile(q)
+            return round(value * 1000, 1) if value is not None else None
+        return {"samples": len(self.samples), "p50_ms": ms(0.5), "p95_ms": ms(0.95), "p99_ms": ms(0.99),
+                "timeout_sec": round(self.timeout(), 3)}
+
+
+class Replica:
+    """One endpoint of a service, with its in-flight count and ejection state."""
+
+    def __init__(self, service: str, url: str, health_path: Optional[str] = None,
+                 eject_after_failures: int = 3, eject_duration_sec: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self.url = url
+        parts = urlsplit(url)
+        self.health_url = f"{parts.scheme}://{parts.netloc}{health_path}" if health_path else None
+        self.eject_after_failures = max(1, eject_after_failures)
+        self.eject_duration_sec = eject_duration_sec
+        self._clock = clock
+        self.inflight = 0
+        self.served = 0
+        self.failures = 0
+        self._ejected_until: Optional[float] = None
+        self._export_ejected()
+
+    def _export_ejected(self) -> None:
+        if EJECTED is not None:
+            EJECTED.labels(service=self.service, replica=self.url).set(1 if self._ejected_until is not None else 0)
+
+    @property
+    def ejected(self) -> bool:
+        if self._ejected_until is not None and self._clock() >= self._ejected_until:
+            self._ejected_until = None
+            self._export_ejected()
+        return self._ejected_until is not None
+
+    def acquire(self) -> None:
+        self.inflight += 1
+        self.served += 1
+        if INFLIGHT is not None:
+            INFLIGHT.labels(service=self.service, replica=self.url).inc()
+
+    def release(self) -> None:
+        self.inflight -= 1
+        if INFLIGHT is not None:
+            INFLIGHT.labels(service=self.service, replica=self.url).dec()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self._ejected_until is not None:
+            self._ejected_until = None
+            self._export_ejected()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.eject_after_failures and self._ejected_until is None:
+            self._ejected_until = self._clock() + self.eject_duration_sec
+            self._export_ejected()
+
+    def snapshot(self) -> dict:
+        return {"url": self.url, "inflight": self.inflight, "served": self.served,
+                "consecutive_failures": self.failures, "ejected": self.ejected}
+
+
+def backoff_delay(attempt: int, base_sec: float, max_sec: float) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2**attempt)]."""
+    return random.uniform(0, min(max_sec, base_sec * (2 ** attempt)))
+
+
+class ServiceClient:
+    """All calls to one downstream service go through here."""
+
+    def __init__(
+        self,
+        service: str,
+        urls: Sequence[str],
+        breaker: CircuitBreaker,
+        latency: LatencyTracker,
+        retries: int = 0,
+        backoff_base_sec: float = 0.1,
+        backoff_max_sec: float = 2.0,
+        hedge: bool = False,
+        hedge_min_delay_sec: float = 0.05,
+        connect_timeout_sec: float = 5.0,
+        max_connections: int = 100,
+        balancing: str = "least_outstanding",
+        health_path: Optional[str] = None,
+        health_check_interval_sec: float = 5.0,
+        health_check_timeout_sec: float = 2.0,
+        eject_after_failures: int = 3,
+        eject_duration_sec: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if not urls:
+            raise ValueError(f"No URL configured for {service}")
+        if balancing not in BALANCING_POLICIES:
+            raise ValueError(f"Unknown balancing policy {balancing!r}, expected one of {BALANCING_POLICIES}")
+        self.service = service
+        self.replicas = [
+            Replica(service, url, health_path, eject_after_failures, eject_duration_sec)
+            for url in dict.fromkeys(urls)  # drop duplicates, keep order
+        ]
+        self.balancing = balancing
+        self.health_check_interval_sec = health_check_interval_sec
+        self.health_check_timeout_sec = health_check_timeout_sec
+        self.breaker = breaker
+        self.latency = latency
+        self.retries = max(0, retries)
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.hedge = hedge
+        self.hedge_min_delay_sec = hedge_min_delay_sec
+        self.connect_timeout_sec = connect_timeout_sec
+        self._health_task: Optional[asyncio.Task] = None
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        seconds = self.latency.timeout()
+        if TIMEOUT_SECONDS is not None:
+            TIMEOUT_SECONDS.labels(service=self.service).set(seconds)
+        return httpx.Timeout(seconds, connect=min(self.connect_timeout_sec, seconds))
+
+    def _pick(self, exclude: Optional[Replica] = None) -> Replica:
+        candidates = [r for r in self.replicas if r is not exclude and not r.ejected]
+        if not candidates:
+            # Everything ejected: spread over all replicas rather than refuse the call
+            candidates = [r for r in self.replicas if r is not exclude] or self.replicas
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.balancing == "p2c":
+            a, b = random.sample(candidates, 2)
+            return a if a.inflight <= b.inflight else b
+        fewest = min(r.inflight for r in candidates)
+        return random.choice([r for r in candidates if r.inflight == fewest])
+
+    async def _attempt(self, method: str, replica: Replica, kwargs: dict) -> httpx.Response:
+        self.breaker.before_call()
+        replica.acquire()
+        start = time.perf_counter()
+        try:
+            resp = await self._client.request(method, replica.url, timeout=self._timeout(), **kwargs)
+        except asyncio.CancelledError:
+            self.breaker.record_cancelled()
+            raise
+        except httpx.RequestError as e:
+            if isinstance(e, httpx.ReadTimeout):
+                # The call took at least this long: widen the window instead of timing out again and again
+                self.latency.record(time.perf_counter() - start)
+            self.breaker.record_failure()
+            replica.record_failure()
+            raise
+        except Exception:
+            # Not the service's fault (e.g. a bad URL or body): only free a half-open probe slot
+            self.breaker.record_cancelled()
+            raise
+        finally:
+            replica.release()
+        self._record_status(resp.status_code, replica)
+        if resp.status_code < 500:
+            self.latency.record(time.perf_counter() - start)
+        return resp
+
+    def _record_status(self, status: int, replica: Replica) -> None:
+        if status in RETRYABLE_STATUS:
+            self.breaker.record_failure()
+            replica.record_failure()
+        elif status >= 500:
+            # The replica is up and answered this request with an error of its own
+            self.breaker.record_cancelled()
+        else:
+            self.breaker.record_success()
+            replica.record_success()
+
+    async def _hedged(self, method: str, kwargs: dict) -> httpx.Response:
+        first = self._pick()
+        primary = asyncio.create_task(self._attempt(method, first, kwargs))
+        delay = max(self.latency.quantile(0.95) or self.latency.timeout(), self.hedge_min_delay_sec)
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.create_task(self._attempt(method, self._pick(exclude=first), kwargs))
+        pending = {primary, hedge}
+        last: Optional[asyncio.Task] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                        if HEDGES is not None:
+                            HEDGES.labels(service=self.service, winner="hedge" if task is hedge else "primary").inc()
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        return last.result()  # both failed: re-raise / return the later failure
+
+    async def request(self, method: str, **kwargs) -> httpx.Response:
+        """
+        Send ``method`` to one of the service's replicas with retries / hedging as configured.
+        Returns the final response; raises CircuitOpenError or httpx.RequestError.
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.hedge and len(self.replicas) > 1:
+                    resp = await self._hedged(method, kwargs)
+                else:
+                    resp = await self._attempt(method, self._pick(), kwargs)
+            except httpx.RequestError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if resp.status_code not in RETRYABLE_STATUS or attempt >= self.retries:
+                    return resp
+            if RETRIES is not None:
+                RETRIES.labels(service=self.service).inc()
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base_sec, self.backoff_max_sec))
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, method: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Like request(), with the response body left unread so it can be consumed
+        as it arrives (e.g. NDJSON progress events). No retries or hedging, since
+        part of the answer may already have been used. The adaptive timeout applies
+        to each read rather than to the whole response, and the stream's duration
+        does not feed the latency tracker.
+        """
+        replica = self._pick()
+        self.breaker.before_call()
+        replica.acquire()
+        recorded = False
+        try:
+            async with self._client.stream(method, replica.url, timeout=self._timeout(), **kwargs) as resp:
+                self._record_status(resp.status_code, replica)
+                recorded = True
+                yield resp
+        except asyncio.CancelledError:
+            self.breaker.record_cancelled()
+            raise
+        except httpx.RequestError:
+            self.breaker.record_failure()
+            replica.record_failure()
+            raise
+        except Exception:
+            # Neither a local error nor one raised by the caller while reading says anything about the service
+            if not recorded:
+                self.breaker.record_cancelled()
+            raise
+        finally:
+            replica.release()
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            resp = await self._client.get(replica.health_url, timeout=self.health_check_timeout_sec)
+            healthy = resp.status_code < 400
+        except httpx.RequestError:
+            healthy = False
+        if healthy:
+            replica.record_success()
+        else:
+            replica.record_failure()
+
+    async def check_health(self) -> None:
+        """Probe every replica's health endpoint once."""
+        await asyncio.gather(*(self._check(r) for r in self.replicas if r.health_url))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval_sec)
+            await self.check_health()
+
+    def start_health_checks(self) -> None:
+        """Start the periodic health check (no-op without a health path or interval)."""
+        if self._health_task is not None or self.health_check_interval_sec <= 0:
+            return
+        if any(r.health_url for r in self.replicas):
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await self._client.aclose()
+
+    def snapshot(self) -> dict:
+        return {
+            "balancing": self.balancing,
+            "replicas": [r.snapshot() for r in self.replicas],
+            "breaker": self.breaker.snapshot(),
+            "latency": self.latency.snapshot(),
+            "retries": self.retries,
+            "hedge": self.hedge and len(self.replicas) > 1,
+        }
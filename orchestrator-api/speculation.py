@@ -0,0 +1,115 @@
+# speculation.py
+"""
+Speculative LLM calls on partial transcripts.
+
+With ``speculative_llm`` on, the orchestrator asks STT for NDJSON progress.
+STT sends a quick draft transcript (``partial``, with a confidence) before
+the final one. A partial at or above ``speculation_min_confidence`` starts the
+LLM right away, while STT is still working. When the final transcript
+arrives:
+
+- hit: it matches the partial after :func:`normalize_transcript`; the
+  running (or finished) LLM call is used as the LLM stage;
+- miss: the speculative call is cancelled. Its connection is closed, and
+  the LLM service drops the request from its queue or stops generating
+  (see shato_common.priority.cancel_on_disconnect). The LLM then runs on the
+  final text as usual.
+
+The latency saved by a hit is how long the LLM had been running when the
+final transcript arrived (its full duration if it had already finished).
+Outcomes and savings are kept for ``GET /speculation`` and, when
+prometheus_client is installed, exported as metrics.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Optional
+
+try:
+    from prometheus_client import Counter, Histogram  # type: ignore
+except ImportError:
+    Counter = Histogram = None
+
+HIT, MISS, SKIPPED = "hit", "miss", "skipped"
+
+if Counter is not None:
+    OUTCOMES = Counter(
+        "orchestrator_speculation_total",
+        "Voice turns by speculation outcome (hit, miss, skipped: no confident partial)",
+        ["outcome"],
+    )
+    SAVED_SECONDS = Histogram(
+        "orchestrator_speculation_saved_seconds",
+        "LLM time overlapped with STT on speculation hits",
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+    )
+else:
+    OUTCOMES = SAVED_SECONDS = None
+
+
+def normalize_transcript(text: str) -> str:
+    """Case, punctuation and spacing differences between draft and final transcripts do not count."""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+class Speculation:
+    """One speculative LLM call started on a partial transcript."""
+
+    def __init__(self, text: str, call: Awaitable[Any]):
+        self.text = text
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.task = asyncio.ensure_future(call)
+        self.task.add_done_callback(self._done)
+
+    def _done(self, _task: asyncio.Future) -> None:
+        self.finished = time.perf_counter()
+
+    def matches(self, final_text: str) -> bool:
+        return normalize_transcript(self.text) == normalize_transcript(final_text)
+
+    def saved_ms(self) -> float:
+        """LLM time already behind us, measured when the final transcript arrives."""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    async def cancel(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except BaseException:  # cancelled, or failed before it could be: either way discarded
+            pass
+
+
+class SpeculationStats:
+    """Outcome counts and latency saved over the last ``window`` hits."""
+
+    def __init__(self, window: int = 512):
+        self.counts = {HIT: 0, MISS: 0, SKIPPED: 0}
+        self.saved_total_ms = 0.0
+        self._saved: Deque[float] = deque(maxlen=window)
+
+    def record(self, outcome: str, saved_ms: float = 0.0) -> None:
+        self.counts[outcome] += 1
+        if OUTCOMES is not None:
+            OUTCOMES.labels(outcome=outcome).inc()
+        if outcome == HIT:
+            self.saved_total_ms += saved_ms
+            self._saved.append(saved_ms)
+            if SAVED_SECONDS is not None:
+                SAVED_SECONDS.observe(saved_ms / 1000)
+
+    def snapshot(self) -> dict:
+        speculated = self.counts[HIT] + self.counts[MISS]
+        ordered = sorted(self._saved)
+        return {
+            **self.counts,
+            "hit_rate": round(self.counts[HIT] / speculated, 3) if speculated else None,
+            "saved_total_ms": round(self.saved_total_ms, 1),
+            "saved_p50_ms": round(ordered[len(ordered) // 2], 1) if ordered else None,
+            "saved_mean_ms": round(sum(ordered) / len(ordered), 1) if ordered else None,
+        }
+
+
+stats = SpeculationStats()
@@ -0,0 +1,13 @@
+import os
+import sys
+
+
+# The orchestrator's modules are top-level (main, config, timing); make them importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Shared middleware package (installed from common/ in the Docker image)
+COMMON_ROOT = os.path.abspath(os.path.join(PROJECT_ROOT, "..", "common"))
+if COMMON_ROOT not in sys.path:
+    sys.path.insert(0, COMMON_ROOT)
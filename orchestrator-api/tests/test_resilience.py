@@ -0,0 +1,369 @@
+import asyncio
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, LatencyTracker, Replica, ServiceClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _client(handler, urls=("http://a/x",), **kwargs):
+    kwargs.setdefault("breaker", CircuitBreaker("svc", failure_threshold=3, reset_timeout_sec=30))
+    kwargs.setdefault("latency", LatencyTracker(min_samples=1, floor_sec=0.5, ceiling_sec=5))
+    kwargs.setdefault("backoff_base_sec", 0.0)
+    kwargs.setdefault("health_check_interval_sec", 0)
+    return ServiceClient("svc", list(urls), transport=httpx.MockTransport(handler), **kwargs)
+
+
+# ---------- CircuitBreaker ----------
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("svc", failure_threshold=3, reset_timeout_sec=30, clock=FakeClock())
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.failures == 0
+
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == pytest.approx(30)
+
+
+def test_half_open_allows_one_probe_then_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout_sec=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # a second call while the probe is out
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=5, reset_timeout_sec=30, clock=clock)
+    for _ in range(5):
+        breaker.before_call()
+        breaker.record_failure()
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout_sec=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_cancelled()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+
+# ---------- LatencyTracker ----------
+
+def test_timeout_uses_ceiling_until_enough_samples():
+    latency = LatencyTracker(min_samples=3, multiplier=3.0, floor_sec=1.0, ceiling_sec=60.0)
+    latency.record(2.0)
+    latency.record(2.0)
+    assert latency.timeout() == 60.0
+    latency.record(2.0)
+    assert latency.timeout() == pytest.approx(6.0)
+
+
+def test_timeout_is_clamped():
+    latency = LatencyTracker(min_samples=1, multiplier=3.0, floor_sec=1.0, ceiling_sec=10.0)
+    latency.record(0.01)
+    assert latency.timeout() == 1.0
+    latency.record(100.0)
+    assert latency.timeout() == 10.0
+    assert latency.quantile(0.0) == 0.01
+
+
+# ---------- Replica ----------
+
+def test_replica_ejected_after_failures_until_duration_passes():
+    clock = FakeClock()
+    replica = Replica("svc", "http://a:1/x", health_path="/health", eject_after_failures=2,
+                      eject_duration_sec=10, clock=clock)
+    assert replica.health_url == "http://a:1/health"
+    replica.record_failure()
+    assert not replica.ejected
+    replica.record_failure()
+    assert replica.ejected
+    clock.now += 10
+    assert not replica.ejected
+
+
+# ---------- ServiceClient ----------
+
+@pytest.mark.asyncio
+async def test_retries_retryable_status_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) < 3 else 200)
+
+    client = _client(handler, retries=2)
+    resp = await client.request("GET")
+    assert resp.status_code == 200
+    assert len(calls) == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_retries_without_budget():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    client = _client(handler, retries=0)
+    with pytest.raises(httpx.ConnectError):
+        await client.request("GET")
+    assert len(calls) == 1
+    assert client.breaker.failures == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    client = _client(handler, breaker=CircuitBreaker("svc", failure_threshold=2, reset_timeout_sec=30))
+    for _ in range(2):
+        assert (await client.request("GET")).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        await client.request("GET")
+    assert len(calls) == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_prefers_idle_replica():
+    client = _client(lambda request: httpx.Response(200), urls=("http://a/x", "http://b/x"))
+    busy, idle = client.replicas
+    busy.acquire()
+    assert all(client._pick() is idle for _ in range(20))
+    busy.release()
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_ejected_replica_is_skipped_unless_all_are_ejected():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.host)
+        return httpx.Response(503 if request.url.host == "a" else 200)
+
+    client = _client(handler, urls=("http://a/x", "http://b/x"), eject_after_failures=1,
+                     breaker=CircuitBreaker("svc", failure_threshold=100))
+    while "a" not in seen:
+        await client.request("GET")
+    seen.clear()
+    for _ in range(5):
+        await client.request("GET")
+    assert seen == ["b"] * 5
+
+    client.replicas[1].record_failure()
+    assert {client._pick().url for _ in range(50)} == {"http://a/x", "http://b/x"}
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_health_check_restores_an_ejected_replica():
+    healthy = {"a": False}
+
+    def handler(request):
+        return httpx.Response(200 if healthy.get(request.url.host, True) else 503)
+
+    client = _client(handler, urls=("http://a/x", "http://b/x"), health_path="/health", eject_after_failures=1)
+    await client.check_health()
+    assert client.replicas[0].ejected and not client.replicas[1].ejected
+    healthy["a"] = True
+    await client.check_health()
+    assert not client.replicas[0].ejected
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_hedge_goes_to_another_replica_and_first_answer_wins():
+    cancelled = []
+
+    async def handler(request):
+        if request.url.host == "slow":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(request.url.host)
+                raise
+        return httpx.Response(200, json={"host": request.url.host})
+
+    latency = LatencyTracker(min_samples=1, floor_sec=10, ceiling_sec=10)
+    latency.record(0.01)  # p95 of 10 ms: hedge after 10 ms
+    client = _client(handler, urls=("http://slow/x", "http://fast/x"), hedge=True, hedge_min_delay_sec=0.01,
+                     latency=latency)
+    client.replicas[1].acquire()  # make the slow replica the first pick
+    resp = await client.request("GET")
+    client.replicas[1].release()
+
+    assert resp.json() == {"host": "fast"}
+    await asyncio.sleep(0)
+    assert cancelled == ["slow"]
+    assert client.breaker.state == CLOSED and client.breaker.failures == 0
+    assert all(r.inflight == 0 for r in client.replicas)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(200)
+
+    client = _client(handler, urls=("http://a/x", "http://b/x"), hedge=True, hedge_min_delay_sec=1.0)
+    await client.request("GET")
+    assert len(hosts) == 1
+    await client.aclose()
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(10):
+        assert 0 <= resilience.backoff_delay(attempt, 0.1, 2.0) <= 2.0
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_during_half_open_probe_frees_the_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout_sec=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+
+    broken = [True]
+
+    def handler(request):
+        if broken[0]:
+            raise ValueError("unexpected")
+        return httpx.Response(200)
+
+    client = _client(handler, breaker=breaker)
+    with pytest.raises(ValueError):
+        await client.request("GET")
+    assert breaker.state == HALF_OPEN
+    broken[0] = False
+    # The next probe goes out instead of being rejected forever
+    assert (await client.request("GET")).status_code == 200
+    assert breaker.state == CLOSED
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_local_errors_do_not_count_against_a_closed_breaker():
+    def handler(request):
+        raise ValueError("bad body")
+
+    client = _client(handler, breaker=CircuitBreaker("svc", failure_threshold=1))
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await client.request("GET")
+    assert client.breaker.state == CLOSED and client.breaker.failures == 0
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_while_streaming_frees_the_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout_sec=30, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+
+    def handler(request):
+        raise ValueError("unexpected")
+
+    client = _client(handler, breaker=breaker)
+    with pytest.raises(ValueError):
+        async with client.stream("GET"):
+            pass
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_caller_error_while_streaming_is_not_a_failure():
+    client = _client(lambda request: httpx.Response(200, text="ok"))
+    with pytest.raises(KeyError):
+        async with client.stream("GET"):
+            raise KeyError("caller bug")
+    assert client.breaker.failures == 0
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_internal_server_error_neither_opens_the_breaker_nor_ejects():
+    # e.g. the LLM's 500 "Failed to parse JSON from model": an answer about this request, not the replica
+    client = _client(lambda request: httpx.Response(500), breaker=CircuitBreaker("svc", failure_threshold=2),
+                     eject_after_failures=1)
+    for _ in range(5):
+        assert (await client.request("GET")).status_code == 500
+    assert client.breaker.state == CLOSED and client.breaker.failures == 0
+    assert not client.replicas[0].ejected
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_calls_widen_the_timeout():
+    slow = [False]
+
+    async def handler(request):
+        if slow[0]:
+            await asyncio.sleep(0.05)
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200)
+
+    latency = LatencyTracker(min_samples=1, multiplier=3.0, floor_sec=0.01, ceiling_sec=5)
+    client = _client(handler, latency=latency, breaker=CircuitBreaker("svc", failure_threshold=100))
+    for _ in range(20):
+        await client.request("GET")
+    assert latency.timeout() == 0.01
+    slow[0] = True
+    with pytest.raises(httpx.ReadTimeout):
+        await client.request("GET")
+    assert latency.timeout() >= 0.15
+    await client.aclose()
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from speculation import HIT, MISS, SKIPPED, Speculation, SpeculationStats, normalize_transcript
+
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize_transcript("Turn  left, ninety degrees!") == "turn left ninety degrees"
+    assert normalize_transcript("Don't stop.") == "don't stop"
+
+
+@pytest.mark.asyncio
+async def test_hit_keeps_the_finished_call():
+    async def llm():
+        return {"command": "rotate"}
+
+    spec = Speculation("Turn left.", llm())
+    assert await spec.task == {"command": "rotate"}
+    assert spec.matches("turn left")
+    saved = spec.saved_ms()
+    await asyncio.sleep(0.02)
+    # A finished call saved its whole duration, however late the final transcript arrives
+    assert spec.saved_ms() == saved
+
+
+@pytest.mark.asyncio
+async def test_miss_cancels_the_running_call():
+    cancelled = asyncio.Event()
+
+    async def llm():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    spec = Speculation("turn left", llm())
+    await asyncio.sleep(0)
+    assert not spec.matches("turn right")
+    await spec.cancel()
+    assert cancelled.is_set()
+    assert spec.task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_cancel_swallows_a_failed_call():
+    async def llm():
+        raise RuntimeError("llm down")
+
+    spec = Speculation("stop", llm())
+    await asyncio.sleep(0)
+    await spec.cancel()
+    assert spec.task.done()
+
+
+@pytest.mark.asyncio
+async def test_saved_time_grows_while_the_call_runs():
+    release = asyncio.Event()
+
+    async def llm():
+        await release.wait()
+
+    spec = Speculation("stop", llm())
+    first = spec.saved_ms()
+    await asyncio.sleep(0.02)
+    assert spec.saved_ms() >= first + 15
+    release.set()
+    await spec.task
+
+
+def test_stats_hit_rate_and_savings():
+    stats = SpeculationStats()
+    assert stats.snapshot()["hit_rate"] is None
+    stats.record(HIT, 100.0)
+    stats.record(HIT, 300.0)
+    stats.record(MISS)
+    stats.record(SKIPPED)
+    snapshot = stats.snapshot()
+    assert (snapshot[HIT], snapshot[MISS], snapshot[SKIPPED]) == (2, 1, 1)
+    assert snapshot["hit_rate"] == pytest.approx(0.667)
+    assert snapshot["saved_total_ms"] == 400.0
+    assert snapshot["saved_mean_ms"] == 200.0
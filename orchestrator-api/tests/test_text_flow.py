@@ -0,0 +1,106 @@
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import main
+import resilience
+from config import settings
+
+
+def _downstreams(handler):
+    return {
+        service: resilience.ServiceClient(
+            service, [url], breaker=resilience.CircuitBreaker(service), latency=resilience.LatencyTracker(),
+            health_check_interval_sec=0, transport=httpx.MockTransport(handler),
+        )
+        for service, url in (("llm", settings.llm_url), ("validator", settings.validator_url), ("tts", settings.tts_url))
+    }
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stub LLM, validator and TTS; returns the (service path, X-Correlation-ID, body) of every call."""
+    seen = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        seen.append((request.url.path, request.headers.get(settings.correlation_header), body))
+        if request.url.path == "/command":
+            if body["text"] == "mumble":
+                return httpx.Response(500, json={"detail": "Failed to parse JSON from model"})
+            return httpx.Response(200, json={
+                "command": "rotate",
+                "command_params": {"angle": 90, "direction": "clockwise"},
+                "verbal_response": f"On it: {body['text']}",
+            })
+        if request.url.path == "/execute_command":
+            return httpx.Response(200, json={"message": "Command validated", "data": body})
+        return httpx.Response(200, json={"audio_base64": "UklGRg==", "format": "wav"})
+
+    monkeypatch.setattr(main, "downstream", _downstreams(handler))
+    return seen
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_text_flow_runs_llm_validation_and_tts(client, calls):
+    resp = await client.post("/text_flow", json={"text": "turn right"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["llm"]["verbal_response"] == "On it: turn right"
+    assert body["validator"]["data"] == {"command": "rotate", "command_params": {"angle": 90, "direction": "clockwise"}}
+    assert body["tts"] == {"audio_base64": "UklGRg==", "format": "wav"}
+    assert [path for path, _, _ in calls] == ["/command", "/execute_command", "/speak"]
+    assert calls[2][2]["text"] == "On it: turn right"
+
+
+@pytest.mark.asyncio
+async def test_text_flow_without_speech_skips_tts(client, calls):
+    resp = await client.post("/text_flow", json={"text": "turn right", "speak": False})
+    assert resp.status_code == 200
+    assert set(resp.json()) == {"llm", "validator"}
+    assert [path for path, _, _ in calls] == ["/command", "/execute_command"]
+
+
+@pytest.mark.asyncio
+async def test_batch_over_the_limit_is_rejected_before_any_call(client, calls, monkeypatch):
+    monkeypatch.setattr(settings, "text_flow_batch_max_items", 2)
+    items = [{"text": "turn right", "speak": False}] * 3
+    resp = await client.post("/text_flow/batch", json={"items": items})
+    assert resp.status_code == 422
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_batch_items_get_their_own_correlation_ids(client, calls):
+    # Identical items: with one shared ID the validator would replay the first item's answer for the others
+    items = [{"text": "turn right", "speak": False}] * 3
+    resp = await client.post(
+        "/text_flow/batch", json={"items": items}, headers={settings.correlation_header: "batch-1"}
+    )
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert [r["correlation_id"] for r in results] == ["batch-1.0", "batch-1.1", "batch-1.2"]
+    validator_ids = sorted(cid for path, cid, _ in calls if path == "/execute_command")
+    assert validator_ids == ["batch-1.0", "batch-1.1", "batch-1.2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_item_does_not_fail_the_batch(client, calls):
+    items = [{"text": "turn right", "speak": False}, {"text": "mumble", "speak": False}]
+    resp = await client.post("/text_flow/batch", json={"items": items})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    ok, failed = body["results"]
+    assert ok["status"] == "ok" and "validator" in ok
+    assert failed["status"] == "error" and failed["stage"] == "llm"
+    assert failed["error"]["status_code"] == 500
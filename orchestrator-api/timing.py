@@ -0,0 +1,145 @@
+# timing.py
+"""
+Per-stage and per-downstream latency accounting for the orchestrator.
+
+Downstream services answer with ``Server-Timing: app;dur=<ms>, compute;dur=<ms>``:
+``app`` is the time the request spent inside the service, ``compute`` the part
+spent doing model/validation work. Combined with the round trip measured here,
+each call splits into
+
+- compute:  the service's own work
+- queue:    app - compute (waiting for a worker thread, a model lock, parsing)
+- transfer: round_trip - app (network, serialization, connection setup)
+
+Every call is recorded in a per-request list (surfaced as our own Server-Timing
+header) and, when prometheus_client is installed, in histograms.
+"""
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Iterator, Optional
+
+try:
+    from prometheus_client import Histogram  # type: ignore
+except ImportError:  # metrics are optional, like the instrumentator itself
+    Histogram = None
+
+try:
+    from opentelemetry import trace  # type: ignore
+    _tracer = trace.get_tracer("orchestrator")
+except ImportError:
+    _tracer = None
+
+# Voice turns range from tens of ms (validator) to tens of seconds (LLM on CPU)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram(
+        "orchestrator_stage_duration_seconds",
+        "Voice-flow stage latency as seen by the orchestrator",
+        ["stage"],
+        buckets=LATENCY_BUCKETS,
+    )
+    DOWNSTREAM_SECONDS = Histogram(
+        "orchestrator_downstream_duration_seconds",
+        "Downstream call latency split into round_trip, transfer, queue and compute",
+        ["service", "phase"],
+        buckets=LATENCY_BUCKETS,
+    )
+    QUEUE_SECONDS = Histogram(
+        "orchestrator_downstream_queue_seconds",
+        "Time downstream calls waited in the service before compute, by priority class",
+        ["service", "priority"],
+        buckets=LATENCY_BUCKETS,
+    )
+else:
+    STAGE_SECONDS = DOWNSTREAM_SECONDS = QUEUE_SECONDS = None
+
+_request_timings: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def parse_server_timing(value: Optional[str]) -> dict[str, float]:
+    """``"app;dur=12.5, compute;dur=10"`` -> ``{"app": 12.5, "compute": 10.0}``."""
+    metrics: dict[str, float] = {}
+    for entry in (value or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            key, _, dur = param.partition("=")
+            if name and key.strip() == "dur":
+                try:
+                    metrics[name] = float(dur)
+                except ValueError:
+                    pass
+    return metrics
+
+
+def split_phases(round_trip_ms: float, server_timing: dict[str, float]) -> dict[str, float]:
+    """Break one downstream call into phases (ms); only round_trip if the service sent no timing."""
+    phases = {"round_trip": round_trip_ms}
+    app_ms = server_timing.get("app")
+    compute_ms = server_timing.get("compute")
+    if app_ms is not None:
+        phases["transfer"] = max(round_trip_ms - app_ms, 0.0)
+        if compute_ms is not None:
+            phases["compute"] = compute_ms
+            phases["queue"] = max(app_ms - compute_ms, 0.0)
+    return phases
+
+
+def start_request() -> list:
+    """Begin collecting timings for the current request (call from middleware)."""
+    timings: list = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_call(service: str, phases: dict[str, float], priority: Optional[str] = None) -> dict[str, Any]:
+    entry = {"service": service, **{f"{k}_ms": round(v, 1) for k, v in phases.items()}}
+    if priority is not None:
+        entry["priority"] = priority
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append(entry)
+    if DOWNSTREAM_SECONDS is not None:
+        for phase, ms in phases.items():
+            DOWNSTREAM_SECONDS.labels(service=service, phase=phase).observe(ms / 1000)
+        if priority is not None and "queue" in phases:
+            QUEUE_SECONDS.labels(service=service, priority=priority).observe(phases["queue"] / 1000)
+    return entry
+
+
+def last_call(service: str) -> Optional[dict[str, Any]]:
+    """Most recent recorded call to ``service`` in this request."""
+    for entry in reversed(_request_timings.get() or []):
+        if entry["service"] == service:
+            return entry
+    return None
+
+
+def observe_stage(stage: str, ms: float) -> None:
+    if STAGE_SECONDS is not None:
+        STAGE_SECONDS.labels(stage=stage).observe(ms / 1000)
+
+
+def server_timing_header(timings: list, total_ms: float) -> str:
+    """Our own Server-Timing value: one entry per downstream phase, plus the total."""
+    parts = []
+    for entry in timings:
+        service = entry["service"]
+        for phase in ("round_trip", "transfer", "queue", "compute"):
+            ms = entry.get(f"{phase}_ms")
+            if ms is not None:
+                name = service if phase == "round_trip" else f"{service}-{phase}"
+                parts.append(f"{name};dur={ms}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """OpenTelemetry span when the SDK is installed (no-op tracer until tracing is initialized)."""
+    if _tracer is None:
+        with nullcontext() as s:
+            yield s
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as s:
+        yield s
@@ -1,18 +1,23 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
-def move_to(x: float, y: float) -> Dict[str, Any]:
+def move_to(x: float, y: float, robot: Optional[Any] = None) -> Dict[str, Any]:
     """
-    Stub hook that would instruct the robot to move to coordinates.
-    Returns a structured response for logging/testing.
+    Instruct the robot to move to coordinates.
+    Without a robot driver this is a stub that returns a structured response
+    for logging/testing.
     """
+    if robot is not None:
+        return robot.move_to(x, y)
     return {"status": "stubbed", "action": "move_to", "params": {"x": x, "y": y}}
 
 
-def rotate(angle: float, direction: str) -> Dict[str, Any]:
+def rotate(angle: float, direction: str, robot: Optional[Any] = None) -> Dict[str, Any]:
     """
-    Stub hook that would instruct the robot to rotate.
+    Instruct the robot to rotate.
     """
+    if robot is not None:
+        return robot.rotate(angle, direction)
     return {
         "status": "stubbed",
         "action": "rotate",
@@ -20,10 +25,14 @@ def rotate(angle: float, direction: str) -> Dict[str, Any]:
     }
 
 
-def start_patrol(route_id: str, speed: str = "medium", repeat_count: int = 1) -> Dict[str, Any]:
+def start_patrol(
+    route_id: str, speed: str = "medium", repeat_count: int = 1, robot: Optional[Any] = None
+) -> Dict[str, Any]:
     """
-    Stub hook that would instruct the robot to start a patrol.
+    Instruct the robot to start a patrol.
     """
+    if robot is not None:
+        return robot.start_patrol(route_id, speed, repeat_count)
     return {
         "status": "stubbed",
         "action": "start_patrol",
@@ -31,3 +40,20 @@ def start_patrol(route_id: str, speed: str = "medium", repeat_count: int = 1) ->
     }
 
 
+# Map command names to their hooks
+HOOKS = {
+    "move_to": move_to,
+    "rotate": rotate,
+    "start_patrol": start_patrol,
+}
+
+
+def execute(command: Any, robot: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Run the hook for a validated RobotCommand. Blocking: a real robot driver
+    returns only once the action has finished.
+    """
+    hook = HOOKS.get(command.command)
+    if hook is None:
+        raise KeyError(f"No control hook registered for command '{command.command}'")
+    return hook(**command.command_params.model_dump(), robot=robot)
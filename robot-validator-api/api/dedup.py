@@ -0,0 +1,88 @@
+# api/dedup.py
+"""
+Short-lived idempotency cache for /execute_command.
+
+Voice retries and impatient users often resend the same command within a
+second. A request is a duplicate if it carries a correlation ID we have
+already answered, or if its normalized command (same robot, same command,
+same parameters after defaults and rounding) was accepted within the TTL.
+Duplicates get the original response replayed instead of being re-run.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .schema import RobotCommand
+
+# Parameters that differ by less than this are treated as the same command
+FLOAT_PRECISION = 2
+
+CachedResponse = Tuple[int, Dict[str, Any]]
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, FLOAT_PRECISION)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def command_hash(command: RobotCommand, robot_id: str) -> str:
+    """Stable hash of a validated command (defaults applied, floats rounded)."""
+    canonical = json.dumps(
+        {"robot_id": robot_id, **_normalize(command.model_dump())},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class CommandDeduplicator:
+    def __init__(self, ttl_sec: float = 1.0, max_entries: int = 10000):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        # key -> (expires_at, response). All entries share one TTL, so
+        # insertion order is also expiry order and purging pops from the front.
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    def _purge(self, now: float) -> None:
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        self._purge(now)
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def _put(self, key: str, response: CachedResponse) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl_sec, response)
+
+    def by_correlation(self, correlation_id: Optional[str]) -> Optional[CachedResponse]:
+        if not correlation_id or self.ttl_sec <= 0:
+            return None
+        return self._get(f"cid:{correlation_id}")
+
+    def by_command(self, digest: str) -> Optional[CachedResponse]:
+        if self.ttl_sec <= 0:
+            return None
+        return self._get(f"cmd:{digest}")
+
+    def remember(
+        self, response: CachedResponse, correlation_id: Optional[str] = None, digest: Optional[str] = None
+    ) -> None:
+        if self.ttl_sec <= 0:
+            return
+        if correlation_id:
+            self._put(f"cid:{correlation_id}", response)
+        if digest:
+            self._put(f"cmd:{digest}", response)
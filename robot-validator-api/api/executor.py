@@ -0,0 +1,308 @@
+# api/executor.py
+"""
+Asynchronous execution of validated robot commands.
+
+Each robot gets its own FIFO queue drained by a single worker task, so
+commands for one robot run strictly in order while different robots proceed
+in parallel. Hooks are blocking (a real drive command returns only when the
+motion is done), so they run in a worker thread and never stall the event loop.
+An endless patrol would hold its robot's queue forever, so queuing anything
+behind one interrupts it (when the robot driver supports ``interrupt()``).
+"""
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from . import control_hooks
+from .routes import patrol_params
+from .schema import RobotCommand, RotateCommand
+
+logger = logging.getLogger("uvicorn.error")
+
+# A newly queued command of one of these types replaces a queued, not yet
+# started command of the same type for the same robot.
+PREEMPTIBLE_COMMANDS = {"move_to"}
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled", "preempted"}
+
+
+@dataclass
+class ExecutionRecord:
+    execution_id: str
+    robot_id: str
+    command: RobotCommand
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    merged: int = 0
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def queue_latency(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    @property
+    def run_time(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = self.queue_latency
+        run_time = self.run_time
+        return {
+            "execution_id": self.execution_id,
+            "robot_id": self.robot_id,
+            "command": self.command.model_dump(),
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "queue_latency_ms": None if latency is None else round(latency * 1000, 3),
+            "run_time_ms": None if run_time is None else round(run_time * 1000, 3),
+            "result": self.result,
+            "error": self.error,
+            "merged_commands": self.merged,
+        }
+
+
+def _summary(samples) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _signed_angle(command: RotateCommand) -> float:
+    params = command.command_params
+    return params.angle if params.direction == "clockwise" else -params.angle
+
+
+def _end_position(command: RobotCommand, robot: Any) -> Optional[Tuple[float, float]]:
+    """Where ``command`` leaves the robot, if it moves it somewhere known."""
+    params = command.command_params
+    if command.command == "move_to":
+        return params.x, params.y
+    routes = getattr(robot, "routes", None)
+    if command.command == "start_patrol" and routes is not None:
+        # Patrols are closed tours back to their first waypoint (an endless one stops wherever the
+        # next command interrupts it, somewhere on the same route)
+        plan = routes.plan(params.route_id, patrol_params(params.speed, params.repeat_count)[0])
+        if plan is not None:
+            return plan.start.x, plan.start.y
+    return None
+
+
+def _merge_rotations(first: RotateCommand, second: RotateCommand) -> RotateCommand:
+    """Single rotation equivalent to ``first`` followed by ``second`` (full turns dropped)."""
+    net = _signed_angle(first) + _signed_angle(second)
+    angle = abs(net) % 360.0
+    direction = "clockwise" if net >= 0 else "counter-clockwise"
+    return RotateCommand(command="rotate", command_params={"angle": angle, "direction": direction})
+
+
+class CommandExecutor:
+    def __init__(
+        self,
+        hook: Callable[[RobotCommand, Any], Dict[str, Any]] = control_hooks.execute,
+        robot_factory: Optional[Callable[[str], Any]] = None,
+        max_records: int = 1000,
+        latency_window: int = 1000,
+    ):
+        self._hook = hook
+        self._robot_factory = robot_factory
+        self._robots: Dict[str, Any] = {}
+        self._queues: Dict[str, Deque[ExecutionRecord]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._running: Dict[str, ExecutionRecord] = {}
+        self._records: "OrderedDict[str, ExecutionRecord]" = OrderedDict()
+        self._max_records = max_records
+        self._queue_latencies: Deque[float] = deque(maxlen=latency_window)
+        self._run_times: Deque[float] = deque(maxlen=latency_window)
+        self._status_counts: Dict[str, int] = {}
+
+    # ---------- Submission ----------
+
+    def submit(
+        self, command: RobotCommand, robot_id: str = "default", merge_window: float = 0.0
+    ) -> ExecutionRecord:
+        """
+        Queue a validated command and return immediately. Must be called on the event loop.
+
+        With ``merge_window`` > 0, a rotate arriving within that many seconds of a
+        still-queued rotate is folded into it; the existing record is returned.
+        """
+        queue = self._queues.setdefault(robot_id, deque())
+
+        if merge_window > 0 and command.command == "rotate" and queue:
+            tail = queue[-1]
+            if tail.command.command == "rotate" and time.monotonic() - tail.enqueued_at <= merge_window:
+                tail.command = _merge_rotations(tail.command, command)
+                tail.merged += 1
+                logger.info("[EXECUTOR] rotate merged into %s: %s", tail.execution_id, tail.command.command_params)
+                return tail
+
+        record = ExecutionRecord(execution_id=str(uuid.uuid4()), robot_id=robot_id, command=command)
+
+        if command.command in PREEMPTIBLE_COMMANDS:
+            for queued in [r for r in queue if r.command.command == command.command]:
+                queue.remove(queued)
+                queued.finish("preempted", error=f"Preempted by {record.execution_id}")
+                self._count(queued.status)
+                logger.info("[EXECUTOR] %s preempted by %s", queued.execution_id, record.execution_id)
+
+        queue.append(record)
+        self._remember(record)
+        self._ensure_worker(robot_id)
+        self._interrupt_endless_patrol(robot_id)
+        return record
+
+    def cancel(self, execution_id: str) -> bool:
+        """Cancel a command that has not started yet."""
+        record = self._records.get(execution_id)
+        if record is None or record.status != "queued":
+            return False
+        self._queues[record.robot_id].remove(record)
+        record.finish("cancelled")
+        self._count(record.status)
+        return True
+
+    # ---------- Status ----------
+
+    def get(self, execution_id: str) -> Optional[ExecutionRecord]:
+        return self._records.get(execution_id)
+
+    async def wait(self, execution_id: str, timeout: float) -> Optional[ExecutionRecord]:
+        """Block until the execution reaches a terminal status or the timeout passes."""
+        record = self._records.get(execution_id)
+        if record is None:
+            return None
+        try:
+            await asyncio.wait_for(record._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return record
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_latency": _summary(self._queue_latencies),
+            "run_time": _summary(self._run_times),
+            "queue_depth": {robot_id: len(q) for robot_id, q in self._queues.items()},
+            "completed": dict(self._status_counts),
+        }
+
+    def robot(self, robot_id: str) -> Any:
+        if self._robot_factory is None:
+            return None
+        if robot_id not in self._robots:
+            self._robots[robot_id] = self._robot_factory(robot_id)
+        return self._robots[robot_id]
+
+    def pose(self, robot_id: str) -> Optional[Dict[str, float]]:
+        """Current pose of a robot that has been driven already, else None (stub backend, or not started)."""
+        robot = self._robots.get(robot_id)
+        return robot.pose() if robot is not None and hasattr(robot, "pose") else None
+
+    def planned_pose(self, robot_id: str, command: Optional[RobotCommand] = None) -> Optional[Dict[str, float]]:
+        """
+        Pose the robot will be in once its running and queued commands are done, i.e. where
+        ``command`` would start if submitted now (queued commands it would preempt are skipped).
+        Falls back to pose(); None if neither the queue nor the backend knows a position.
+        """
+        pose = self.pose(robot_id)
+        ahead = [self._running[robot_id]] if robot_id in self._running else []
+        ahead += self._queues.get(robot_id, ())
+        robot = self._robots.get(robot_id)
+        for record in ahead:
+            queued = record.command
+            if (command is not None and record.status == "queued"
+                    and queued.command in PREEMPTIBLE_COMMANDS and queued.command == command.command):
+                continue
+            end = _end_position(queued, robot)
+            if end is not None:
+                pose = {**(pose or {}), "x": end[0], "y": end[1]}
+        return pose
+
+    async def shutdown(self) -> None:
+        # Worker threads can't be cancelled; stop endless patrols so they return
+        for robot in self._robots.values():
+            if hasattr(robot, "interrupt"):
+                robot.interrupt()
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+
+    # ---------- Internals ----------
+
+    def _remember(self, record: ExecutionRecord) -> None:
+        self._records[record.execution_id] = record
+        while len(self._records) > self._max_records:
+            oldest_id, oldest = next(iter(self._records.items()))
+            if oldest.status not in TERMINAL_STATUSES:
+                break
+            del self._records[oldest_id]
+
+    def _count(self, status: str) -> None:
+        self._status_counts[status] = self._status_counts.get(status, 0) + 1
+
+    def _interrupt_endless_patrol(self, robot_id: str) -> None:
+        running = self._running.get(robot_id)
+        if running is None or not self._queues[robot_id]:
+            return
+        if running.command.command != "start_patrol" or running.command.command_params.repeat_count != -1:
+            return
+        robot = self._robots.get(robot_id)
+        if robot is not None and hasattr(robot, "interrupt"):
+            logger.info(f"[EXECUTOR] interrupting endless patrol {running.execution_id} on '{robot_id}'")
+            robot.interrupt()
+
+    def _ensure_worker(self, robot_id: str) -> None:
+        worker = self._workers.get(robot_id)
+        loop = asyncio.get_running_loop()
+        # A worker bound to another (closed) loop will never run again
+        if worker is None or worker.done() or worker.get_loop() is not loop:
+            self._workers[robot_id] = loop.create_task(self._drain(robot_id))
+
+    async def _drain(self, robot_id: str) -> None:
+        queue = self._queues[robot_id]
+        while queue:
+            record = queue.popleft()
+            record.status = "running"
+            record.started_at = time.monotonic()
+            self._queue_latencies.append(record.queue_latency)
+            self._running[robot_id] = record
+            robot = self.robot(robot_id)
+            self._interrupt_endless_patrol(robot_id)
+            try:
+                result = await asyncio.to_thread(self._hook, record.command, robot)
+                record.finish("succeeded", result=result)
+            except Exception as e:
+                logger.exception(f"[EXECUTOR] {record.execution_id} failed")
+                record.finish("failed", error=str(e))
+            finally:
+                self._running.pop(robot_id, None)
+            self._run_times.append(record.run_time)
+            self._count(record.status)
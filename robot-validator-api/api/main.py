@@ -1,10 +1,20 @@
-from fastapi import FastAPI, status, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, status, Request, Query
+from fastapi.responses import JSONResponse, Response
 from .schema import HealthResponse
-from .validator import validate_command
+from .registry import DEFAULT_COMMANDS_PATH, command_registry
+from .validator import validate_command_json, validate_commands_json
+from .executor import CommandExecutor
+from .dedup import CommandDeduplicator, command_hash
+from .simulator import SimulatedRobot
+from .world import DEFAULT_MAP_PATH, load_world
+from .routes import DEFAULT_ROUTES_PATH, load_routes
+import asyncio
 import logging
-import uuid
+import os
+import time
+from typing import Optional
 from pydantic import BaseModel
+from shato_common import CorrelationMiddleware, get_correlation_id
 BaseModel.model_config = {"arbitrary_types_allowed": True}
 
 app = FastAPI(
@@ -15,20 +25,286 @@ app = FastAPI(
 
 logger = logging.getLogger("uvicorn")
 
+# Declarative command registry; POST /commands/reload re-reads this file
+COMMAND_REGISTRY_PATH = os.getenv("COMMAND_REGISTRY_PATH", DEFAULT_COMMANDS_PATH)
+if COMMAND_REGISTRY_PATH != command_registry.path:
+    command_registry.reload(COMMAND_REGISTRY_PATH)
+
+# Duplicate requests (same correlation ID, or same normalized command) within
+# DEDUP_TTL_SEC get the original response; 0 disables de-duplication.
+DEDUP_TTL_SEC = float(os.getenv("DEDUP_TTL_SEC", "1.0"))
+# Rotates arriving within this window of a still-queued rotate are merged; 0 disables.
+ROTATE_MERGE_WINDOW_SEC = float(os.getenv("ROTATE_MERGE_WINDOW_SEC", "0.5"))
+
+dedup = CommandDeduplicator(ttl_sec=DEDUP_TTL_SEC)
+
+# Occupancy-grid safety stage; set WORLD_MAP_PATH="" to disable
+WORLD_MAP_PATH = os.getenv("WORLD_MAP_PATH", DEFAULT_MAP_PATH)
+world = load_world(WORLD_MAP_PATH) if WORLD_MAP_PATH else None
+
+# Patrol routes, precompiled per (route_id, speed) at startup; set ROUTES_PATH="" to disable.
+# Leg lengths follow the world map when one is loaded, straight lines otherwise.
+ROUTES_PATH = os.getenv("ROUTES_PATH", DEFAULT_ROUTES_PATH)
+routes = load_routes(ROUTES_PATH, world) if ROUTES_PATH else None
+
+# "stub" keeps the logging-only hooks; "simulated" drives an in-process SimulatedRobot per robot_id
+ROBOT_BACKEND = os.getenv("ROBOT_BACKEND", "stub")
+ROBOT_SIM_TIME_SCALE = float(os.getenv("ROBOT_SIM_TIME_SCALE", "1.0"))
+
+
+def _robot_factory(robot_id: str) -> SimulatedRobot:
+    return SimulatedRobot(robot_id, time_scale=ROBOT_SIM_TIME_SCALE, routes=routes)
+
+
+executor = CommandExecutor(robot_factory=_robot_factory if ROBOT_BACKEND == "simulated" else None)
+
+
+async def check_safety(command, robot_id: Optional[str] = None) -> dict:
+    """
+    Run the world-model and route stages; commands are considered safe when nothing is loaded.
+    Paths start where ``robot_id`` will be once its queued commands are done, else at the dock.
+    """
+    if command.command == "start_patrol" and routes is not None:
+        return routes.check(command)
+    if world is None:
+        return {"safe": True}
+    pose = executor.planned_pose(robot_id, command) if robot_id is not None else None
+    if command.command == "move_to" and pose is not None and not world.at_dock(pose["x"], pose["y"]):
+        # A path search from anywhere but the dock takes milliseconds: keep it off the event loop
+        return await asyncio.to_thread(world.check, command, pose)
+    return world.check(command, pose)
+
+
+def _unsafe_error(safety: dict) -> dict:
+    return {"error": "Unsafe command", "reason": safety["reason"], "details": safety.get("details", {})}
+
+
+def _replay(cached) -> JSONResponse:
+    status_code, body = cached
+    return JSONResponse(status_code=status_code, content=body, headers={"X-Idempotent-Replay": "true"})
+
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """Report time in the service (app) and in validation/safety work (compute) for the orchestrator."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    entries = [f"app;dur={(time.perf_counter() - start) * 1000:.2f}"]
+    compute_ms = getattr(request.state, "compute_ms", None)
+    if compute_ms is not None:
+        entries.append(f"compute;dur={compute_ms:.2f}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+# Added last so it wraps the middleware above: the correlation ID is bound for the whole request
+app.add_middleware(CorrelationMiddleware)
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    await executor.shutdown()
+
 @app.get("/", response_model=HealthResponse, status_code=status.HTTP_200_OK)
 def health():
     """Health check endpoint to verify server is running"""
     return HealthResponse(message="Server Is Running!")
 
 @app.post("/execute_command")
-async def execute_command(request: Request):
-    payload = await request.json()
-    correlation_id = str(uuid.uuid4())
-    result = validate_command(payload)
+async def execute_command(request: Request, robot_id: str = Query("default", min_length=1, max_length=64)):
+    # Retries of an already answered request are replayed before any work
+    idempotency_key = request.headers.get("X-Correlation-ID")
+    cached = dedup.by_correlation(idempotency_key)
+    if cached is not None:
+        logger.info("[%s] [ROBOT-VALIDATOR-DUPLICATE] Replaying response", idempotency_key)
+        return _replay(cached)
+
+    # Parse + validate straight from the raw body in one pass
+    raw = await request.body()
+    correlation_id = get_correlation_id()
+    compute_start = time.perf_counter()
+    result = validate_command_json(raw)
 
     if isinstance(result, dict) and "error" in result:
-        logger.error(f"[{correlation_id}] [ROBOT-VALIDATOR-ERROR] {result}")
-        return JSONResponse(status_code=400, content={"correlation_id": correlation_id, **result})
+        request.state.compute_ms = (time.perf_counter() - compute_start) * 1000
+        logger.error("[%s] [ROBOT-VALIDATOR-ERROR] %s", correlation_id, result)
+        body = {"correlation_id": correlation_id, **result}
+        dedup.remember((400, body), correlation_id=idempotency_key)
+        return JSONResponse(status_code=400, content=body)
+
+    safety = await check_safety(result, robot_id)
+    request.state.compute_ms = (time.perf_counter() - compute_start) * 1000
+    if not safety["safe"]:
+        logger.error("[%s] [ROBOT-VALIDATOR-UNSAFE] %s: %s", correlation_id, result.command, safety)
+        body = {"correlation_id": correlation_id, **_unsafe_error(safety)}
+        dedup.remember((400, body), correlation_id=idempotency_key)
+        return JSONResponse(status_code=400, content=body)
+
+    digest = command_hash(result, robot_id)
+    cached = dedup.by_command(digest)
+    if cached is not None:
+        logger.info("[%s] [ROBOT-VALIDATOR-DUPLICATE] Same %s seen recently", correlation_id, result.command)
+        dedup.remember(cached, correlation_id=idempotency_key)
+        return _replay(cached)
+
+    record = executor.submit(result, robot_id, merge_window=ROTATE_MERGE_WINDOW_SEC)
+    logger.info(
+        "[%s] [ROBOT-VALIDATOR-SUCCESS] Valid command: %s, queued as %s for robot '%s'",
+        correlation_id, result.command, record.execution_id, robot_id,
+    )
+    body = {
+        "correlation_id": correlation_id,
+        "message": "Command validated",
+        "data": record.command.model_dump(),
+        "safety": safety,
+        "execution": {
+            "execution_id": record.execution_id,
+            "robot_id": robot_id,
+            "status": record.status,
+            "merged_commands": record.merged,
+        },
+    }
+    dedup.remember((200, body), correlation_id=idempotency_key, digest=digest)
+    return body
+
+
+@app.post("/execute_command/batch")
+async def execute_command_batch(request: Request):
+    raw = await request.body()
+    correlation_id = get_correlation_id()
+    compute_start = time.perf_counter()
+    results = validate_commands_json(raw)
+
+    if isinstance(results, dict):
+        logger.error("[%s] [ROBOT-VALIDATOR-ERROR] %s", correlation_id, results)
+        return JSONResponse(status_code=400, content={"correlation_id": correlation_id, **results})
+
+    items = []
+    for index, result in enumerate(results):
+        if isinstance(result, dict):
+            items.append({"index": index, "valid": False, **result})
+            continue
+        safety = await check_safety(result)
+        if not safety["safe"]:
+            items.append({"index": index, "valid": False, **_unsafe_error(safety)})
+        else:
+            items.append({"index": index, "valid": True, "data": result.model_dump(), "safety": safety})
+    invalid = sum(1 for item in items if not item["valid"])
+    request.state.compute_ms = (time.perf_counter() - compute_start) * 1000
+
+    body = {
+        "correlation_id": correlation_id,
+        "message": "Batch validated",
+        "valid": len(items) - invalid,
+        "invalid": invalid,
+        "results": items,
+    }
+    if invalid:
+        logger.error("[%s] [ROBOT-VALIDATOR-ERROR] %d/%d commands invalid", correlation_id, invalid, len(items))
+        return JSONResponse(status_code=400, content=body)
+
+    logger.info("[%s] [ROBOT-VALIDATOR-SUCCESS] Valid batch of %d commands", correlation_id, len(items))
+    return body
+
+
+@app.get("/executions/metrics")
+def execution_metrics():
+    """Queue latency / run time summaries and per-robot queue depth."""
+    return executor.metrics()
+
+
+@app.get("/executions/{execution_id}")
+def get_execution(execution_id: str):
+    record = executor.get(execution_id)
+    if record is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown execution", "execution_id": execution_id})
+    return record.to_dict()
+
+
+@app.get("/executions/{execution_id}/wait")
+async def wait_execution(execution_id: str, timeout: float = Query(10.0, gt=0, le=60)):
+    """Long-poll until the execution finishes (or the timeout elapses) and return its status."""
+    record = await executor.wait(execution_id, timeout)
+    if record is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown execution", "execution_id": execution_id})
+    return record.to_dict()
+
+
+@app.delete("/executions/{execution_id}")
+def cancel_execution(execution_id: str):
+    if not executor.cancel(execution_id):
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Execution cannot be cancelled", "execution_id": execution_id},
+        )
+    return executor.get(execution_id).to_dict()
+
+
+def _unknown_route(route_id: str, speed: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"error": "Unknown route", "route_id": route_id, "speed": speed})
+
+
+@app.get("/routes")
+def list_routes():
+    """Precompiled patrol routes with loop length and loop time per speed."""
+    if routes is None:
+        return {"routes": []}
+    items = []
+    for route_id in routes.route_ids:
+        plans = {speed: routes.plan(route_id, speed) for speed in routes.speeds}
+        any_plan = next(iter(plans.values()))
+        items.append({
+            "route_id": route_id,
+            "description": routes.descriptions[route_id],
+            "waypoints": [w.name for w in any_plan.waypoints],
+            "loop_length": round(any_plan.loop_length, 2),
+            "loop_duration_sec": {speed: round(plan.loop_duration_sec, 2) for speed, plan in plans.items()},
+        })
+    return {"routes": items}
+
+
+@app.get("/routes/{route_id}")
+def get_route(
+    route_id: str,
+    speed: str = Query("medium"),
+    repeat_count: int = Query(1, ge=-1),
+):
+    """Cached plan for one route: ordered legs, loop length and ETA for ``repeat_count`` loops."""
+    plan = routes.plan(route_id, speed) if routes is not None else None
+    if plan is None:
+        return _unknown_route(route_id, speed)
+    return plan.to_dict(repeat_count)
+
+
+@app.get("/commands/schema")
+def command_schema(request: Request):
+    """
+    Compiled JSON schema of the live command registry, for building LLM decoding
+    grammars. ETag is the registry version, so pollers can revalidate cheaply.
+    """
+    registry = command_registry.current
+    etag = f'"{registry.version}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    body = {
+        **registry.describe(),
+        "descriptions": registry.descriptions,
+        "schema": registry.json_schema,
+    }
+    return JSONResponse(content=body, headers={"ETag": etag})
+
 
-    logger.info(f"[{correlation_id}] [ROBOT-VALIDATOR-SUCCESS] Valid command: {result.command}")
-    return {"correlation_id": correlation_id, "message": "Command validated", "data": result.model_dump()}
+@app.post("/commands/reload")
+async def reload_commands():
+    """Rebuild the registry from COMMAND_REGISTRY_PATH and swap it in; the old one stays live on error."""
+    try:
+        # Model generation is CPU work; keep it off the event loop so validations keep flowing
+        previous, new = await asyncio.to_thread(command_registry.reload)
+    except Exception as e:
+        logger.error(f"[ROBOT-VALIDATOR-REGISTRY] Reload failed, keeping {command_registry.current.version}: {e}")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid command registry", "reason": str(e), **command_registry.current.describe()},
+        )
+    logger.info(f"[ROBOT-VALIDATOR-REGISTRY] Reloaded {previous.version} -> {new.version}: {new.names}")
+    return {"message": "Command registry reloaded", "previous_version": previous.version, **new.describe()}
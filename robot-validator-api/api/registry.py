@@ -0,0 +1,154 @@
+# api/registry.py
+"""
+Declarative command registry.
+
+api/commands.yaml lists every robot command and its parameters. Loading it
+generates the Pydantic models, the compiled TypeAdapters (per command, for the
+discriminated union and for batches), the dispatch table and the JSON schema
+served to the LLM service, all in one immutable CommandRegistry.
+
+Hot reload builds a complete new registry off to the side and then swaps a
+single reference. Readers never lock: a request takes ``holder.current`` once
+and keeps using that snapshot, so in-flight validations finish against the
+registry they started with.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Type, Union
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, create_model
+
+DEFAULT_COMMANDS_PATH = os.path.join(os.path.dirname(__file__), "commands.yaml")
+
+# Most commands one /execute_command/batch request may carry
+MAX_BATCH_SIZE = 100
+
+PARAM_TYPES = {"float": float, "int": int, "str": str, "bool": bool}
+CONSTRAINT_KEYS = {"ge", "gt", "le", "lt", "min_length", "max_length"}
+PARAM_KEYS = CONSTRAINT_KEYS | {"type", "values", "default", "nullable", "description", "example"}
+
+_STRICT = ConfigDict(extra="forbid")
+
+
+def _class_name(command: str) -> str:
+    return "".join(part.capitalize() for part in command.split("_"))
+
+
+def _param_field(command: str, name: str, spec: Dict[str, Any]) -> Tuple[Any, Any]:
+    """(annotation, FieldInfo) for one parameter spec."""
+    unknown = set(spec) - PARAM_KEYS
+    if unknown:
+        raise ValueError(f"{command}.{name}: unknown keys {sorted(unknown)}")
+    kind = spec.get("type")
+    if kind == "enum":
+        values = spec.get("values")
+        if not values:
+            raise ValueError(f"{command}.{name}: enum needs a non-empty 'values' list")
+        annotation = Literal[tuple(values)]
+    elif kind in PARAM_TYPES:
+        annotation = PARAM_TYPES[kind]
+    else:
+        raise ValueError(f"{command}.{name}: unsupported type {kind!r}")
+    if spec.get("nullable"):
+        annotation = Optional[annotation]
+
+    kwargs = {key: spec[key] for key in CONSTRAINT_KEYS if key in spec}
+    if "description" in spec:
+        kwargs["description"] = spec["description"]
+    if "example" in spec:
+        kwargs["json_schema_extra"] = {"example": spec["example"]}
+    default = spec["default"] if "default" in spec else ...
+    return annotation, Field(default, **kwargs)
+
+
+def _build_command(command: str, spec: Dict[str, Any]) -> Tuple[Type[BaseModel], Type[BaseModel]]:
+    base = _class_name(command)
+    params = {name: _param_field(command, name, p or {}) for name, p in (spec.get("params") or {}).items()}
+    params_model = create_model(f"{base}Params", __config__=_STRICT, __module__=__name__, **params)
+    command_model = create_model(
+        f"{base}Command",
+        __config__=_STRICT,
+        __doc__=spec.get("description"),
+        __module__=__name__,
+        command=(Literal[command], ...),
+        command_params=(params_model, ...),
+    )
+    return params_model, command_model
+
+
+class CommandRegistry:
+    def __init__(self, spec: Dict[str, Any], source: str = "<memory>"):
+        commands = (spec or {}).get("commands") or {}
+        if not commands:
+            raise ValueError("Command registry defines no commands")
+
+        self.source = source
+        self.version = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+        self.loaded_at = time.time()
+        self.descriptions: Dict[str, str] = {}
+        self.params_models: Dict[str, Type[BaseModel]] = {}
+        self.models: Dict[str, Type[BaseModel]] = {}
+        for name, command_spec in commands.items():
+            self.descriptions[name] = (command_spec or {}).get("description", "")
+            self.params_models[name], self.models[name] = _build_command(name, command_spec or {})
+
+        # Dispatch table and compiled validators
+        self.adapters: Dict[str, TypeAdapter] = {name: TypeAdapter(model) for name, model in self.models.items()}
+        members = tuple(self.models.values())
+        self.union = Union[members] if len(members) > 1 else members[0]
+        tagged = Annotated[self.union, Field(discriminator="command")] if len(members) > 1 else self.union
+        self.adapter = TypeAdapter(tagged)
+        # The length is checked before any item is validated, so oversized batches are cheap to reject
+        self.list_adapter = TypeAdapter(Annotated[List[tagged], Field(max_length=MAX_BATCH_SIZE)])
+        self.json_schema = self.adapter.json_schema()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.models)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "commands": self.names,
+        }
+
+
+def load_registry(path: str = DEFAULT_COMMANDS_PATH) -> CommandRegistry:
+    with open(path, "r") as f:
+        if path.endswith(".json"):
+            spec = json.load(f)
+        else:
+            spec = yaml.safe_load(f)
+    return CommandRegistry(spec, source=path)
+
+
+class RegistryHolder:
+    """Holds the live CommandRegistry behind one reference that reload swaps atomically."""
+
+    def __init__(self, path: str = DEFAULT_COMMANDS_PATH):
+        self.path = path
+        self.current = load_registry(path)
+        self._reload_lock = threading.Lock()
+
+    def reload(self, path: Optional[str] = None) -> Tuple[CommandRegistry, CommandRegistry]:
+        """
+        Build a registry from ``path`` (default: the last loaded path) and swap it in.
+        On any error the current registry stays live and the exception propagates.
+        Returns (previous, new).
+        """
+        with self._reload_lock:
+            path = path or self.path
+            new = load_registry(path)
+            previous, self.current = self.current, new
+            self.path = path
+            return previous, new
+
+
+# Process-wide registry used by api.schema and api.validator
+command_registry = RegistryHolder()
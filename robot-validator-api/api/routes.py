@@ -0,0 +1,211 @@
+# api/routes.py
+"""
+Precompiled patrol routes for start_patrol.
+
+Routes (JSON, see api/maps/routes.json) are unordered sets of named
+waypoints; the first waypoint is where the patrol starts and ends. All
+planning happens once at load time:
+
+- pairwise leg lengths, geodesic over the world model when one is loaded
+  (one early-exit A* search per waypoint), straight-line otherwise;
+- a visiting order: nearest-neighbour tour improved with 2-opt;
+- one immutable PatrolPlan per (route_id, speed) with per-leg durations,
+  loop length and loop time.
+
+Executing a patrol, even an endless one, is then just iterating the cached
+legs of its plan.
+"""
+import itertools
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .world import WorldModel
+
+DEFAULT_ROUTES_PATH = os.path.join(os.path.dirname(__file__), "maps", "routes.json")
+
+DEFAULT_SPEEDS = {"slow": 0.25, "medium": 0.5, "fast": 1.0}
+
+# start_patrol's declared defaults (api/commands.yaml); both params are also nullable
+DEFAULT_SPEED = "medium"
+DEFAULT_REPEAT_COUNT = 1
+
+
+def patrol_params(speed: Optional[str], repeat_count: Optional[int]) -> Tuple[str, int]:
+    """(speed, repeat_count) with an explicit null replaced by its default."""
+    return (
+        DEFAULT_SPEED if speed is None else speed,
+        DEFAULT_REPEAT_COUNT if repeat_count is None else repeat_count,
+    )
+
+
+@dataclass(frozen=True)
+class Waypoint:
+    name: str
+    x: float
+    y: float
+
+
+@dataclass(frozen=True)
+class Leg:
+    start: Waypoint
+    end: Waypoint
+    length: float
+    duration_sec: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "from": self.start.name,
+            "to": self.end.name,
+            "length": round(self.length, 2),
+            "duration_sec": round(self.duration_sec, 2),
+        }
+
+
+@dataclass(frozen=True)
+class PatrolPlan:
+    route_id: str
+    speed: str
+    speed_mps: float
+    waypoints: Tuple[Waypoint, ...]
+    legs: Tuple[Leg, ...]
+    loop_length: float
+    loop_duration_sec: float
+
+    @property
+    def start(self) -> Waypoint:
+        return self.waypoints[0]
+
+    def eta_sec(self, repeat_count: int = 1) -> Optional[float]:
+        """Time to finish ``repeat_count`` loops; None for an endless patrol (-1)."""
+        if repeat_count < 0:
+            return None
+        return self.loop_duration_sec * repeat_count
+
+    def iter_legs(self, repeat_count: int = 1) -> Iterator[Leg]:
+        """Legs to drive, in order; endless for repeat_count=-1."""
+        if repeat_count < 0:
+            return itertools.cycle(self.legs)
+        return itertools.chain.from_iterable(itertools.repeat(self.legs, repeat_count))
+
+    def summary(self, repeat_count: int = 1) -> Dict[str, Any]:
+        eta = self.eta_sec(repeat_count)
+        return {
+            "route_id": self.route_id,
+            "speed": self.speed,
+            "waypoints": [w.name for w in self.waypoints],
+            "loop_length": round(self.loop_length, 2),
+            "loop_duration_sec": round(self.loop_duration_sec, 2),
+            "repeat_count": repeat_count,
+            "estimated_travel_time_sec": None if eta is None else round(eta, 2),
+        }
+
+    def to_dict(self, repeat_count: int = 1) -> Dict[str, Any]:
+        return {**self.summary(repeat_count), "legs": [leg.to_dict() for leg in self.legs]}
+
+
+def _plan_order(dist: List[List[float]]) -> List[int]:
+    """Closed tour over all waypoints starting at index 0: nearest neighbour, then 2-opt."""
+    n = len(dist)
+    order, remaining = [0], set(range(1, n))
+    while remaining:
+        last = order[-1]
+        nxt = min(remaining, key=lambda j: (dist[last][j], j))
+        order.append(nxt)
+        remaining.remove(nxt)
+
+    improved = True
+    while improved:
+        improved = False
+        # Reverse order[i:j+1]; position 0 stays fixed as the start
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b = order[i - 1], order[i]
+                c, d = order[j], order[(j + 1) % n]
+                delta = dist[a][c] + dist[b][d] - dist[a][b] - dist[c][d]
+                if delta < -1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return order
+
+
+class RouteRegistry:
+    def __init__(self, spec: Dict[str, Any], world: Optional[WorldModel] = None):
+        self.world = world
+        self.speeds: Dict[str, float] = {k: float(v) for k, v in spec.get("speeds", DEFAULT_SPEEDS).items()}
+        self.descriptions: Dict[str, str] = {}
+        self._plans: Dict[Tuple[str, str], PatrolPlan] = {}
+
+        for route_id, route in spec["routes"].items():
+            self.descriptions[route_id] = route.get("description", "")
+            waypoints = [Waypoint(w["name"], float(w["x"]), float(w["y"])) for w in route["waypoints"]]
+            if len(waypoints) < 2:
+                raise ValueError(f"Route '{route_id}' needs at least two waypoints")
+            dist = self._distance_matrix(route_id, waypoints)
+            order = _plan_order(dist)
+            ordered = tuple(waypoints[i] for i in order)
+            lengths = [dist[a][b] for a, b in zip(order, order[1:] + order[:1])]
+            for speed, mps in self.speeds.items():
+                legs = tuple(
+                    Leg(ordered[i], ordered[(i + 1) % len(ordered)], length, length / mps)
+                    for i, length in enumerate(lengths)
+                )
+                loop_length = sum(lengths)
+                self._plans[(route_id, speed)] = PatrolPlan(
+                    route_id=route_id,
+                    speed=speed,
+                    speed_mps=mps,
+                    waypoints=ordered,
+                    legs=legs,
+                    loop_length=loop_length,
+                    loop_duration_sec=loop_length / mps,
+                )
+
+    def _distance_matrix(self, route_id: str, waypoints: List[Waypoint]) -> List[List[float]]:
+        points = [(w.x, w.y) for w in waypoints]
+        if self.world is None:
+            return [[math.hypot(ax - bx, ay - by) for bx, by in points] for ax, ay in points]
+
+        # Grid paths are symmetric, so each search only needs the waypoints after it
+        n = len(points)
+        dist = [[0.0] * n for _ in range(n)]
+        for i in range(n - 1):
+            try:
+                row = self.world.path_lengths(points[i], points[i + 1:])
+            except ValueError:
+                raise ValueError(f"Route '{route_id}': waypoint '{waypoints[i].name}' is not in free space")
+            for j, length in enumerate(row, start=i + 1):
+                if length == math.inf:
+                    raise ValueError(
+                        f"Route '{route_id}': '{waypoints[j].name}' unreachable from '{waypoints[i].name}'"
+                    )
+                dist[i][j] = dist[j][i] = length
+        return dist
+
+    @property
+    def route_ids(self) -> List[str]:
+        return list(self.descriptions)
+
+    def plan(self, route_id: str, speed: str = "medium") -> Optional[PatrolPlan]:
+        """Cached plan for (route_id, speed); O(1), None if unknown."""
+        return self._plans.get((route_id, speed))
+
+    def check(self, command: Any) -> Dict[str, Any]:
+        """Route stage for a validated start_patrol command."""
+        params = command.command_params
+        speed, repeat_count = patrol_params(params.speed, params.repeat_count)
+        plan = self.plan(params.route_id, speed)
+        if plan is None:
+            return {
+                "safe": False,
+                "reason": "unknown_route",
+                "details": {"route_id": params.route_id, "speed": speed},
+            }
+        return {"safe": True, "route": plan.summary(repeat_count)}
+
+
+def load_routes(path: str = DEFAULT_ROUTES_PATH, world: Optional[WorldModel] = None) -> RouteRegistry:
+    with open(path, "r") as f:
+        return RouteRegistry(json.load(f), world)
@@ -1,69 +1,33 @@
 # api/schema.py
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal, Optional, Union
+from typing import Annotated
+
+from .registry import command_registry
 
 class HealthResponse(BaseModel):
     model_config = ConfigDict(extra="forbid")
     message: str
 
-# --- Command: move_to ---
-class MoveToParams(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    x: float = Field(
-        ...,
-        description="X coordinate",
-        json_schema_extra={"example": 10.0}
-    )
-    y: float = Field(
-        ...,
-        description="Y coordinate",
-        json_schema_extra={"example": -5.0}
-    )
+# Command models are generated from the declarative registry (api/commands.yaml).
+# These names are the built-in commands as loaded at startup; code that must
+# follow hot reloads should read command_registry.current instead.
+_builtin = command_registry.current
 
-class MoveToCommand(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    command: Literal["move_to"]
-    command_params: MoveToParams
+# --- Command: move_to ---
+MoveToParams = _builtin.params_models["move_to"]
+MoveToCommand = _builtin.models["move_to"]
 
 # --- Command: rotate ---
-class RotateParams(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    angle: float = Field(
-        ...,
-        description="Rotation angle in degrees",
-        json_schema_extra={"example": 90.0}
-    )
-    direction: Literal["clockwise", "counter-clockwise"] = Field(
-        ...,
-        description="Rotation direction"
-    )
-
-class RotateCommand(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    command: Literal["rotate"]
-    command_params: RotateParams
+RotateParams = _builtin.params_models["rotate"]
+RotateCommand = _builtin.models["rotate"]
 
 # --- Command: start_patrol ---
-class StartPatrolParams(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    route_id: Literal["first_floor", "bedrooms", "second_floor"] = Field(
-        ...,
-        description="Predefined patrol route"
-    )
-    speed: Optional[Literal["slow", "medium", "fast"]] = Field(
-        "medium",
-        description="Patrol speed (default=medium)"
-    )
-    repeat_count: Optional[int] = Field(
-        1,
-        ge=-1,
-        description="Number of loops, -1 for infinite"
-    )
-
-class StartPatrolCommand(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    command: Literal["start_patrol"]
-    command_params: StartPatrolParams
+StartPatrolParams = _builtin.params_models["start_patrol"]
+StartPatrolCommand = _builtin.models["start_patrol"]
 
 # --- Union of All Valid Commands ---
-RobotCommand = Union[MoveToCommand, RotateCommand, StartPatrolCommand]
\ No newline at end of file
+RobotCommand = _builtin.union
+
+# Tagged on "command" so validation jumps straight to the matching model
+# instead of trying each union member in turn.
+AnyRobotCommand = Annotated[RobotCommand, Field(discriminator="command")]
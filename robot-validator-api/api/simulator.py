@@ -0,0 +1,126 @@
+# api/simulator.py
+"""
+In-process simulated robot used to exercise the control hooks without hardware.
+
+Motion is modelled kinematically: the robot sleeps for the time the real
+move/rotation would take (scaled by ``time_scale``; 0 makes every action
+instantaneous, which is what the tests use) and then updates its pose.
+
+Given a RouteRegistry, patrols drive the legs of the precompiled plan; an
+endless patrol (repeat_count=-1) keeps cycling them until ``interrupt()``.
+"""
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .routes import patrol_params
+
+# Nominal patrol loop duration per speed setting when no routes are loaded, in seconds
+PATROL_LOOP_SEC = {"slow": 120.0, "medium": 60.0, "fast": 30.0}
+
+
+class SimulatedRobot:
+    def __init__(
+        self,
+        robot_id: str = "default",
+        linear_speed: float = 0.5,
+        angular_speed: float = 90.0,
+        time_scale: float = 1.0,
+        routes: Optional[Any] = None,
+    ):
+        self.robot_id = robot_id
+        self.linear_speed = linear_speed  # units per second
+        self.angular_speed = angular_speed  # degrees per second
+        self.time_scale = time_scale
+        self.routes = routes
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0  # degrees, counter-clockwise positive
+        self.history: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._interrupted = threading.Event()
+
+    def pose(self) -> Dict[str, float]:
+        return {"x": self.x, "y": self.y, "heading": self.heading}
+
+    def _sleep(self, seconds: float) -> None:
+        if self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _drive(self, seconds: float) -> bool:
+        """Like _sleep, but returns True early if the patrol was interrupted."""
+        if self.time_scale > 0:
+            return self._interrupted.wait(seconds * self.time_scale)
+        return self._interrupted.is_set()
+
+    def interrupt(self) -> None:
+        """
+        Stop a running patrol; the robot stays at the last waypoint it reached.
+        Safe to call from any thread.
+        """
+        self._interrupted.set()
+
+    def _record(self, action: str, params: Dict[str, Any], duration: float, status: str = "completed") -> Dict[str, Any]:
+        result = {
+            "status": status,
+            "action": action,
+            "params": params,
+            "duration_sec": round(duration, 3),
+            "pose": self.pose(),
+        }
+        self.history.append(result)
+        return result
+
+    def move_to(self, x: float, y: float) -> Dict[str, Any]:
+        with self._lock:
+            duration = math.hypot(x - self.x, y - self.y) / self.linear_speed
+            self._sleep(duration)
+            self.x, self.y = x, y
+            return self._record("move_to", {"x": x, "y": y}, duration)
+
+    def rotate(self, angle: float, direction: str) -> Dict[str, Any]:
+        with self._lock:
+            duration = abs(angle) / self.angular_speed
+            self._sleep(duration)
+            signed = angle if direction == "counter-clockwise" else -angle
+            self.heading = (self.heading + signed) % 360.0
+            return self._record("rotate", {"angle": angle, "direction": direction}, duration)
+
+    def start_patrol(
+        self, route_id: str, speed: Optional[str] = "medium", repeat_count: Optional[int] = 1
+    ) -> Dict[str, Any]:
+        speed, repeat_count = patrol_params(speed, repeat_count)
+        params = {"route_id": route_id, "speed": speed, "repeat_count": repeat_count}
+        if self.routes is not None:
+            return self._follow_plan(self.routes.plan(route_id, speed), params)
+        with self._lock:
+            if repeat_count == -1:
+                # Infinite patrols run until the next command; don't block the queue
+                return self._record("start_patrol", params, 0.0, status="patrolling")
+            duration = PATROL_LOOP_SEC[speed] * repeat_count
+            self._sleep(duration)
+            return self._record("start_patrol", params, duration)
+
+    def _follow_plan(self, plan: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        if plan is None:
+            raise KeyError(f"No patrol plan for route '{params['route_id']}' at speed '{params['speed']}'")
+        with self._lock:
+            # Drive to the start of the route, then stream the cached legs
+            duration = math.hypot(plan.start.x - self.x, plan.start.y - self.y) / plan.speed_mps
+            self._sleep(duration)
+            self.x, self.y = plan.start.x, plan.start.y
+            legs = 0
+            status = "completed"
+            for leg in plan.iter_legs(params["repeat_count"]):
+                if self._drive(leg.duration_sec):
+                    status = "interrupted"
+                    break
+                self.x, self.y = leg.end.x, leg.end.y
+                duration += leg.duration_sec
+                legs += 1
+            self._interrupted.clear()
+            result = self._record("start_patrol", params, duration, status=status)
+            result["legs_completed"] = legs
+            result["loops_completed"] = legs // len(plan.legs)
+            return result
@@ -1,19 +1,16 @@
-# api/validator.py
 import json
 import logging
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from pydantic import ValidationError
-from .schema import MoveToCommand, RotateCommand, StartPatrolCommand, RobotCommand
+from .registry import MAX_BATCH_SIZE, CommandRegistry, command_registry
+from .schema import RobotCommand
 
 logger = logging.getLogger("uvicorn.error")
 
-# Map top-level command names to their Pydantic models
-COMMAND_MODEL_MAP = {
-    "move_to": MoveToCommand,
-    "rotate": RotateCommand,
-    "start_patrol": StartPatrolCommand,
-}
+# Models, compiled validators and the dispatch table all come from the command
+# registry. Each call reads command_registry.current once, so a hot reload
+# never changes the models underneath a validation that is in progress.
 
 
 class RobotValidationError(Exception):
@@ -26,27 +23,93 @@ class RobotValidationError(Exception):
         self.details = details or {}
 
 
-def validate_command(payload: dict) -> Union[RobotCommand, dict]:
+def validate_command(payload: dict, registry: Optional[CommandRegistry] = None) -> Union[RobotCommand, dict]:
     """
     Validate incoming payload against strict robot command schema.
     Returns:
         - RobotCommand instance if valid
         - dict with "error" and "details" if invalid
     """
+    registry = registry or command_registry.current
+    command_type = payload.get("command")
+    adapter = registry.adapters.get(command_type)
+    if adapter is None:
+        return {"error": "Invalid command", "reason": f"Unknown command '{command_type}'"}
     try:
-        command_type = payload.get("command")
-        if command_type == "move_to":
-            return MoveToCommand(**payload)
-        elif command_type == "rotate":
-            return RotateCommand(**payload)
-        elif command_type == "start_patrol":
-            return StartPatrolCommand(**payload)
-        else:
-            return {"error": "Invalid command", "reason": f"Unknown command '{command_type}'"}
+        return adapter.validate_python(payload)
     except ValidationError as e:
         return {"error": "Validation failed", "details": e.errors()}
 
 
+def _validation_error_to_dict(e: ValidationError, registry: CommandRegistry) -> dict:
+    """Translate a discriminated-union ValidationError into the validate_command error format."""
+    errors = e.errors()
+    first = errors[0]
+    kind, ctx = first["type"], first.get("ctx") or {}
+    if kind == "union_tag_invalid":
+        return {"error": "Invalid command", "reason": f"Unknown command '{ctx.get('tag')}'"}
+    if kind == "union_tag_not_found":
+        return {"error": "Invalid command", "reason": "Missing 'command' field"}
+    if kind == "json_invalid":
+        return {"error": "Invalid JSON", "reason": ctx.get("error", "Malformed JSON body")}
+    if kind == "dict_type" and not first["loc"]:
+        return {"error": "Invalid command", "reason": "Top-level JSON must be an object"}
+
+    # Drop the union tag pydantic prepends, so locations match validate_command
+    for err in errors:
+        if err["loc"] and err["loc"][0] in registry.models:
+            err["loc"] = err["loc"][1:]
+    return {"error": "Validation failed", "details": errors}
+
+
+def validate_command_json(
+    raw: Union[str, bytes], registry: Optional[CommandRegistry] = None
+) -> Union[RobotCommand, dict]:
+    """
+    Parse and validate a raw JSON command in a single pass.
+    Same return contract as validate_command.
+    """
+    registry = registry or command_registry.current
+    try:
+        return registry.adapter.validate_json(raw)
+    except ValidationError as e:
+        return _validation_error_to_dict(e, registry)
+
+
+def validate_commands_json(
+    raw: Union[str, bytes], registry: Optional[CommandRegistry] = None
+) -> Union[List[Union[RobotCommand, dict]], dict]:
+    """
+    Validate a JSON array of commands.
+    Returns:
+        - list with one RobotCommand or error dict per item (in input order)
+        - dict with "error" if the body itself is not a usable array
+    """
+    registry = registry or command_registry.current
+    too_large = {"error": "Invalid batch", "reason": f"Batch exceeds {MAX_BATCH_SIZE} commands"}
+    try:
+        return registry.list_adapter.validate_json(raw)
+    except ValidationError as e:
+        # The adapter checks the length before validating items
+        if e.errors()[0]["type"] == "too_long" and not e.errors()[0]["loc"]:
+            return too_large
+
+    # Slow path: something failed, so report on each item individually
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError as e:
+        return {"error": "Invalid JSON", "reason": str(e)}
+    if not isinstance(items, list):
+        return {"error": "Invalid batch", "reason": "Top-level JSON must be an array"}
+    if len(items) > MAX_BATCH_SIZE:
+        return too_large
+    return [
+        validate_command(item, registry) if isinstance(item, dict)
+        else {"error": "Invalid command", "reason": "Command must be an object"}
+        for item in items
+    ]
+
+
 def _extract_first_json(text: str) -> str:
     """
     Extract the first balanced JSON object or array from a string.
@@ -121,26 +184,27 @@ def parse_and_validate_text_output(raw_text: str) -> Tuple[bool, Union[Dict, Any
                 {"payload_type": type(payload).__name__},
             )
 
+        registry = command_registry.current
         command_name = payload.get("command")
-        if command_name not in COMMAND_MODEL_MAP:
+        if command_name not in registry.adapters:
             raise RobotValidationError(
                 "unknown_command",
                 f"Unknown or missing command: '{command_name}'",
                 {"command": command_name},
             )
 
-        Model = COMMAND_MODEL_MAP[command_name]
+        adapter = registry.adapters[command_name]
 
-        # 4) Validate using Pydantic model
+        # 4) Validate using the precompiled adapter
         try:
-            validated = Model(**payload)
+            validated = adapter.validate_python(payload)
         except ValidationError as e:
             raise RobotValidationError(
                 "validation_error", "Payload failed schema validation", e.errors()
             )
 
         validated_dict = validated.model_dump()
-        logger.info(f"[ROBOT-VALIDATOR-SUCCESS] Validated command '{command_name}'")
+        logger.info("[ROBOT-VALIDATOR-SUCCESS] Validated command '%s'", command_name)
         return True, validated_dict
 
     except RobotValidationError as re:
@@ -149,7 +213,7 @@ def parse_and_validate_text_output(raw_text: str) -> Tuple[bool, Union[Dict, Any
             "message": re.message,
             "details": re.details,
         }
-        logger.error(f"[ROBOT-VALIDATOR-ERROR] {error_obj}")
+        logger.error("[ROBOT-VALIDATOR-ERROR] %s", error_obj)
         return False, error_obj
 
     except Exception as e:
@@ -0,0 +1,245 @@
+# api/world.py
+"""
+In-memory world model of the home map used as a safety stage after schema validation.
+
+The map (JSON, see api/maps/home.json) lists wall/furniture rectangles and
+named no-go zones on a fixed-resolution grid. Everything expensive happens
+once at load time:
+
+- an obstacle clearance field (multi-source BFS from occupied cells), which
+  marks cells closer than the robot radius to an obstacle as blocked;
+- a zone index grid, so "which no-go zone is this point in" is one lookup;
+- connected-component labels of the traversable cells, so "can the robot
+  get there from where it is" is one lookup from anywhere;
+- a geodesic distance field from the dock (Dijkstra over traversable cells),
+  which gives the path length for any target.
+
+A move_to check from the dock is therefore a handful of O(1) array lookups.
+When the robot is elsewhere, an unreachable target is still rejected in O(1);
+the path length to a reachable one comes from an early-exit A* search from
+its current position, which callers on an event loop should run in a thread.
+"""
+import heapq
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MAP_PATH = os.path.join(os.path.dirname(__file__), "maps", "home.json")
+
+_NEIGHBOURS = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+               (-1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (1, 1, math.sqrt(2))]
+
+
+class WorldModel:
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec.get("name", "map")
+        self.resolution = float(spec.get("resolution", 1.0))
+        bounds = spec["bounds"]
+        self.min_x, self.max_x = float(bounds["min_x"]), float(bounds["max_x"])
+        self.min_y, self.max_y = float(bounds["min_y"]), float(bounds["max_y"])
+        self.width = int(round((self.max_x - self.min_x) / self.resolution)) + 1
+        self.height = int(round((self.max_y - self.min_y) / self.resolution)) + 1
+        self.robot_radius = float(spec.get("robot_radius", 0.0))
+        self.linear_speed = float(spec.get("linear_speed", 0.5))
+        self.angular_speed = float(spec.get("angular_speed", 90.0))
+        dock = spec.get("dock", {"x": 0.0, "y": 0.0})
+        self.dock = (float(dock["x"]), float(dock["y"]))
+
+        size = self.width * self.height
+        self.occupied = [False] * size
+        for obstacle in spec.get("obstacles", []):
+            for idx in self._rect_cells(obstacle["rect"]):
+                self.occupied[idx] = True
+
+        # zone_index[idx] = position in self.zone_names, or -1
+        self.zone_names: List[str] = []
+        self.zone_index = [-1] * size
+        for zone in spec.get("no_go_zones", []):
+            self.zone_names.append(zone["name"])
+            for idx in self._rect_cells(zone["rect"]):
+                self.zone_index[idx] = len(self.zone_names) - 1
+
+        self.clearance = self._clearance_field()
+        self.blocked = [
+            occupied or c * self.resolution < self.robot_radius
+            for occupied, c in zip(self.occupied, self.clearance)
+        ]
+        self.component = self._components()
+        self.distance = self._distance_field(self.dock)
+
+    # ---------- Grid helpers ----------
+
+    def cell(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        ix = int(round((x - self.min_x) / self.resolution))
+        iy = int(round((y - self.min_y) / self.resolution))
+        if 0 <= ix < self.width and 0 <= iy < self.height:
+            return ix, iy
+        return None
+
+    def _index(self, ix: int, iy: int) -> int:
+        return iy * self.width + ix
+
+    def _rect_cells(self, rect) -> List[int]:
+        x0, y0, x1, y1 = rect
+        lo, hi = self.cell(min(x0, x1), min(y0, y1)), self.cell(max(x0, x1), max(y0, y1))
+        if lo is None or hi is None:
+            raise ValueError(f"Rectangle {rect} lies outside the map bounds")
+        return [self._index(ix, iy) for iy in range(lo[1], hi[1] + 1) for ix in range(lo[0], hi[0] + 1)]
+
+    def _clearance_field(self) -> List[float]:
+        """Chebyshev distance (in cells) from each cell to the nearest obstacle."""
+        clearance = [math.inf] * len(self.occupied)
+        frontier = deque()
+        for idx, occupied in enumerate(self.occupied):
+            if occupied:
+                clearance[idx] = 0
+                frontier.append(idx)
+        while frontier:
+            idx = frontier.popleft()
+            ix, iy = idx % self.width, idx // self.width
+            for dx, dy, _ in _NEIGHBOURS:
+                nx, ny = ix + dx, iy + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    nidx = self._index(nx, ny)
+                    if clearance[nidx] == math.inf:
+                        clearance[nidx] = clearance[idx] + 1
+                        frontier.append(nidx)
+        return clearance
+
+    def traversable(self, idx: int) -> bool:
+        return not self.blocked[idx] and self.zone_index[idx] < 0
+
+    def _components(self) -> List[int]:
+        """Label of the connected region of traversable cells each cell belongs to (-1 if not traversable)."""
+        labels = [-1] * len(self.occupied)
+        label = 0
+        for seed in range(len(labels)):
+            if labels[seed] >= 0 or not self.traversable(seed):
+                continue
+            labels[seed] = label
+            frontier = deque([seed])
+            while frontier:
+                idx = frontier.popleft()
+                ix, iy = idx % self.width, idx // self.width
+                for dx, dy, _ in _NEIGHBOURS:
+                    nx, ny = ix + dx, iy + dy
+                    if 0 <= nx < self.width and 0 <= ny < self.height:
+                        nidx = self._index(nx, ny)
+                        if labels[nidx] < 0 and self.traversable(nidx):
+                            labels[nidx] = label
+                            frontier.append(nidx)
+            label += 1
+        return labels
+
+    def at_dock(self, x: float, y: float) -> bool:
+        return self.cell(x, y) == self.cell(*self.dock)
+
+    def _distance_field(self, origin: Tuple[float, float], targets: Optional[set] = None) -> List[float]:
+        """
+        Geodesic distance (map units) from ``origin`` to every traversable cell.
+
+        With ``targets`` (cell indices) the search is guided by an octile-distance
+        heuristic to the nearest pending target and stops once all are settled;
+        only the targets' entries are then guaranteed exact.
+        """
+        distance = [math.inf] * len(self.occupied)
+        start = self.cell(*origin)
+        if start is None or not self.traversable(self._index(*start)):
+            raise ValueError(f"Point {origin} is not in free space")
+        start_idx = self._index(*start)
+        distance[start_idx] = 0.0
+        pending = set(targets) if targets is not None else None
+        goals = [(t % self.width, t // self.width) for t in pending] if pending else []
+
+        def heuristic(idx: int) -> float:
+            if not goals:
+                return 0.0
+            ix, iy = idx % self.width, idx // self.width
+            best = math.inf
+            for gx, gy in goals:
+                dx, dy = abs(ix - gx), abs(iy - gy)
+                best = min(best, max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy))
+            return best * self.resolution
+
+        heap = [(heuristic(start_idx), 0.0, start_idx)]
+        while heap:
+            _, dist, idx = heapq.heappop(heap)
+            if dist > distance[idx]:
+                continue
+            if pending is not None and idx in pending:
+                pending.discard(idx)
+                if not pending:
+                    break
+                goals = [(t % self.width, t // self.width) for t in pending]
+            ix, iy = idx % self.width, idx // self.width
+            for dx, dy, cost in _NEIGHBOURS:
+                nx, ny = ix + dx, iy + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    nidx = self._index(nx, ny)
+                    step = dist + cost * self.resolution
+                    if step < distance[nidx] and self.traversable(nidx):
+                        distance[nidx] = step
+                        heapq.heappush(heap, (step + heuristic(nidx), step, nidx))
+        return distance
+
+    def path_lengths(self, origin: Tuple[float, float], targets: List[Tuple[float, float]]) -> List[float]:
+        """Geodesic distances from ``origin`` to each target point (inf if unreachable)."""
+        cells = [self.cell(*t) for t in targets]
+        indices = [self._index(*c) if c is not None else None for c in cells]
+        field = self._distance_field(origin, {i for i in indices if i is not None})
+        return [field[i] if i is not None else math.inf for i in indices]
+
+    # ---------- Safety checks ----------
+
+    def check_point(self, x: float, y: float, origin: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """
+        Is (x, y) a safe target reachable from ``origin`` (the robot's position;
+        default the dock)? O(1) from the dock or for an unreachable target, one A*
+        search for the path length from anywhere else.
+        """
+        cell = self.cell(x, y)
+        if cell is None:
+            return {"safe": False, "reason": "out_of_bounds", "details": {"x": x, "y": y}}
+        idx = self._index(*cell)
+        zone = self.zone_index[idx]
+        if zone >= 0:
+            return {"safe": False, "reason": "no_go_zone", "details": {"zone": self.zone_names[zone]}}
+        if self.blocked[idx]:
+            return {
+                "safe": False,
+                "reason": "obstacle",
+                "details": {"clearance": self.clearance[idx] * self.resolution, "robot_radius": self.robot_radius},
+            }
+        if origin is None or self.at_dock(*origin):
+            origin, distance = self.dock, self.distance[idx]
+        else:
+            start = self.cell(*origin)
+            # The robot itself off the free space, or in another region than the target: no search needed
+            if start is None or self.component[self._index(*start)] != self.component[idx] or self.component[idx] < 0:
+                distance = math.inf
+            else:
+                distance = self.path_lengths(origin, [(x, y)])[0]
+        if distance == math.inf:
+            return {"safe": False, "reason": "unreachable", "details": {"from": {"x": origin[0], "y": origin[1]}}}
+        return {
+            "safe": True,
+            "from": {"x": origin[0], "y": origin[1]},
+            "path_distance": round(distance, 2),
+            "estimated_travel_time_sec": round(distance / self.linear_speed, 2),
+        }
+
+    def check(self, command: Any, pose: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Safety stage for a validated RobotCommand; ``pose`` is the robot's current one, if known."""
+        params = command.command_params
+        if command.command == "move_to":
+            return self.check_point(params.x, params.y, (pose["x"], pose["y"]) if pose else None)
+        if command.command == "rotate":
+            return {"safe": True, "estimated_travel_time_sec": round(params.angle / self.angular_speed, 2)}
+        return {"safe": True}
+
+
+def load_world(path: str = DEFAULT_MAP_PATH) -> WorldModel:
+    with open(path, "r") as f:
+        return WorldModel(json.load(f))
@@ -0,0 +1,90 @@
+"""
+Throughput benchmark: legacy validation path vs. the compiled TypeAdapter path.
+
+"legacy" reproduces the original request handling: json.loads the body, pick
+the model through an if/elif chain and build it with Model(**payload).
+"compiled" is validate_command_json, which parses and validates raw bytes in
+one pass through the discriminated-union TypeAdapter.
+
+Usage (from the robot-validator-api directory):
+    python benchmarks/bench_validator.py --iterations 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from pydantic import ValidationError  # noqa: E402
+
+from api.schema import MoveToCommand, RotateCommand, StartPatrolCommand  # noqa: E402
+from api.validator import validate_command_json, validate_commands_json  # noqa: E402
+
+SAMPLES = [
+    json.dumps({"command": "move_to", "command_params": {"x": 10.0, "y": -5.0}}).encode(),
+    json.dumps({"command": "rotate", "command_params": {"angle": 90.0, "direction": "clockwise"}}).encode(),
+    json.dumps({"command": "start_patrol", "command_params": {"route_id": "bedrooms", "speed": "slow", "repeat_count": 2}}).encode(),
+    json.dumps({"command": "rotate", "command_params": {"angle": "ninety", "direction": "clockwise"}}).encode(),
+    json.dumps({"command": "dance", "command_params": {}}).encode(),
+]
+
+
+def legacy_validate(raw: bytes):
+    payload = json.loads(raw)
+    try:
+        command_type = payload.get("command")
+        if command_type == "move_to":
+            return MoveToCommand(**payload)
+        elif command_type == "rotate":
+            return RotateCommand(**payload)
+        elif command_type == "start_patrol":
+            return StartPatrolCommand(**payload)
+        else:
+            return {"error": "Invalid command", "reason": f"Unknown command '{command_type}'"}
+    except ValidationError as e:
+        return {"error": "Validation failed", "details": e.errors()}
+
+
+def run(fn, iterations: int) -> float:
+    """Return commands validated per second."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(SAMPLES[i % len(SAMPLES)])
+    return iterations / (time.perf_counter() - start)
+
+
+def run_batch(iterations: int, batch_size: int) -> float:
+    batch = b"[" + b",".join(SAMPLES[:3] * (batch_size // 3)) + b"]"
+    count = batch_size // 3 * 3
+    start = time.perf_counter()
+    for _ in range(iterations // count):
+        validate_commands_json(batch)
+    return (iterations // count * count) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=30)
+    args = parser.parse_args()
+
+    # Warm both paths so lazy initialisation doesn't skew the first timing
+    run(legacy_validate, 1000)
+    run(validate_command_json, 1000)
+
+    legacy = run(legacy_validate, args.iterations)
+    compiled = run(validate_command_json, args.iterations)
+    batch = run_batch(args.iterations, args.batch_size)
+
+    print(f"{'path':<28} {'commands/sec':>14} {'speedup':>8}")
+    print(f"{'legacy (if/elif + **payload)':<28} {legacy:>14,.0f} {1.0:>8.2f}")
+    print(f"{'compiled (validate_json)':<28} {compiled:>14,.0f} {compiled / legacy:>8.2f}")
+    print(f"{'batch (%d valid/array)' % args.batch_size:<28} {batch:>14,.0f} {batch / legacy:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
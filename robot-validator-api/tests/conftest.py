@@ -8,6 +8,11 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+# Shared middleware package (installed from common/ in the Docker image)
+COMMON_ROOT = os.path.abspath(os.path.join(PROJECT_ROOT, "..", "common"))
+if COMMON_ROOT not in sys.path:
+    sys.path.insert(0, COMMON_ROOT)
+
 
 @pytest.fixture(scope="session")
 def app():
@@ -39,3 +39,252 @@ async def test_execute_command_validation_error(async_client):
     assert any(isinstance(err, dict) for err in body.get("details", []))
 
 
+@pytest.mark.asyncio
+async def test_execute_command_malformed_json(async_client):
+    resp = await async_client.post(
+        "/execute_command", content=b'{"command": ', headers={"Content-Type": "application/json"}
+    )
+    assert resp.status_code == 400
+    assert resp.json()["error"] == "Invalid JSON"
+
+
+@pytest.mark.asyncio
+async def test_execute_command_batch_valid(async_client):
+    payload = [
+        {"command": "move_to", "command_params": {"x": 0, "y": 0}},
+        {"command": "start_patrol", "command_params": {"route_id": "first_floor"}},
+    ]
+    resp = await async_client.post("/execute_command/batch", json=payload)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["valid"] == 2 and body["invalid"] == 0
+    assert [r["data"]["command"] for r in body["results"]] == ["move_to", "start_patrol"]
+
+
+@pytest.mark.asyncio
+async def test_execute_command_batch_partial_failure(async_client):
+    payload = [
+        {"command": "move_to", "command_params": {"x": 0, "y": 0}},
+        {"command": "rotate", "command_params": {"angle": "ninety", "direction": "clockwise"}},
+    ]
+    resp = await async_client.post("/execute_command/batch", json=payload)
+    assert resp.status_code == 400
+    body = resp.json()
+    assert body["valid"] == 1 and body["invalid"] == 1
+    assert body["results"][1]["error"] == "Validation failed"
+
+
+@pytest.mark.asyncio
+async def test_execute_command_returns_execution_id(async_client):
+    payload = {"command": "rotate", "command_params": {"angle": 45, "direction": "clockwise"}}
+    resp = await async_client.post("/execute_command", params={"robot_id": "r1"}, json=payload)
+    assert resp.status_code == 200
+    execution = resp.json()["execution"]
+    assert execution["robot_id"] == "r1"
+
+    resp = await async_client.get(f"/executions/{execution['execution_id']}/wait", params={"timeout": 1})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "succeeded"
+    assert body["queue_latency_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_get_unknown_execution(async_client):
+    resp = await async_client.get("/executions/does-not-exist")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_execution_metrics(async_client):
+    resp = await async_client.get("/executions/metrics")
+    assert resp.status_code == 200
+    assert "queue_latency" in resp.json()
+
+
+@pytest.mark.asyncio
+async def test_execute_command_replays_same_correlation_id(async_client):
+    headers = {"X-Correlation-ID": "retry-test-1"}
+    payload = {"command": "move_to", "command_params": {"x": 7.5, "y": -2.5}}
+    first = await async_client.post("/execute_command", json=payload, headers=headers)
+    second = await async_client.post("/execute_command", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers.get("X-Idempotent-Replay") == "true"
+    assert second.json() == first.json()
+
+
+@pytest.mark.asyncio
+async def test_execute_command_deduplicates_identical_commands(async_client):
+    payload = {"command": "rotate", "command_params": {"angle": 33.0, "direction": "clockwise"}}
+    first = await async_client.post("/execute_command", json=payload)
+    second = await async_client.post(
+        "/execute_command",
+        json={"command": "rotate", "command_params": {"angle": 33.001, "direction": "clockwise"}},
+    )
+
+    assert second.headers.get("X-Idempotent-Replay") == "true"
+    assert second.json()["execution"]["execution_id"] == first.json()["execution"]["execution_id"]
+
+
+@pytest.mark.asyncio
+async def test_execute_command_rejects_no_go_zone(async_client):
+    payload = {"command": "move_to", "command_params": {"x": 90, "y": 60}}
+    resp = await async_client.post("/execute_command", json=payload)
+    assert resp.status_code == 400
+    body = resp.json()
+    assert body["error"] == "Unsafe command"
+    assert body["reason"] == "no_go_zone"
+
+
+@pytest.mark.asyncio
+async def test_execute_command_reports_travel_time(async_client):
+    payload = {"command": "move_to", "command_params": {"x": 12, "y": 3}}
+    resp = await async_client.post("/execute_command", json=payload)
+    assert resp.status_code == 200
+    assert resp.json()["safety"]["estimated_travel_time_sec"] > 0
+
+
+@pytest.mark.asyncio
+async def test_move_to_distance_starts_at_robot_pose(async_client, monkeypatch):
+    from api import main
+    from api.executor import CommandExecutor
+    from api.simulator import SimulatedRobot
+
+    executor = CommandExecutor(robot_factory=lambda robot_id: SimulatedRobot(robot_id, time_scale=0))
+    monkeypatch.setattr(main, "executor", executor)
+    first = {"command": "move_to", "command_params": {"x": 10, "y": -5}}
+    resp = await async_client.post("/execute_command", params={"robot_id": "pose-test"}, json=first)
+    assert resp.json()["safety"]["from"] == {"x": 0.0, "y": 0.0}
+    await executor.wait(resp.json()["execution"]["execution_id"], timeout=1)
+
+    second = {"command": "move_to", "command_params": {"x": 10, "y": -3}}
+    resp = await async_client.post("/execute_command", params={"robot_id": "pose-test"}, json=second)
+    safety = resp.json()["safety"]
+    assert safety["from"] == {"x": 10.0, "y": -5.0}
+    assert safety["path_distance"] == pytest.approx(2.0, abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_move_to_distance_starts_after_queued_commands(async_client, monkeypatch):
+    import asyncio
+    import threading
+
+    from api import main
+    from api.executor import CommandExecutor
+
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_hook(command, robot):
+        started.set()
+        release.wait(1)
+        return {"status": "completed"}
+
+    # No pose from the backend: the start point comes from the queue alone
+    monkeypatch.setattr(main, "executor", CommandExecutor(hook=blocking_hook))
+    first = {"command": "move_to", "command_params": {"x": 10, "y": -5}}
+    resp = await async_client.post("/execute_command", params={"robot_id": "queue-test"}, json=first)
+    assert resp.json()["safety"]["from"] == {"x": 0.0, "y": 0.0}
+    assert await asyncio.to_thread(started.wait, 1)
+
+    rotate = {"command": "rotate", "command_params": {"angle": 90, "direction": "clockwise"}}
+    await async_client.post("/execute_command", params={"robot_id": "queue-test"}, json=rotate)
+    second = {"command": "move_to", "command_params": {"x": 10, "y": -3}}
+    resp = await async_client.post("/execute_command", params={"robot_id": "queue-test"}, json=second)
+    release.set()
+    assert resp.json()["safety"]["from"] == {"x": 10.0, "y": -5.0}
+
+
+@pytest.mark.asyncio
+async def test_start_patrol_reports_route_eta(async_client):
+    payload = {"command": "start_patrol", "command_params": {"route_id": "bedrooms", "speed": "fast", "repeat_count": 2}}
+    resp = await async_client.post("/execute_command", json=payload)
+    assert resp.status_code == 200
+    route = resp.json()["safety"]["route"]
+    assert route["waypoints"][0] == "landing"
+    assert route["estimated_travel_time_sec"] == pytest.approx(route["loop_duration_sec"] * 2, abs=0.02)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("params", [{"repeat_count": None}, {"speed": None}])
+async def test_start_patrol_null_params_use_defaults(async_client, params):
+    payload = {"command": "start_patrol", "command_params": {"route_id": "first_floor", **params}}
+    resp = await async_client.post("/execute_command", json=payload)
+    assert resp.status_code == 200
+    route = resp.json()["safety"]["route"]
+    assert (route["speed"], route["repeat_count"]) == ("medium", 1)
+
+    resp = await async_client.post("/execute_command/batch", json=[payload])
+    assert resp.status_code == 200
+    assert resp.json()["results"][0]["safety"]["route"]["repeat_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_list_and_get_routes(async_client):
+    resp = await async_client.get("/routes")
+    assert resp.status_code == 200
+    routes = {r["route_id"]: r for r in resp.json()["routes"]}
+    assert set(routes) == {"first_floor", "bedrooms", "second_floor"}
+    assert routes["first_floor"]["loop_duration_sec"]["slow"] > routes["first_floor"]["loop_duration_sec"]["fast"]
+
+    resp = await async_client.get("/routes/second_floor", params={"speed": "slow", "repeat_count": -1})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["estimated_travel_time_sec"] is None
+    assert len(body["legs"]) == len(body["waypoints"])
+
+    resp = await async_client.get("/routes/attic")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_command_schema_endpoint(async_client):
+    resp = await async_client.get("/commands/schema")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["commands"] == ["move_to", "rotate", "start_patrol"]
+    assert "MoveToParams" in body["schema"]["$defs"]
+
+    cached = await async_client.get("/commands/schema", headers={"If-None-Match": resp.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_reload_commands_keeps_registry_version(async_client):
+    before = (await async_client.get("/commands/schema")).json()["version"]
+    resp = await async_client.post("/commands/reload")
+    assert resp.status_code == 200
+    assert resp.json()["previous_version"] == before
+    assert resp.json()["version"] == before
+
+
+@pytest.mark.asyncio
+async def test_server_timing_reports_app_and_compute(async_client):
+    payload = {"command": "rotate", "command_params": {"angle": 33, "direction": "clockwise"}}
+    resp = await async_client.post("/execute_command", json=payload)
+    entries = dict(e.strip().split(";dur=") for e in resp.headers["Server-Timing"].split(","))
+    assert set(entries) == {"app", "compute"}
+    assert 0 <= float(entries["compute"]) <= float(entries["app"])
+
+    resp = await async_client.get("/")
+    assert resp.headers["Server-Timing"].startswith("app;dur=")
+
+
+@pytest.mark.asyncio
+async def test_incoming_correlation_id_is_propagated(async_client):
+    payload = {"command": "dance", "command_params": {}}
+    resp = await async_client.post("/execute_command", json=payload, headers={"X-Correlation-ID": "turn-42"})
+    assert resp.json()["correlation_id"] == "turn-42"
+    assert resp.headers["X-Correlation-ID"] == "turn-42"
+
+
+@pytest.mark.asyncio
+async def test_correlation_id_falls_back_to_trace_id(async_client):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    headers = {"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+    resp = await async_client.post("/execute_command/batch", content=b"[", headers=headers)
+    assert resp.json()["correlation_id"] == trace_id
+
+    resp = await async_client.get("/")
+    generated = resp.headers["X-Correlation-ID"]
+    assert len(generated) == 32 and generated != trace_id
@@ -1,4 +1,6 @@
-from api.control_hooks import move_to, rotate, start_patrol
+from api.control_hooks import execute, move_to, rotate, start_patrol
+from api.schema import MoveToCommand
+from api.simulator import SimulatedRobot
 
 
 def test_move_to_stubbed():
@@ -32,3 +34,25 @@ def test_start_patrol_stubbed_custom():
     assert res["params"]["repeat_count"] == -1
 
 
+def test_hooks_drive_simulated_robot():
+    robot = SimulatedRobot(time_scale=0)
+    res = move_to(3.0, 4.0, robot=robot)
+    assert res["status"] == "completed"
+    assert res["duration_sec"] == 10.0  # 5 units at 0.5 units/sec
+    assert robot.pose()["x"] == 3.0 and robot.pose()["y"] == 4.0
+
+    rotate(90, "counter-clockwise", robot=robot)
+    assert robot.heading == 90.0
+
+
+def test_infinite_patrol_does_not_block():
+    robot = SimulatedRobot(time_scale=1.0)
+    res = start_patrol("bedrooms", repeat_count=-1, robot=robot)
+    assert res["status"] == "patrolling"
+
+
+def test_execute_dispatches_validated_command():
+    cmd = MoveToCommand(command="move_to", command_params={"x": 1, "y": 2})
+    res = execute(cmd)
+    assert res["status"] == "stubbed"
+    assert res["params"] == {"x": 1.0, "y": 2.0}
@@ -0,0 +1,56 @@
+import time
+
+from api.dedup import CommandDeduplicator, command_hash
+from api.schema import MoveToCommand, StartPatrolCommand
+
+
+def _move(x, y):
+    return MoveToCommand(command="move_to", command_params={"x": x, "y": y})
+
+
+def test_command_hash_normalizes_defaults_and_rounding():
+    explicit = StartPatrolCommand(
+        command="start_patrol",
+        command_params={"route_id": "bedrooms", "speed": "medium", "repeat_count": 1},
+    )
+    implicit = StartPatrolCommand(command="start_patrol", command_params={"route_id": "bedrooms"})
+    assert command_hash(explicit, "r1") == command_hash(implicit, "r1")
+    assert command_hash(_move(1.0, 2.0), "r1") == command_hash(_move(1.001, 2.0), "r1")
+
+
+def test_command_hash_differs_per_robot_and_params():
+    assert command_hash(_move(1, 2), "r1") != command_hash(_move(1, 2), "r2")
+    assert command_hash(_move(1, 2), "r1") != command_hash(_move(2, 1), "r1")
+
+
+def test_lookup_by_correlation_and_command():
+    dedup = CommandDeduplicator(ttl_sec=5)
+    response = (200, {"message": "Command validated"})
+    dedup.remember(response, correlation_id="abc", digest="h1")
+
+    assert dedup.by_correlation("abc") == response
+    assert dedup.by_command("h1") == response
+    assert dedup.by_correlation("other") is None
+    assert dedup.by_correlation(None) is None
+
+
+def test_entries_expire_after_ttl():
+    dedup = CommandDeduplicator(ttl_sec=0.05)
+    dedup.remember((200, {}), correlation_id="abc")
+    time.sleep(0.1)
+    assert dedup.by_correlation("abc") is None
+
+
+def test_zero_ttl_disables_cache():
+    dedup = CommandDeduplicator(ttl_sec=0)
+    dedup.remember((200, {}), correlation_id="abc", digest="h1")
+    assert dedup.by_correlation("abc") is None
+    assert dedup.by_command("h1") is None
+
+
+def test_capacity_is_bounded():
+    dedup = CommandDeduplicator(ttl_sec=60, max_entries=2)
+    for i in range(5):
+        dedup.remember((200, {"i": i}), digest=f"h{i}")
+    assert dedup.by_command("h0") is None
+    assert dedup.by_command("h4") == (200, {"i": 4})
@@ -0,0 +1,218 @@
+import asyncio
+import threading
+
+import pytest
+
+from api.executor import CommandExecutor
+from api.routes import RouteRegistry
+from api.schema import MoveToCommand, RotateCommand, StartPatrolCommand
+from api.simulator import SimulatedRobot
+
+
+def _move(x, y):
+    return MoveToCommand(command="move_to", command_params={"x": x, "y": y})
+
+
+def _rotate(angle, direction="clockwise"):
+    return RotateCommand(command="rotate", command_params={"angle": angle, "direction": direction})
+
+
+def _instant_executor():
+    return CommandExecutor(robot_factory=lambda robot_id: SimulatedRobot(robot_id, time_scale=0))
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_immediately_and_completes():
+    executor = _instant_executor()
+    record = executor.submit(_move(3, 4))
+    assert record.status == "queued"
+
+    done = await executor.wait(record.execution_id, timeout=1)
+    assert done.status == "succeeded"
+    assert done.result["status"] == "completed"
+    assert done.result["pose"]["x"] == 3 and done.result["pose"]["y"] == 4
+
+
+@pytest.mark.asyncio
+async def test_pose_is_known_once_the_robot_has_run():
+    executor = _instant_executor()
+    assert executor.pose("default") is None
+    record = executor.submit(_move(3, 4))
+    await executor.wait(record.execution_id, timeout=1)
+    assert executor.pose("default") == {"x": 3, "y": 4, "heading": 0.0}
+    assert CommandExecutor().pose("default") is None
+
+
+@pytest.mark.asyncio
+async def test_commands_run_in_fifo_order_per_robot():
+    executor = _instant_executor()
+    records = [executor.submit(_rotate(a)) for a in (10, 20, 30)]
+    for record in records:
+        await executor.wait(record.execution_id, timeout=1)
+
+    history = executor.robot("default").history
+    assert [h["params"]["angle"] for h in history] == [10, 20, 30]
+
+
+@pytest.mark.asyncio
+async def test_new_move_to_preempts_queued_move_to():
+    release = threading.Event()
+
+    def blocking_hook(command, robot):
+        release.wait(1)
+        return {"status": "completed", "action": command.command}
+
+    executor = CommandExecutor(hook=blocking_hook)
+    running = executor.submit(_rotate(90))
+    await asyncio.sleep(0.01)  # let the worker pick up the rotate
+    first = executor.submit(_move(1, 1))
+    second = executor.submit(_move(2, 2))
+
+    assert first.status == "preempted"
+    release.set()
+    await executor.wait(second.execution_id, timeout=1)
+    assert running.status == "succeeded"
+    assert second.status == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_planned_pose_follows_the_queue():
+    release = threading.Event()
+
+    def blocking_hook(command, robot):
+        release.wait(1)
+        return {"status": "completed"}
+
+    executor = CommandExecutor(hook=blocking_hook)
+    assert executor.planned_pose("default") is None
+    running = executor.submit(_move(1, 1))
+    await asyncio.sleep(0.01)
+    assert executor.planned_pose("default") == {"x": 1, "y": 1}
+    executor.submit(_move(2, 2))
+    executor.submit(_rotate(90))
+    assert executor.planned_pose("default") == {"x": 2, "y": 2}
+    # A new move_to would preempt the queued one and start where the running one ends
+    assert executor.planned_pose("default", _move(5, 5)) == {"x": 1, "y": 1}
+    release.set()
+    await executor.wait(running.execution_id, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_planned_pose_after_a_patrol_is_the_route_start():
+    routes = RouteRegistry({"routes": {"bedrooms": {"waypoints": [
+        {"name": "a", "x": 1, "y": 1}, {"name": "b", "x": 4, "y": 1}, {"name": "c", "x": 4, "y": 4},
+    ]}}})
+    executor = CommandExecutor(robot_factory=lambda robot_id: SimulatedRobot(robot_id, time_scale=0, routes=routes))
+    record = executor.submit(_rotate(10))
+    await executor.wait(record.execution_id, timeout=1)
+    patrol = StartPatrolCommand(command="start_patrol", command_params={"route_id": "bedrooms", "speed": "fast", "repeat_count": 1})
+    executor.submit(patrol)
+    executor.submit(_rotate(10))
+    pose = executor.planned_pose("default")
+    assert (pose["x"], pose["y"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_cancel_only_affects_queued_commands():
+    release = threading.Event()
+
+    def blocking_hook(command, robot):
+        release.wait(1)
+        return {"status": "completed"}
+
+    executor = CommandExecutor(hook=blocking_hook)
+    running = executor.submit(_rotate(90))
+    await asyncio.sleep(0.01)
+    queued = executor.submit(_rotate(45))
+
+    assert executor.cancel(queued.execution_id) is True
+    assert executor.cancel(running.execution_id) is False
+    release.set()
+    await executor.wait(running.execution_id, timeout=1)
+    assert queued.status == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_failed_hook_marks_execution_failed():
+    def failing_hook(command, robot):
+        raise RuntimeError("motor fault")
+
+    executor = CommandExecutor(hook=failing_hook)
+    record = executor.submit(_move(0, 0))
+    await executor.wait(record.execution_id, timeout=1)
+    assert record.status == "failed"
+    assert "motor fault" in record.error
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_queue_latency():
+    executor = _instant_executor()
+    for angle in (10, 20):
+        record = executor.submit(_rotate(angle))
+    await executor.wait(record.execution_id, timeout=1)
+
+    metrics = executor.metrics()
+    assert metrics["queue_latency"]["count"] == 2
+    assert metrics["completed"]["succeeded"] == 2
+    assert metrics["queue_depth"]["default"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_rotates_are_merged_into_net_rotation():
+    release = threading.Event()
+
+    def blocking_hook(command, robot):
+        release.wait(1)
+        return {"status": "completed", "params": command.command_params.model_dump()}
+
+    executor = CommandExecutor(hook=blocking_hook)
+    executor.submit(_move(1, 1))
+    await asyncio.sleep(0.01)  # robot is busy moving
+    first = executor.submit(_rotate(90), merge_window=1.0)
+    second = executor.submit(_rotate(30, "counter-clockwise"), merge_window=1.0)
+    third = executor.submit(_rotate(10), merge_window=1.0)
+
+    assert second is first and third is first
+    assert first.merged == 2
+    assert first.command.command_params.angle == 70
+    assert first.command.command_params.direction == "clockwise"
+    release.set()
+    await executor.wait(first.execution_id, timeout=1)
+    assert first.result["params"]["angle"] == 70
+
+
+@pytest.mark.asyncio
+async def test_rotates_are_not_merged_without_window():
+    release = threading.Event()
+
+    def blocking_hook(command, robot):
+        release.wait(1)
+        return {"status": "completed"}
+
+    executor = CommandExecutor(hook=blocking_hook)
+    executor.submit(_move(1, 1))
+    await asyncio.sleep(0.01)
+    first = executor.submit(_rotate(90))
+    second = executor.submit(_rotate(90))
+    release.set()
+    assert first is not second
+    await executor.wait(second.execution_id, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_new_command_interrupts_endless_patrol():
+    spec = {"routes": {"bedrooms": {"waypoints": [{"name": "a", "x": 0, "y": 0}, {"name": "b", "x": 3, "y": 0}]}}}
+    routes = RouteRegistry(spec)
+    executor = CommandExecutor(robot_factory=lambda robot_id: SimulatedRobot(robot_id, time_scale=0, routes=routes))
+    patrol = executor.submit(
+        StartPatrolCommand(command="start_patrol", command_params={"route_id": "bedrooms", "repeat_count": -1})
+    )
+    await asyncio.sleep(0.01)
+    assert patrol.status == "running"
+
+    move = executor.submit(_move(1, 1))
+    await executor.wait(move.execution_id, timeout=1)
+    assert patrol.status == "succeeded"
+    assert patrol.result["status"] == "interrupted"
+    assert patrol.result["legs_completed"] > 0
+    assert move.status == "succeeded"
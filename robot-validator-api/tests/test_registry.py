@@ -0,0 +1,94 @@
+import json
+
+import pytest
+import yaml
+from pydantic import ValidationError
+
+from api.registry import CommandRegistry, RegistryHolder, load_registry
+from api.schema import MoveToCommand, StartPatrolParams
+from api.validator import validate_command, validate_command_json
+
+DOCK_SPEC = {
+    "commands": {
+        "dock": {
+            "description": "Return to the charging dock.",
+            "params": {
+                "reason": {"type": "enum", "values": ["battery", "user"], "default": "user"},
+                "retries": {"type": "int", "default": 0, "ge": 0, "le": 3},
+            },
+        },
+        "beep": {"params": {"times": {"type": "int", "ge": 1}}},
+    }
+}
+
+
+def test_default_registry_matches_builtin_models():
+    registry = load_registry()
+    assert registry.names == ["move_to", "rotate", "start_patrol"]
+    assert MoveToCommand.__name__ == "MoveToCommand"
+    assert StartPatrolParams(route_id="bedrooms").speed == "medium"
+    assert StartPatrolParams(route_id="bedrooms", speed=None).speed is None
+    with pytest.raises(ValidationError):
+        StartPatrolParams(route_id="first_floor", extra=1)
+
+
+def test_generated_models_enforce_constraints_and_defaults():
+    registry = CommandRegistry(DOCK_SPEC)
+    dock = registry.adapters["dock"].validate_python({"command": "dock", "command_params": {}})
+    assert dock.command_params.reason == "user"
+    assert dock.command_params.retries == 0
+    assert type(dock).__doc__ == "Return to the charging dock."
+    with pytest.raises(ValidationError):
+        registry.adapters["beep"].validate_python({"command": "beep", "command_params": {"times": 0}})
+
+
+def test_validator_dispatch_uses_given_registry():
+    registry = CommandRegistry(DOCK_SPEC)
+    res = validate_command_json(b'{"command": "beep", "command_params": {"times": 2}}', registry)
+    assert res.command == "beep"
+    res = validate_command({"command": "move_to", "command_params": {"x": 1, "y": 1}}, registry)
+    assert res["error"] == "Invalid command"
+
+
+@pytest.mark.parametrize(
+    "params, match",
+    [
+        ({"x": {"type": "complex"}}, "unsupported type"),
+        ({"x": {"type": "enum"}}, "non-empty 'values'"),
+        ({"x": {"type": "float", "maximum": 3}}, "unknown keys"),
+    ],
+)
+def test_invalid_specs_rejected(params, match):
+    with pytest.raises(ValueError, match=match):
+        CommandRegistry({"commands": {"bad": {"params": params}}})
+
+
+def test_empty_registry_rejected():
+    with pytest.raises(ValueError):
+        CommandRegistry({"commands": {}})
+
+
+def test_json_schema_is_discriminated_union():
+    schema = load_registry().json_schema
+    assert set(schema["discriminator"]["mapping"]) == {"move_to", "rotate", "start_patrol"}
+    assert schema["$defs"]["RotateParams"]["properties"]["direction"]["enum"] == ["clockwise", "counter-clockwise"]
+
+
+def test_holder_swaps_and_keeps_old_on_error(tmp_path):
+    path = tmp_path / "commands.yaml"
+    path.write_text(yaml.safe_dump(DOCK_SPEC))
+    holder = RegistryHolder(str(path))
+    snapshot = holder.current
+
+    path.write_text(json.dumps({"commands": {"beep": {"params": {"times": {"type": "int"}}}}}))
+    previous, new = holder.reload()
+    assert previous is snapshot
+    assert holder.current is new and new.names == ["beep"]
+    assert new.version != snapshot.version
+    # A validation holding the old snapshot is unaffected by the swap
+    assert snapshot.adapters["dock"].validate_python({"command": "dock", "command_params": {}})
+
+    path.write_text("commands:\n  beep:\n    params:\n      times: {type: nope}\n")
+    with pytest.raises(ValueError):
+        holder.reload()
+    assert holder.current is new
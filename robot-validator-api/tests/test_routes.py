@@ -0,0 +1,148 @@
+import itertools
+import math
+
+import pytest
+
+from api.routes import RouteRegistry, load_routes
+from api.schema import StartPatrolCommand
+from api.simulator import SimulatedRobot
+from api.world import WorldModel, load_world
+
+# Corners of a square listed in a criss-crossing order
+SQUARE = {
+    "speeds": {"slow": 1.0, "fast": 2.0},
+    "routes": {
+        "square": {
+            "waypoints": [
+                {"name": "a", "x": 0, "y": 0},
+                {"name": "c", "x": 4, "y": 4},
+                {"name": "b", "x": 4, "y": 0},
+                {"name": "d", "x": 0, "y": 4},
+            ]
+        }
+    },
+}
+
+
+def _patrol(route_id, speed="medium", repeat_count=1):
+    return StartPatrolCommand(
+        command="start_patrol",
+        command_params={"route_id": route_id, "speed": speed, "repeat_count": repeat_count},
+    )
+
+
+@pytest.fixture(scope="module")
+def home_routes():
+    return load_routes(world=load_world())
+
+
+def test_order_is_optimized_and_starts_at_first_waypoint():
+    plan = RouteRegistry(SQUARE).plan("square", "slow")
+    names = [w.name for w in plan.waypoints]
+    assert names[0] == "a"
+    assert names in (["a", "b", "c", "d"], ["a", "d", "c", "b"])
+    assert plan.loop_length == pytest.approx(16.0)
+
+
+def test_plans_are_cached_per_speed():
+    routes = RouteRegistry(SQUARE)
+    slow, fast = routes.plan("square", "slow"), routes.plan("square", "fast")
+    assert routes.plan("square", "slow") is slow
+    assert slow.waypoints == fast.waypoints
+    assert slow.loop_duration_sec == pytest.approx(16.0)
+    assert fast.loop_duration_sec == pytest.approx(8.0)
+    assert routes.plan("square", "medium") is None
+
+
+def test_eta_and_legs():
+    plan = RouteRegistry(SQUARE).plan("square", "fast")
+    assert plan.eta_sec(3) == pytest.approx(24.0)
+    assert plan.eta_sec(-1) is None
+    assert len(list(plan.iter_legs(2))) == 8
+    # Endless patrols cycle the same precompiled legs
+    endless = list(itertools.islice(plan.iter_legs(-1), 9))
+    assert endless[8] is plan.legs[0]
+
+
+def test_geodesic_legs_follow_the_world():
+    world = WorldModel({
+        "bounds": {"min_x": -10, "max_x": 10, "min_y": -10, "max_y": 10},
+        "dock": {"x": -5, "y": 0},
+        "obstacles": [{"name": "wall", "rect": [0, -10, 0, 5]}],
+    })
+    spec = {"routes": {"across": {"waypoints": [{"name": "w", "x": -5, "y": 0}, {"name": "e", "x": 5, "y": 0}]}}}
+    geodesic = RouteRegistry(spec, world).plan("across")
+    straight = RouteRegistry(spec).plan("across")
+    assert straight.loop_length == pytest.approx(20.0)
+    assert geodesic.loop_length > straight.loop_length
+
+
+def test_unreachable_waypoint_rejected():
+    world = WorldModel({
+        "bounds": {"min_x": -10, "max_x": 10, "min_y": -10, "max_y": 10},
+        "dock": {"x": -5, "y": 0},
+        "obstacles": [{"name": "wall", "rect": [0, -10, 0, 10]}],
+    })
+    spec = {"routes": {"split": {"waypoints": [{"name": "w", "x": -5, "y": 0}, {"name": "e", "x": 5, "y": 0}]}}}
+    with pytest.raises(ValueError, match="unreachable"):
+        RouteRegistry(spec, world)
+
+
+def test_home_routes_cover_schema_route_ids(home_routes):
+    assert set(home_routes.route_ids) == {"first_floor", "bedrooms", "second_floor"}
+    for route_id in home_routes.route_ids:
+        plan = home_routes.plan(route_id, "medium")
+        assert math.isfinite(plan.loop_length) and plan.loop_length > 0
+
+
+def test_check_reports_route_eta(home_routes):
+    res = home_routes.check(_patrol("bedrooms", "fast", 2))
+    assert res["safe"] is True
+    plan = home_routes.plan("bedrooms", "fast")
+    assert res["route"]["estimated_travel_time_sec"] == round(plan.loop_duration_sec * 2, 2)
+
+    res = home_routes.check(_patrol("bedrooms", repeat_count=-1))
+    assert res["route"]["estimated_travel_time_sec"] is None
+
+
+def test_check_treats_null_params_as_defaults(home_routes):
+    res = home_routes.check(_patrol("first_floor", speed=None, repeat_count=None))
+    assert res["safe"] is True
+    assert res["route"]["speed"] == "medium"
+    assert res["route"]["repeat_count"] == 1
+    assert res["route"]["estimated_travel_time_sec"] == round(home_routes.plan("first_floor").loop_duration_sec, 2)
+
+
+def test_check_unknown_route():
+    res = RouteRegistry(SQUARE).check(_patrol("first_floor", "slow"))
+    assert res["safe"] is False
+    assert res["reason"] == "unknown_route"
+
+
+def test_simulated_patrol_follows_plan():
+    routes = RouteRegistry(SQUARE)
+    robot = SimulatedRobot(time_scale=0, routes=routes)
+    res = robot.start_patrol("square", "fast", repeat_count=2)
+    assert res["status"] == "completed"
+    assert res["legs_completed"] == 8
+    assert res["loops_completed"] == 2
+    assert res["duration_sec"] == pytest.approx(16.0)
+    assert res["pose"]["x"] == 0 and res["pose"]["y"] == 0
+
+
+def test_simulated_patrol_with_null_params():
+    res = SimulatedRobot(time_scale=0).start_patrol("first_floor", None, None)
+    assert res["status"] == "completed"
+    assert res["params"] == {"route_id": "first_floor", "speed": "medium", "repeat_count": 1}
+
+    robot = SimulatedRobot(time_scale=0, routes=RouteRegistry(SQUARE))
+    assert robot.start_patrol("square", "fast", None)["loops_completed"] == 1
+
+
+def test_simulated_endless_patrol_stops_on_interrupt():
+    robot = SimulatedRobot(time_scale=0, routes=RouteRegistry(SQUARE))
+    robot.interrupt()
+    res = robot.start_patrol("square", "slow", repeat_count=-1)
+    assert res["status"] == "interrupted"
+    # The flag is consumed; the next patrol runs normally
+    assert robot.start_patrol("square", "slow")["status"] == "completed"
@@ -74,3 +74,13 @@ def test_start_patrol_invalid_repeat_count_type():
         StartPatrolParams(route_id="first_floor", repeat_count="three")
 
 
+@pytest.mark.parametrize("x,y", [(100.5, 0), (0, -101)])
+def test_move_to_out_of_range(x, y):
+    with pytest.raises(ValidationError):
+        MoveToParams(x=x, y=y)
+
+
+@pytest.mark.parametrize("angle", [-1, 360.5])
+def test_rotate_angle_out_of_range(angle):
+    with pytest.raises(ValidationError):
+        RotateParams(angle=angle, direction="clockwise")
@@ -1,6 +1,13 @@
 # tests/test_validator.py
+import json
+
 import pytest
-from api.validator import validate_command, parse_and_validate_text_output
+from api.validator import (
+    validate_command,
+    validate_command_json,
+    validate_commands_json,
+    parse_and_validate_text_output,
+)
 
 
 def test_validate_command_move_to():
@@ -109,4 +116,73 @@ def test_parse_json_with_prose():
     raw = 'Sure! {"command":"rotate","command_params":{"angle":90,"direction":"clockwise"}} Thanks.'
     ok, result = parse_and_validate_text_output(raw)
     assert ok is True
-    assert result["command"] == "rotate"
\ No newline at end of file
+    assert result["command"] == "rotate"
+
+
+def test_validate_command_json_start_patrol():
+    """Raw JSON bytes are parsed and validated in one step."""
+    raw = b'{"command":"start_patrol","command_params":{"route_id":"bedrooms"}}'
+    result = validate_command_json(raw)
+
+    assert result.command == "start_patrol"
+    assert result.command_params.speed == "medium"
+
+
+def test_validate_command_json_unknown_command():
+    result = validate_command_json(b'{"command":"fly","command_params":{}}')
+    assert result["error"] == "Invalid command"
+    assert "fly" in result["reason"]
+
+
+def test_validate_command_json_malformed():
+    result = validate_command_json(b'{"command": "move_to",')
+    assert result["error"] == "Invalid JSON"
+
+
+def test_validate_command_json_error_locations_match_validate_command():
+    """Discriminator tag is stripped so error locations match the dict-based path."""
+    payload = {"command": "move_to", "command_params": {"x": 1.0}}
+    from_json = validate_command_json(json.dumps(payload))
+    from_dict = validate_command(payload)
+    assert [e["loc"] for e in from_json["details"]] == [e["loc"] for e in from_dict["details"]]
+
+
+def test_validate_commands_json_all_valid():
+    raw = json.dumps([
+        {"command": "move_to", "command_params": {"x": 1, "y": 2}},
+        {"command": "rotate", "command_params": {"angle": 90, "direction": "clockwise"}},
+    ])
+    results = validate_commands_json(raw)
+    assert [r.command for r in results] == ["move_to", "rotate"]
+
+
+def test_validate_commands_json_reports_each_item():
+    raw = json.dumps([
+        {"command": "move_to", "command_params": {"x": 1, "y": 2}},
+        {"command": "dance", "command_params": {}},
+        "not-an-object",
+    ])
+    results = validate_commands_json(raw)
+    assert results[0].command == "move_to"
+    assert results[1]["error"] == "Invalid command"
+    assert results[2]["error"] == "Invalid command"
+
+
+def test_validate_commands_json_requires_array():
+    result = validate_commands_json(b'{"command":"move_to","command_params":{"x":1,"y":2}}')
+    assert result["error"] == "Invalid batch"
+
+
+@pytest.mark.parametrize("item", [
+    {"command": "move_to", "command_params": {"x": 1, "y": 2}},
+    {"command": "move_to", "command_params": {"x": 500, "y": 2}},
+])
+def test_oversized_batch_rejected_before_item_validation(monkeypatch, item):
+    import api.validator as validator
+
+    def fail(*args, **kwargs):
+        raise AssertionError("items validated")
+
+    monkeypatch.setattr(validator, "validate_command", fail)
+    result = validate_commands_json(json.dumps([item] * (validator.MAX_BATCH_SIZE + 1)))
+    assert result == {"error": "Invalid batch", "reason": f"Batch exceeds {validator.MAX_BATCH_SIZE} commands"}
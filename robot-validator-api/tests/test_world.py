@@ -0,0 +1,129 @@
+import json
+import math
+
+import pytest
+
+from api.schema import MoveToCommand, RotateCommand
+from api.world import WorldModel, load_world
+
+# 21 x 21 room with a wall at x=0 (door at y in [-2, 2]), a no-go zone and a sealed box
+SMALL_MAP = {
+    "resolution": 1.0,
+    "bounds": {"min_x": -10, "max_x": 10, "min_y": -10, "max_y": 10},
+    "dock": {"x": -5, "y": 0},
+    "robot_radius": 0.0,
+    "linear_speed": 1.0,
+    "obstacles": [
+        {"name": "wall_south", "rect": [0, -10, 0, -3]},
+        {"name": "wall_north", "rect": [0, 3, 0, 10]},
+        {"name": "box_s", "rect": [5, 5, 9, 5]},
+        {"name": "box_n", "rect": [5, 9, 9, 9]},
+        {"name": "box_w", "rect": [5, 5, 5, 9]},
+        {"name": "box_e", "rect": [9, 5, 9, 9]},
+    ],
+    "no_go_zones": [{"name": "rug", "rect": [-9, -9, -7, -7]}],
+}
+
+
+@pytest.fixture(scope="module")
+def small_world():
+    return WorldModel(SMALL_MAP)
+
+
+def test_free_reachable_point_has_travel_time(small_world):
+    res = small_world.check_point(-5, 3)
+    assert res["safe"] is True
+    assert res["path_distance"] == 3.0
+    assert res["estimated_travel_time_sec"] == 3.0
+
+
+def test_distance_is_measured_from_the_robot(small_world):
+    from_dock = small_world.check_point(-5, 3)
+    res = small_world.check_point(-5, 3, origin=(-5, 6))
+    assert from_dock["from"] == {"x": -5.0, "y": 0.0}
+    assert res["from"] == {"x": -5, "y": 6}
+    assert res["path_distance"] == 3.0
+    assert small_world.check_point(5, 0, origin=(4, 0))["estimated_travel_time_sec"] == 1.0
+    # Starting at the dock's cell uses the precomputed field
+    assert small_world.check_point(-5, 3, origin=(-5, 0)) == from_dock
+
+
+def test_robot_off_free_space_cannot_plan(small_world):
+    res = small_world.check_point(-5, 3, origin=(0, 6))
+    assert res["reason"] == "unreachable"
+    assert res["details"] == {"from": {"x": 0, "y": 6}}
+
+
+def test_path_goes_through_door(small_world):
+    res = small_world.check_point(5, -8)
+    assert res["safe"] is True
+    # Octile path must detour through the door, so it is longer than the straight line
+    assert res["path_distance"] > math.hypot(10, 8)
+
+
+def test_obstacle_rejected(small_world):
+    res = small_world.check_point(0, 6)
+    assert res == {"safe": False, "reason": "obstacle", "details": {"clearance": 0.0, "robot_radius": 0.0}}
+
+
+def test_no_go_zone_rejected(small_world):
+    res = small_world.check_point(-8, -8)
+    assert res["safe"] is False
+    assert res["reason"] == "no_go_zone"
+    assert res["details"]["zone"] == "rug"
+
+
+def test_enclosed_area_unreachable(small_world):
+    res = small_world.check_point(7, 7)
+    assert res["safe"] is False
+    assert res["reason"] == "unreachable"
+
+
+def test_unreachable_from_the_robot_needs_no_search(small_world, monkeypatch):
+    def no_search(*args):
+        raise AssertionError("searched")
+
+    monkeypatch.setattr(small_world, "path_lengths", no_search)
+    res = small_world.check_point(7, 7, origin=(5, -2))
+    assert res["reason"] == "unreachable"
+    assert res["details"] == {"from": {"x": 5, "y": -2}}
+    assert small_world.component[small_world._index(*small_world.cell(5, -2))] == small_world.component[
+        small_world._index(*small_world.cell(*small_world.dock))]
+
+
+def test_robot_radius_inflates_obstacles():
+    spec = dict(SMALL_MAP, robot_radius=2.0)
+    world = WorldModel(spec)
+    assert world.check_point(-1, 6)["reason"] == "obstacle"
+    assert world.check_point(-3, 6)["safe"] is True
+
+
+def test_dock_must_be_free():
+    spec = dict(SMALL_MAP, dock={"x": 0, "y": 5})
+    with pytest.raises(ValueError):
+        WorldModel(spec)
+
+
+def test_check_dispatches_on_command(small_world):
+    move = MoveToCommand(command="move_to", command_params={"x": -8, "y": -8})
+    rotate = RotateCommand(command="rotate", command_params={"angle": 180, "direction": "clockwise"})
+    assert small_world.check(move)["reason"] == "no_go_zone"
+    assert small_world.check(rotate) == {"safe": True, "estimated_travel_time_sec": 2.0}
+
+    reachable = MoveToCommand(command="move_to", command_params={"x": 5, "y": 0})
+    pose = {"x": 5.0, "y": -2.0, "heading": 0.0}
+    assert small_world.check(reachable, pose)["path_distance"] == 2.0
+
+
+def test_load_world_from_file(tmp_path):
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps(SMALL_MAP))
+    world = load_world(str(path))
+    assert world.check_point(-5, 3)["safe"] is True
+
+
+def test_default_home_map():
+    world = load_world()
+    assert world.check_point(10, -5)["safe"] is True
+    assert world.check_point(90, 60)["details"]["zone"] == "staircase"
+    assert world.check_point(80, -80)["reason"] == "unreachable"
@@ -0,0 +1,58 @@
+import io
+import logging
+import subprocess
+import time
+from typing import Tuple
+
+import numpy as np
+import soundfile as sf
+
+# Whisper works on 16 kHz mono float32
+SAMPLE_RATE = 16000
+
+
+def decode_native(audio_data: bytes) -> np.ndarray:
+    """
+    Decode WAV/FLAC/OGG (Vorbis or Opus) already at 16 kHz in-process with libsndfile.
+    Raises ValueError if the data needs the ffmpeg path (other container or sample rate).
+    """
+    try:
+        samples, sample_rate = sf.read(io.BytesIO(audio_data), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError) as e:
+        raise ValueError(f"Not decodable by libsndfile: {e}")
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f"Sample rate {sample_rate} Hz needs resampling")
+    # Downmix channels
+    return samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+
+
+def decode_ffmpeg(audio_data: bytes) -> np.ndarray:
+    """
+    Decode anything ffmpeg understands to 16 kHz mono, piping bytes through
+    stdin/stdout (same conversion as whisper.load_audio, without a temp file).
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+    try:
+        out = subprocess.run(cmd, input=audio_data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"ffmpeg failed to decode audio: {e.stderr.decode(errors='replace')[-500:]}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(audio_data: bytes) -> Tuple[np.ndarray, str, float]:
+    """
+    Decode uploaded audio for Whisper.
+    Returns (samples, decoder, decode_ms); decoder is "native" or "ffmpeg".
+    """
+    start = time.perf_counter()
+    try:
+        samples, decoder = decode_native(audio_data), "native"
+    except ValueError as e:
+        logging.debug("Falling back to ffmpeg: %s", e)
+        samples, decoder = decode_ffmpeg(audio_data), "ffmpeg"
+    return samples, decoder, (time.perf_counter() - start) * 1000
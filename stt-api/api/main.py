@@ -1,21 +1,111 @@
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Union
+
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
 from .schema import HealthResponse, TranscribeResponse
-from .utils import transcribe_audio
+from .utils import DRAFT_MODEL_NAME, decode, draft_model, model, run_whisper, transcribe_audio
 from pydantic import BaseModel
+from shato_common import CorrelationMiddleware, get_correlation_id
 BaseModel.model_config = {"arbitrary_types_allowed": True}
 
+NDJSON = "application/x-ndjson"
+
 app = FastAPI(
     title="stt_service",
     description="Audio to Text Transcription Service",
     version="1.0.0",
 )
 
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """
+    Report time in the service (app) and in decode + Whisper (compute) for the
+    orchestrator. NDJSON responses send their headers before any work is done,
+    so _transcript_events puts the same entries in its final event instead.
+    """
+    start = request.state.start = time.perf_counter()
+    response = await call_next(request)
+    entries = [f"app;dur={(time.perf_counter() - start) * 1000:.1f}"]
+    compute_ms = getattr(request.state, "compute_ms", None)
+    if compute_ms is not None:
+        entries.append(f"compute;dur={compute_ms:.1f}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+# Added last so it wraps the middleware above
+app.add_middleware(CorrelationMiddleware)
+
 @app.get("/", response_model=HealthResponse)
 async def health() -> HealthResponse:
     return HealthResponse(message="server is running")
 
 @app.post("/transcribe", response_model=TranscribeResponse)
-async def transcribe(audio: UploadFile = File(...)) -> TranscribeResponse:
+async def transcribe(request: Request, audio: UploadFile = File(...)) -> Union[TranscribeResponse, StreamingResponse]:
     audio_bytes = await audio.read()
-    id_correlation, text = transcribe_audio(audio_bytes)
+    return await _transcribe(request, audio_bytes)
+
+@app.post("/transcribe/raw", response_model=TranscribeResponse)
+async def transcribe_raw(request: Request) -> Union[TranscribeResponse, StreamingResponse]:
+    """
+    Same as /transcribe with the audio file itself as the request body
+    (chunked or not, any Content-Type): no multipart encoding on the
+    caller's side and no multipart parsing or spooling here.
+    Both endpoints stream partial and final transcripts with ``Accept: application/x-ndjson``.
+    """
+    audio_bytes = bytearray()
+    async for chunk in request.stream():
+        audio_bytes += chunk
+    if not audio_bytes:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    return await _transcribe(request, audio_bytes)
+
+async def _transcribe(request: Request, audio_bytes: bytes) -> Union[TranscribeResponse, StreamingResponse]:
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_transcript_events(request, audio_bytes), media_type=NDJSON)
+    start = time.perf_counter()
+    # Decode + Whisper take seconds: keep the loop free for other uploads and health checks
+    id_correlation, text = await asyncio.to_thread(transcribe_audio, bytes(audio_bytes))
+    request.state.compute_ms = (time.perf_counter() - start) * 1000
     return TranscribeResponse(id_correlation=id_correlation, text=text)
+
+async def _transcript_events(request: Request, audio_bytes: bytes) -> AsyncIterator[bytes]:
+    """
+    NDJSON progress: {"type": "partial", "text", "confidence", ...} from the
+    draft model (if STT_DRAFT_MODEL is set), then {"type": "final",
+    "id_correlation", "text", "confidence", "server_timing", ...} from the main
+    model, or {"type": "error", "message"} if decoding or transcription fails.
+    """
+    def event(**fields) -> bytes:
+        return json.dumps(fields).encode() + b"\n"
+
+    def elapsed_ms(since: float) -> float:
+        return (time.perf_counter() - since) * 1000
+
+    id_correlation = get_correlation_id()
+    try:
+        start = time.perf_counter()
+        samples = await asyncio.to_thread(decode, bytes(audio_bytes))
+        total_ms = elapsed_ms(start)
+        if draft_model is not None:
+            start = time.perf_counter()
+            text, confidence = await asyncio.to_thread(run_whisper, draft_model, samples)
+            compute_ms = elapsed_ms(start)
+            total_ms += compute_ms
+            logging.info("Draft transcript (%s, confidence %.3f) in %.1f ms: %s", DRAFT_MODEL_NAME, confidence, compute_ms, text)
+            yield event(type="partial", text=text, confidence=confidence, model=DRAFT_MODEL_NAME, compute_ms=round(compute_ms, 1))
+        start = time.perf_counter()
+        text, confidence = await asyncio.to_thread(run_whisper, model, samples)
+        compute_ms = elapsed_ms(start)
+        logging.info("Transcription completed in %.1f ms: %s", compute_ms, text)
+        # Decode and every model run, not the time spent waiting for the caller to read the partial
+        request.state.compute_ms = total_ms + compute_ms
+        server_timing = f"app;dur={elapsed_ms(request.state.start):.1f}, compute;dur={request.state.compute_ms:.1f}"
+        yield event(type="final", id_correlation=id_correlation, text=text, confidence=confidence,
+                    compute_ms=round(compute_ms, 1), server_timing=server_timing)
+    except Exception as e:
+        logging.error("Error processing audio: %s", e)
+        yield event(type="error", message=f"Error processing audio: {e}")
@@ -1,41 +1,81 @@
-import io
-import uuid
 import logging
+import math
+import os
+import threading
+
+import numpy as np
 import whisper
+from shato_common import CorrelationIdFilter, get_correlation_id
+
+from .audio import SAMPLE_RATE, decode_audio
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
+    format="%(asctime)s [%(levelname)s] [%(correlation_id)s] %(message)s"
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(CorrelationIdFilter())
 
 # Load Whisper model once at startup
 model = whisper.load_model("base.en")
 
+# Smaller model for a quick first transcript (partial event on the NDJSON
+# stream); the orchestrator may start the LLM on it while the main model runs.
+# Only useful with the orchestrator's speculative_llm on, so off unless set (e.g. tiny.en).
+DRAFT_MODEL_NAME = os.getenv("STT_DRAFT_MODEL", "")
+draft_model = whisper.load_model(DRAFT_MODEL_NAME) if DRAFT_MODEL_NAME else None
+
+# Whisper installs its kv-cache hooks on the model for each call: one decode per model at a time
+_model_locks = {id(m): threading.Lock() for m in (model, draft_model) if m is not None}
+
+def decode(audio_data: bytes) -> np.ndarray:
+    """
+    16 kHz WAV/FLAC/OGG-Opus (what the UI uploads) is decoded in-process;
+    anything else (MP3, 48 kHz recordings, ...) goes through ffmpeg.
+    """
+    samples, decoder, decode_ms = decode_audio(audio_data)
+    logging.info(
+        "Decoded %d bytes via %s in %.1f ms (%.2fs of audio)",
+        len(audio_data), decoder, decode_ms, len(samples) / SAMPLE_RATE,
+    )
+    return samples
+
+def run_whisper(whisper_model, samples: np.ndarray) -> tuple[str, float]:
+    """
+    Returns (text, confidence). Confidence is the mean per-segment token
+    probability (exp of Whisper's avg_logprob), scaled down by the chance that
+    a segment is not speech at all; 0.0 when nothing was recognized.
+    """
+    with _model_locks[id(whisper_model)]:
+        result = whisper_model.transcribe(samples)
+    text = result.get("text", "").strip()
+    segments = result.get("segments") or []
+    if not text or not segments:
+        return text, 0.0
+    confidence = sum(
+        math.exp(seg["avg_logprob"]) * (1.0 - seg["no_speech_prob"]) for seg in segments
+    ) / len(segments)
+    return text, round(confidence, 3)
+
 def transcribe_audio(audio_data: bytes) -> tuple[str, str]:
     """
-    Transcribe audio bytes (WAV/MP3/etc.) into text using OpenAI Whisper.
-    Returns (id_correlation, transcription).
+    Transcribe audio bytes into text using OpenAI Whisper.
+    Returns (id_correlation, transcription); the ID is the one bound by
+    CorrelationMiddleware from the caller's X-Correlation-ID.
     """
     try:
-        # Generate a correlation ID for tracking
-        id_correlation = str(uuid.uuid4())
-
-        # Save bytes to a temporary in-memory buffer
-        with io.BytesIO(audio_data) as audio_file:
-            temp_path = f"/tmp/{id_correlation}.wav"
-            with open(temp_path, "wb") as f:
-                f.write(audio_file.read())
+        id_correlation = get_correlation_id()
+        samples = decode(audio_data)
 
         # Transcribe
-        logging.info(f"[{id_correlation}] Starting transcription")
-        result = model.transcribe(temp_path)
-        text = result.get("text", "").strip()
+        logging.info("Starting transcription")
+        text, _ = run_whisper(model, samples)
 
-        logging.info(f"[{id_correlation}] Transcription completed: {text}")
+        logging.info("Transcription completed: %s", text)
 
         return id_correlation, text
 
     except Exception as e:
-        logging.error(f"Error processing audio: {e}")
+        logging.error("Error processing audio: %s", e)
         raise ValueError(f"Error processing audio: {str(e)}")
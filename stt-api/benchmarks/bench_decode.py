@@ -0,0 +1,86 @@
+"""
+Upload size and decode time benchmark for the STT audio path.
+
+Compares what the UI used to send (48 kHz stereo 16-bit WAV, decoded by
+ffmpeg) with what it sends now (16 kHz mono PCM WAV or OGG/Opus, decoded
+in-process by libsndfile). The baseline row needs ffmpeg on PATH.
+
+Usage (from the stt-api directory):
+    python benchmarks/bench_decode.py
+    python benchmarks/bench_decode.py --seconds 8 --runs 20 --json
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+
+import numpy as np
+import soundfile as sf
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from api.audio import decode_audio  # noqa: E402
+
+
+def speech_like(seconds: float, sample_rate: int, channels: int) -> np.ndarray:
+    """Amplitude-modulated harmonics with a little noise, roughly voice-shaped."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 900, 2400)))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    rng = np.random.default_rng(0)
+    mono = 0.2 * voice * envelope + 0.01 * rng.standard_normal(t.size)
+    return np.repeat(mono[:, None], channels, axis=1).astype(np.float32) if channels > 1 else mono.astype(np.float32)
+
+
+def encode(samples: np.ndarray, sample_rate: int, container: str, subtype: str) -> bytes:
+    buf = io.BytesIO()
+    sf.write(buf, samples, sample_rate, format=container, subtype=subtype)
+    return buf.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Length of the test utterance")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    cases = [("16 kHz mono WAV", encode(speech_like(args.seconds, 16000, 1), 16000, "WAV", "PCM_16")),
+             ("16 kHz mono Opus", encode(speech_like(args.seconds, 16000, 1), 16000, "OGG", "OPUS"))]
+    if shutil.which("ffmpeg"):
+        cases.insert(0, ("48 kHz stereo WAV", encode(speech_like(args.seconds, 48000, 2), 48000, "WAV", "PCM_16")))
+    else:
+        print("ffmpeg not found; skipping the 48 kHz stereo baseline", file=sys.stderr)
+
+    results = []
+    for name, data in cases:
+        timings, decoder = [], None
+        for _ in range(args.runs):
+            _, decoder, decode_ms = decode_audio(data)
+            timings.append(decode_ms)
+        results.append({
+            "input": name,
+            "bytes": len(data),
+            "decoder": decoder,
+            "decode_ms_median": round(statistics.median(timings), 2),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results[0]
+    print(f"{'input':<20} {'bytes':>10} {'x smaller':>10} {'decoder':>8} {'decode ms':>10} {'x faster':>9}")
+    for r in results:
+        print(
+            f"{r['input']:<20} {r['bytes']:>10,} {baseline['bytes'] / r['bytes']:>10.1f} {r['decoder']:>8} "
+            f"{r['decode_ms_median']:>10.2f} {baseline['decode_ms_median'] / r['decode_ms_median']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
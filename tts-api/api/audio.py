@@ -0,0 +1,64 @@
+# api/audio.py
+"""
+Waveform post-processing for the TTS service: exact duration, resampling and
+container/codec encoding.
+"""
+import io
+from math import gcd
+from typing import Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+# format -> (libsndfile container, subtype, media type)
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg"),
+    "opus": ("OGG", "OPUS", "audio/ogg"),
+}
+
+# Opus only operates at these rates; anything else is resampled to the
+# nearest supported rate at or above the requested one.
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def duration_seconds(num_samples: int, sample_rate: int) -> float:
+    """Exact playback duration of ``num_samples`` mono samples."""
+    return num_samples / float(sample_rate)
+
+
+def resample(wav: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Polyphase resampling; a no-op when the rates already match."""
+    if orig_sr == target_sr:
+        return wav
+    from scipy.signal import resample_poly
+
+    factor = gcd(orig_sr, target_sr)
+    out = resample_poly(wav, target_sr // factor, orig_sr // factor)
+    return out.astype(np.float32, copy=False)
+
+
+def output_sample_rate(fmt: str, orig_sr: int, requested_sr: Optional[int]) -> int:
+    """Sample rate the encoded stream will use for ``fmt``."""
+    target = requested_sr or orig_sr
+    if fmt == "opus" and target not in OPUS_SAMPLE_RATES:
+        target = next((sr for sr in OPUS_SAMPLE_RATES if sr >= target), OPUS_SAMPLE_RATES[-1])
+    return target
+
+
+def encode(
+    wav: np.ndarray, sample_rate: int, fmt: str = "wav", target_sr: Optional[int] = None
+) -> Tuple[bytes, int, str]:
+    """
+    Resample (if needed) and encode a mono float waveform.
+
+    Returns ``(audio_bytes, sample_rate, media_type)``.
+    """
+    container, subtype, media_type = AUDIO_FORMATS[fmt]
+    out_sr = output_sample_rate(fmt, sample_rate, target_sr)
+    wav = resample(wav, sample_rate, out_sr)
+
+    buffer = io.BytesIO()
+    sf.write(buffer, np.clip(wav, -1.0, 1.0), out_sr, format=container, subtype=subtype)
+    return buffer.getvalue(), out_sr, media_type
@@ -0,0 +1,146 @@
+# api/backends.py
+"""
+Pluggable synthesis backends for the TTS service.
+
+Every backend turns text into a mono float32 waveform plus its sample rate,
+so the API layer can measure, resample and encode the audio uniformly.
+The active backend is selected through environment variables:
+
+- ``TTS_BACKEND``: ``coqui`` (default) or ``onnx``
+- ``TTS_MODEL_NAME``: Coqui model id or preset name (``tacotron2``, ``vits``, ``glow-tts``)
+- ``TTS_ONNX_MODEL_PATH`` / ``TTS_ONNX_CONFIG_PATH``: exported VITS graph and its config
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Short aliases for the Coqui models we have validated. VITS and glow-tts are
+# single-stage (or use a light vocoder) and run several times faster on CPU.
+MODEL_PRESETS = {
+    "tacotron2": "tts_models/en/ljspeech/tacotron2-DDC",
+    "vits": "tts_models/en/ljspeech/vits",
+    "glow-tts": "tts_models/en/ljspeech/glow-tts",
+}
+
+DEFAULT_MODEL_NAME = MODEL_PRESETS["tacotron2"]
+DEFAULT_WARMUP_TEXT = "Warming up the speech engine."
+
+
+class TTSBackend(ABC):
+    """Base class for synthesis backends."""
+
+    name: str = "base"
+
+    @abstractmethod
+    def load(self) -> None:
+        ...
+
+    @property
+    @abstractmethod
+    def sample_rate(self) -> int:
+        ...
+
+    @abstractmethod
+    def synthesize(
+        self, text: str, speed: Optional[float] = None, speaker: Optional[str] = None
+    ) -> Tuple[np.ndarray, int]:
+        """Return ``(waveform, sample_rate)`` for ``text``. Blocking."""
+
+    def warmup(self, text: str = DEFAULT_WARMUP_TEXT) -> float:
+        """
+        Run one throwaway synthesis so JIT compilation and allocator growth
+        happen before the first real request. Returns the elapsed seconds.
+        """
+        start = time.perf_counter()
+        self.synthesize(text)
+        return time.perf_counter() - start
+
+
+class CoquiBackend(TTSBackend):
+    """Any model from the Coqui model zoo, run through ``TTS.api.TTS``."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        self.name = MODEL_PRESETS.get(model_name, model_name)
+        self._tts = None
+
+    def load(self) -> None:
+        from TTS.api import TTS
+
+        self._tts = TTS(self.name)
+
+    @property
+    def sample_rate(self) -> int:
+        return int(self._tts.synthesizer.output_sample_rate)
+
+    def synthesize(self, text, speed=None, speaker=None):
+        kwargs = {"text": text}
+        if speed is not None:
+            kwargs["speed"] = speed
+        if speaker:
+            kwargs["speaker"] = speaker
+        wav = self._tts.tts(**kwargs)
+        return np.asarray(wav, dtype=np.float32), self.sample_rate
+
+
+class OnnxVitsBackend(TTSBackend):
+    """
+    A Coqui VITS model exported with ``Vits.export_onnx`` and executed by
+    onnxruntime. Tokenisation still uses the Coqui config, but the network
+    itself runs without torch.
+    """
+
+    def __init__(self, model_path: str, config_path: str):
+        self.name = f"onnx:{os.path.basename(model_path)}"
+        self.model_path = model_path
+        self.config_path = config_path
+        self._vits = None
+        self._sample_rate = None
+        # inference_onnx reads length_scale from the model instance, so
+        # concurrent requests with different speeds must not interleave.
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        from TTS.tts.configs.vits_config import VitsConfig
+        from TTS.tts.models.vits import Vits
+
+        config = VitsConfig()
+        config.load_json(self.config_path)
+        vits = Vits.init_from_config(config)
+        vits.load_onnx(self.model_path)
+        self._vits = vits
+        self._sample_rate = int(config.audio.sample_rate)
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    def synthesize(self, text, speed=None, speaker=None):
+        ids = self._vits.tokenizer.text_to_ids(text)
+        inputs = np.asarray(ids, dtype=np.int64)[None, :]
+        with self._lock:
+            self._vits.length_scale = 1.0 / (speed or 1.0)
+            audio = self._vits.inference_onnx(inputs)
+        return np.asarray(audio, dtype=np.float32).reshape(-1), self.sample_rate
+
+
+def create_backend(
+    backend: Optional[str] = None,
+    model_name: Optional[str] = None,
+    onnx_model_path: Optional[str] = None,
+    onnx_config_path: Optional[str] = None,
+) -> TTSBackend:
+    """Build (but do not load) the backend described by arguments or environment."""
+    backend = (backend or os.getenv("TTS_BACKEND", "coqui")).lower()
+    if backend == "coqui":
+        return CoquiBackend(model_name or os.getenv("TTS_MODEL_NAME", DEFAULT_MODEL_NAME))
+    if backend == "onnx":
+        model_path = onnx_model_path or os.getenv("TTS_ONNX_MODEL_PATH")
+        config_path = onnx_config_path or os.getenv("TTS_ONNX_CONFIG_PATH")
+        if not model_path or not config_path:
+            raise ValueError("ONNX backend requires TTS_ONNX_MODEL_PATH and TTS_ONNX_CONFIG_PATH")
+        return OnnxVitsBackend(model_path, config_path)
+    raise ValueError(f"Unknown TTS backend '{backend}' (expected 'coqui' or 'onnx')")
@@ -0,0 +1,81 @@
+# api/cache.py
+"""
+LRU cache of encoded speech, keyed by everything that changes the output
+(text, voice, speed, format, sample rate).
+
+Replies that repeat word for word, such as the LLM's template replies
+(VERBAL_RESPONSE_MODE=template) or its "didn't get that" answers, are
+synthesized once and then served without touching the model. The cache can be
+filled at startup from those templates (see TTS_PREWARM_* in main.py).
+"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+
+class CachedAudio(NamedTuple):
+    audio: bytes
+    sample_rate: int
+    media_type: str
+    duration: float
+
+
+CacheKey = Tuple[str, Optional[str], float, str, Optional[int]]
+
+
+def cache_key(text: str, voice: Optional[str], speed: Optional[float], fmt: str,
+              sample_rate: Optional[int]) -> CacheKey:
+    return (text, voice, float(speed or 1.0), fmt, sample_rate)
+
+
+class AudioCache:
+    """Bounded by entry count and by total audio bytes; ``max_entries=0`` disables it."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, CachedAudio]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._entries
+
+    def get(self, key: CacheKey) -> Optional[CachedAudio]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: CacheKey, entry: CachedAudio) -> None:
+        if not self.enabled or len(entry.audio) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.audio)
+        self._entries[key] = entry
+        self._bytes += len(entry.audio)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.audio)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,88 @@
+# api/logging_config.py
+"""
+Non-blocking logging for the TTS service.
+
+Request handlers only enqueue records (QueueHandler); a background
+QueueListener thread formats them and performs the console/file I/O, so a
+slow disk never stalls the event loop. Configuration via environment:
+
+- ``TTS_LOG_LEVEL``: root level (default ``INFO``)
+- ``TTS_LOG_FILE``: log file path (default ``tts_service.log``)
+- ``TTS_LOG_ROTATION``: ``size`` (default) or ``time``
+- ``TTS_LOG_MAX_BYTES`` / ``TTS_LOG_BACKUP_COUNT``: size rotation (10 MB, 5 files)
+- ``TTS_LOG_WHEN``: time rotation interval (default ``midnight``)
+- ``TTS_LOG_DEBUG_SAMPLE_RATE``: keep 1 in N DEBUG records (default 10; 1 keeps all)
+"""
+import itertools
+import logging
+import os
+import queue
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+
+from shato_common import CorrelationIdFilter
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] - %(message)s'
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Pass every record at INFO and above, but only 1 in ``rate`` DEBUG records."""
+
+    def __init__(self, rate: int = 10):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate == 1:
+            return True
+        return next(self._counter) % self.rate == 0
+
+
+def _file_handler() -> logging.Handler:
+    path = os.getenv("TTS_LOG_FILE", "tts_service.log")
+    backup_count = int(os.getenv("TTS_LOG_BACKUP_COUNT", "5"))
+    if os.getenv("TTS_LOG_ROTATION", "size").lower() == "time":
+        return TimedRotatingFileHandler(
+            path, when=os.getenv("TTS_LOG_WHEN", "midnight"), backupCount=backup_count
+        )
+    return RotatingFileHandler(
+        path,
+        maxBytes=int(os.getenv("TTS_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=backup_count,
+    )
+
+
+def configure_logging() -> QueueListener:
+    """
+    Install a QueueHandler on the root logger and start the background
+    listener that owns the real handlers. Returns the started listener;
+    call ``listener.stop()`` on shutdown to flush pending records.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(), _file_handler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Stamps the correlation ID on the emitting thread; the listener thread
+    # does not see the request's context
+    queue_handler.addFilter(CorrelationIdFilter())
+    queue_handler.addFilter(
+        DebugSamplingFilter(int(os.getenv("TTS_LOG_DEBUG_SAMPLE_RATE", "10")))
+    )
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, os.getenv("TTS_LOG_LEVEL", "INFO").upper(), logging.INFO))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
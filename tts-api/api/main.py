@@ -3,40 +3,24 @@ import asyncio
 import base64
 import logging
 import os
-import tempfile
-import uuid
 import time
-from typing import Optional
-from contextvars import ContextVar
+from typing import List, Optional, Tuple
+import httpx
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, ValidationError
 BaseModel.model_config = {"arbitrary_types_allowed": True}
 from .schema import SpeakRequest, SpeakResponse
-from TTS.api import TTS
-
-# Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('tts_service.log')
-    ]
-)
-
-# Context variable for correlation ID
-correlation_id_var: ContextVar[str] = ContextVar('correlation_id', default='')
+from .audio import duration_seconds, encode
+from .cache import AudioCache, CachedAudio, cache_key
+from .backends import DEFAULT_WARMUP_TEXT, create_backend
+from .logging_config import configure_logging
+from shato_common import CorrelationMiddleware, PriorityGate, get_correlation_id
+from shato_common.priority import from_headers as priority_from_headers
 
-class CorrelationIDFilter(logging.Filter):
-    def filter(self, record):
-        record.correlation_id = correlation_id_var.get('')
-        return True
-
-# Add filter to all loggers
-for handler in logging.root.handlers:
-    handler.addFilter(CorrelationIDFilter())
+# Logging goes through a QueueHandler; a background listener does the I/O
+log_listener = configure_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -57,50 +41,136 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Model selection (pretrained)
-MODEL_NAME = "tts_models/en/ljspeech/tacotron2-DDC"
+# Backend selection (TTS_BACKEND / TTS_MODEL_NAME / TTS_ONNX_* env vars)
+backend = create_backend()
+MODEL_NAME = backend.name
+
+# Warmup synthesis run once at startup (set TTS_WARMUP=false to skip)
+WARMUP_ENABLED = os.getenv("TTS_WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_TEXT = os.getenv("TTS_WARMUP_TEXT", DEFAULT_WARMUP_TEXT)
+
+# Syntheses allowed at once (the model already uses every core); waiters are
+# admitted by X-Priority, then round robin across X-Client-ID
+tts_gate = PriorityGate("tts", slots=int(os.getenv("TTS_CONCURRENCY", "1")))
+
+# Encoded audio of repeated replies (TTS_CACHE_MAX_ENTRIES=0 disables)
+audio_cache = AudioCache(
+    max_entries=int(os.getenv("TTS_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# Pre-synthesized at startup, in the background at low priority: the LLM's template
+# replies (TTS_PREWARM_URL, e.g. http://llm-service:8000/verbal_templates) and/or one
+# text per line from TTS_PREWARM_FILE. Format and rate must match what callers request.
+PREWARM_URL = os.getenv("TTS_PREWARM_URL", "")
+PREWARM_FILE = os.getenv("TTS_PREWARM_FILE", "")
+PREWARM_FORMAT = os.getenv("TTS_PREWARM_FORMAT", "wav")
+PREWARM_SAMPLE_RATE = int(os.getenv("TTS_PREWARM_SAMPLE_RATE", "0")) or None
 
-# Global TTS model instance
+# Set once the backend has loaded (and warmed up)
 tts = None
 
-# Correlation ID middleware
+# Request logging / Server-Timing middleware
 @app.middleware("http")
-async def correlation_id_middleware(request: Request, call_next):
-    # Generate or extract correlation ID
-    correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    correlation_id_var.set(correlation_id)
-    
+async def request_logging_middleware(request: Request, call_next):
     # Log request
     start_time = time.time()
-    logger.info(f"Request started: {request.method} {request.url.path}")
+    logger.info("Request started: %s %s", request.method, request.url.path)
     
     # Process request
     response = await call_next(request)
     
     # Log response
     process_time = time.time() - start_time
-    logger.info(f"Request completed: {response.status_code} in {process_time:.3f}s")
+    logger.info("Request completed: %s in %.3fs", response.status_code, process_time)
     
-    # Add correlation ID to response headers
-    response.headers["X-Correlation-ID"] = correlation_id
+    # Server-Timing: app = time in this service, compute = synthesis + encoding
+    timings = ["app;dur=%.1f" % (process_time * 1000)]
+    compute_ms = getattr(request.state, "compute_ms", None)
+    if compute_ms is not None:
+        timings.append("compute;dur=%.1f" % compute_ms)
+    response.headers["Server-Timing"] = ", ".join(timings)
     
     return response
 
+# Binds the caller's X-Correlation-ID (and traceparent) for logs and echoes it on the response.
+# Added last so it wraps the logging middleware above.
+app.add_middleware(CorrelationMiddleware)
+
 # Load model at startup (blocking)
 @app.on_event("startup")
 async def load_model():
     global tts
-    logger.info(f"Starting TTS service - Loading model: {MODEL_NAME}")
+    logger.info("Starting TTS service - Loading model: %s", MODEL_NAME)
     try:
-        tts = TTS(MODEL_NAME)
+        await asyncio.to_thread(backend.load)
         logger.info("TTS model loaded successfully")
     except Exception as e:
-        logger.error(f"Failed to load TTS model: {e}")
+        logger.error("Failed to load TTS model: %s", e)
         raise
 
+    if WARMUP_ENABLED:
+        try:
+            elapsed = await asyncio.to_thread(backend.warmup, WARMUP_TEXT)
+            logger.info("TTS warmup completed in %.3fs", elapsed)
+        except Exception as e:
+            # A failed warmup only costs first-request latency; keep serving
+            logger.warning("TTS warmup failed: %s", e)
+
+    tts = backend
+
+    if audio_cache.enabled and (PREWARM_URL or PREWARM_FILE):
+        asyncio.create_task(prewarm_cache())
+
+async def _prewarm_texts() -> List[str]:
+    texts = []
+    if PREWARM_FILE:
+        try:
+            with open(PREWARM_FILE, encoding="utf-8") as f:
+                texts += [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            logger.warning("TTS prewarm file unreadable: %s", e)
+    if PREWARM_URL:
+        # The LLM service may still be loading its model: retry for a few minutes
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            for attempt in range(30):
+                try:
+                    resp = await client.get(PREWARM_URL)
+                    resp.raise_for_status()
+                    body = resp.json()
+                    if body.get("mode") == "template":
+                        texts += body.get("static_replies", [])
+                    else:
+                        logger.info("LLM writes its own replies (mode=%s); nothing to prewarm from it", body.get("mode"))
+                    break
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.debug("TTS prewarm fetch attempt %d failed: %s", attempt + 1, e)
+                    await asyncio.sleep(10)
+            else:
+                logger.warning("TTS prewarm: %s unreachable, skipping", PREWARM_URL)
+    return list(dict.fromkeys(texts))
+
+async def prewarm_cache():
+    """Fill audio_cache with the known replies, behind any real request (priority low)."""
+    start = time.perf_counter()
+    done = 0
+    for text in await _prewarm_texts():
+        key = cache_key(text, None, 1.0, PREWARM_FORMAT, PREWARM_SAMPLE_RATE)
+        if key in audio_cache:
+            continue
+        try:
+            result, _ = await synthesize(text, None, 1.0, PREWARM_FORMAT, PREWARM_SAMPLE_RATE, "low", "prewarm")
+        except Exception as e:
+            logger.warning("TTS prewarm failed for %.50r: %s", text, e)
+            continue
+        audio_cache.put(key, result)
+        done += 1
+    logger.info("TTS prewarm cached %d replies in %.1fs", done, time.perf_counter() - start)
+
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("TTS service shutting down")
+    log_listener.stop()
 
 
 
@@ -124,15 +194,26 @@ def health_check():
         "service": "TTS Service",
         "model": MODEL_NAME,
         "model_loaded": tts is not None,
+        "warmup_enabled": WARMUP_ENABLED,
         "version": "1.0.0",
         "timestamp": time.time()
     }
 
+@app.get("/cache", response_model=dict, tags=["Health"])
+async def cache_stats():
+    """Entries, size and hit rate of the audio cache"""
+    return audio_cache.snapshot()
+
+@app.get("/queue", response_model=dict, tags=["Health"])
+async def queue_stats():
+    """Synthesis slots in use, waiters and queue wait per priority class"""
+    return tts_gate.snapshot()
+
 # Custom exception handlers
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request: Request, exc: ValidationError):
-    correlation_id = correlation_id_var.get('')
-    logger.warning(f"Validation error: {exc}")
+    correlation_id = get_correlation_id()
+    logger.warning("Validation error: %s", exc)
     return JSONResponse(
         status_code=422,
         content={
@@ -144,8 +225,8 @@ async def validation_exception_handler(request: Request, exc: ValidationError):
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    correlation_id = correlation_id_var.get('')
-    logger.warning(f"HTTP exception: {exc.status_code} - {exc.detail}")
+    correlation_id = get_correlation_id()
+    logger.warning("HTTP exception: %s - %s", exc.status_code, exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -157,8 +238,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    correlation_id = correlation_id_var.get('')
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
+    correlation_id = get_correlation_id()
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={
@@ -168,6 +249,68 @@ async def general_exception_handler(request: Request, exc: Exception):
         }
     )
 
+async def synthesize(text: str, voice: Optional[str], speed: Optional[float], fmt: str,
+                     out_rate: Optional[int], priority: str, client_id: str) -> Tuple[CachedAudio, float]:
+    """
+    Synthesize and encode ``text`` with a model slot from tts_gate.
+    Returns the audio and the compute time in ms (synthesis + encoding).
+    """
+    logger.debug("Generating audio for text: %.50r", text)
+
+    # Synthesis is synchronous/blocking — run it in a thread
+    # Timed inside the worker threads so waiting for a thread counts as queueing
+    compute_ms = 0.0
+
+    def run_tts():
+        nonlocal compute_ms
+        start = time.perf_counter()
+        try:
+            logger.debug("TTS parameters: speed=%s, speaker=%s", speed, voice)
+            return tts.synthesize(text, speed=speed, speaker=voice)
+        except Exception as e:
+            logger.error("TTS generation failed: %s", e)
+            raise
+        finally:
+            compute_ms += (time.perf_counter() - start) * 1000
+
+    def run_encode():
+        nonlocal compute_ms
+        start = time.perf_counter()
+        try:
+            return encode(wav, sample_rate, fmt, out_rate)
+        finally:
+            compute_ms += (time.perf_counter() - start) * 1000
+
+    async with tts_gate.slot(priority, client_id) as waited:
+        wav, sample_rate = await asyncio.to_thread(run_tts)
+    logger.debug("Waited %.1f ms for synthesis as %s (client %s)", waited * 1000, priority, client_id)
+
+    if wav.size == 0:
+        logger.error("Synthesized waveform is empty")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to generate audio - empty output"
+        )
+
+    # Duration comes from the model output, before any resampling
+    duration = round(duration_seconds(len(wav), sample_rate), 3)
+
+    # Resample/encode in memory (off the event loop for compressed codecs)
+    audio_bytes, out_sample_rate, media_type = await asyncio.to_thread(run_encode)
+
+    if len(audio_bytes) == 0:
+        logger.error("Generated audio file is empty")
+        raise HTTPException(
+            status_code=500,
+            detail="Generated audio is empty"
+        )
+
+    logger.info(
+        "TTS generation successful: %d bytes %s @ %d Hz, duration: %ss",
+        len(audio_bytes), fmt, out_sample_rate, duration,
+    )
+    return CachedAudio(audio_bytes, out_sample_rate, media_type, duration), compute_ms
+
 @app.post("/speak", 
           response_model=SpeakResponse, 
           tags=["TTS"],
@@ -182,8 +325,17 @@ async def general_exception_handler(request: Request, exc: Exception):
                               "correlation_id": "123e4567-e89b-12d3-a456-426614174000",
                               "audio_base64": "UklGRiQAAABXQVZFZm10IBAAAAABAAEA...",
                               "model": "tts_models/en/ljspeech/tacotron2-DDC",
+                              "format": "wav",
+                              "media_type": "audio/wav",
+                              "sample_rate": 22050,
+                              "duration_sec": 2.5,
                               "estimated_duration_sec": 2.5
                           }
+                      },
+                      "audio/*": {
+                          "schema": {"type": "string", "format": "binary"},
+                          "description": "With Accept: audio/*, the encoded audio itself; "
+                                         "metadata in X-Model, X-Sample-Rate and X-Duration-Sec"
                       }
                   }
               },
@@ -224,22 +376,25 @@ async def general_exception_handler(request: Request, exc: Exception):
                   }
               }
           })
-async def speak(req: SpeakRequest):
+async def speak(req: SpeakRequest, request: Request):
     """
-    Convert text to speech using Coqui TTS model.
+    Convert text to speech using the configured TTS backend.
     
     - **text**: Text to convert to speech (1-1000 characters)
     - **voice**: Optional voice/speaker name if supported by the model
     - **speed**: Speech speed multiplier (0.5-2.0, default: 1.0)
+    - **format**: Output encoding - wav (default), flac, mp3 or opus
+    - **sample_rate**: Optional output sample rate in Hz (e.g. 16000)
     
-    Returns base64-encoded audio data along with metadata.
+    Returns base64-encoded audio data along with metadata, or the audio bytes
+    themselves (metadata in headers) when the Accept header asks for audio/*.
     """
-    correlation_id = correlation_id_var.get('')
-    logger.info(f"TTS request received: text_length={len(req.text)}, voice={req.voice}, speed={req.speed}")
+    correlation_id = get_correlation_id()
+    logger.info("TTS request received: text_length=%d, voice=%s, speed=%s", len(req.text), req.voice, req.speed)
 
     # Enhanced validation
     if not req.text or not req.text.strip():
-        logger.warning(f"Empty text provided")
+        logger.warning("Empty text provided")
         raise HTTPException(
             status_code=400, 
             detail="Text must not be empty or contain only whitespace"
@@ -247,7 +402,7 @@ async def speak(req: SpeakRequest):
     
     # Check for invalid characters or suspicious content
     if len(req.text.strip()) < 1:
-        logger.warning(f"Text too short: '{req.text}'")
+        logger.warning("Text too short: %r", req.text)
         raise HTTPException(
             status_code=400,
             detail="Text must contain at least 1 character"
@@ -261,78 +416,52 @@ async def speak(req: SpeakRequest):
             detail="TTS service not ready - model not loaded"
         )
 
-    # Use a temp file to ask Coqui to write WAV
-    audio_path = None
+    priority, client_id = priority_from_headers(request.headers, request.client.host if request.client else "anonymous")
+    key = cache_key(req.text, req.voice, req.speed, req.format, req.sample_rate)
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpf:
-            audio_path = tmpf.name
-
-        logger.info(f"Generating audio for text: '{req.text[:50]}{'...' if len(req.text) > 50 else ''}'")
-
-        # The TTS call is synchronous/blocking — run it in a thread
-        def run_tts():
-            try:
-                kwargs = {"text": req.text, "file_path": audio_path}
-                if req.speed is not None:
-                    kwargs["speed"] = req.speed
-                if req.voice:
-                    kwargs["speaker"] = req.voice
-                
-                logger.debug(f"TTS parameters: {kwargs}")
-                tts.tts_to_file(**kwargs)
-            except Exception as e:
-                logger.error(f"TTS generation failed: {e}")
-                raise
-
-        await asyncio.to_thread(run_tts)
-
-        # Verify audio file was created and has content
-        if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-            logger.error("Audio file was not created or is empty")
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to generate audio - empty output"
+        cached = audio_cache.get(key)
+        if cached is not None:
+            logger.info("TTS cache hit: %d bytes %s", len(cached.audio), req.format)
+            result = cached
+        else:
+            result, request.state.compute_ms = await synthesize(
+                req.text, req.voice, req.speed, req.format, req.sample_rate, priority, client_id
             )
-
-        # Read audio bytes
-        with open(audio_path, "rb") as f:
-            audio_bytes = f.read()
-
-        if len(audio_bytes) == 0:
-            logger.error("Generated audio file is empty")
-            raise HTTPException(
-                status_code=500,
-                detail="Generated audio is empty"
+            audio_cache.put(key, result)
+
+        # Raw audio: no base64 (+33%) and no JSON to build or parse on either side
+        if "audio/" in request.headers.get("accept", ""):
+            return Response(
+                content=result.audio,
+                media_type=result.media_type,
+                headers={
+                    "X-Model": MODEL_NAME,
+                    "X-Sample-Rate": str(result.sample_rate),
+                    "X-Duration-Sec": str(result.duration),
+                    "X-Cache": "hit" if cached is not None else "miss",
+                },
             )
 
-        audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
-
-        # Estimate duration more accurately
-        estimated_duration = round(len(req.text) / 12.0 / (req.speed or 1.0), 2)
-
-        logger.info(f"TTS generation successful: {len(audio_bytes)} bytes, estimated duration: {estimated_duration}s")
+        audio_b64 = base64.b64encode(result.audio).decode("utf-8")
 
         return SpeakResponse(
             correlation_id=correlation_id,
             audio_base64=audio_b64,
             model=MODEL_NAME,
-            estimated_duration_sec=estimated_duration
+            format=req.format,
+            media_type=result.media_type,
+            sample_rate=result.sample_rate,
+            duration_sec=result.duration,
+            estimated_duration_sec=result.duration,
+            cached=cached is not None,
         )
 
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        logger.error(f"Unexpected error during TTS generation: {e}", exc_info=True)
+        logger.error("Unexpected error during TTS generation: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"TTS generation failed: {str(e)}"
         )
-    finally:
-        # Cleanup temp file
-        if audio_path and os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-                logger.debug(f"Cleaned up temp file: {audio_path}")
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temp file {audio_path}: {e}")
@@ -1,6 +1,6 @@
 # api/schema.py
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Literal, Optional
 
 
 class SpeakRequest(BaseModel):
@@ -23,6 +23,18 @@ class SpeakRequest(BaseModel):
         description="Speech speed multiplier (0.5 = slow, 1.0 = normal, 2.0 = fast)",
         example=1.0
     )
+    format: Literal["wav", "flac", "mp3", "opus"] = Field(
+        "wav",
+        description="Output encoding: uncompressed WAV, lossless FLAC, or lossy MP3/Opus",
+        example="opus"
+    )
+    sample_rate: Optional[int] = Field(
+        None,
+        ge=8000,
+        le=48000,
+        description="Resample output to this rate in Hz (e.g. 16000 for the robot speaker); model rate if omitted",
+        example=16000
+    )
 
     @validator('text')
     def validate_text(cls, v):
@@ -35,7 +47,9 @@ class SpeakRequest(BaseModel):
             "example": {
                 "text": "Hello, Made In Alexandria! Welcome to our TTS service.",
                 "voice": "female",
-                "speed": 1.0
+                "speed": 1.0,
+                "format": "opus",
+                "sample_rate": 16000
             }
         }
 
@@ -48,7 +62,7 @@ class SpeakResponse(BaseModel):
     )
     audio_base64: str = Field(
         ..., 
-        description="Base64-encoded audio data (WAV format)",
+        description="Base64-encoded audio data in the requested format",
         example="UklGRiQAAABXQVZFZm10IBAAAAABAAEA..."
     )
     model: str = Field(
@@ -56,11 +70,36 @@ class SpeakResponse(BaseModel):
         description="TTS model used for generation",
         example="tts_models/en/ljspeech/tacotron2-DDC"
     )
+    format: str = Field(
+        "wav",
+        description="Encoding of audio_base64 (wav, flac, mp3 or opus)",
+        example="wav"
+    )
+    media_type: str = Field(
+        "audio/wav",
+        description="MIME type of the decoded audio",
+        example="audio/wav"
+    )
+    sample_rate: Optional[int] = Field(
+        None,
+        description="Sample rate of the encoded audio in Hz",
+        example=22050
+    )
+    duration_sec: Optional[float] = Field(
+        None,
+        description="Exact duration of the generated audio in seconds, from the sample count",
+        example=2.5
+    )
     estimated_duration_sec: Optional[float] = Field(
         None, 
-        description="Estimated duration of the generated audio in seconds",
+        description="Deprecated alias of duration_sec, kept for existing clients",
         example=2.5
     )
+    cached: bool = Field(
+        False,
+        description="True when the audio came from the cache instead of the model",
+        example=False
+    )
 
     class Config:
         schema_extra = {
@@ -68,6 +107,10 @@ class SpeakResponse(BaseModel):
                 "correlation_id": "123e4567-e89b-12d3-a456-426614174000",
                 "audio_base64": "UklGRiQAAABXQVZFZm10IBAAAAABAAEA...",
                 "model": "tts_models/en/ljspeech/tacotron2-DDC",
+                "format": "wav",
+                "media_type": "audio/wav",
+                "sample_rate": 22050,
+                "duration_sec": 2.5,
                 "estimated_duration_sec": 2.5
             }
         }
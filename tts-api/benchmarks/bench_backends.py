@@ -0,0 +1,104 @@
+"""
+Real-time-factor benchmark for the TTS backends.
+
+RTF = synthesis wall time / duration of the produced audio. Values below 1.0
+mean the backend speaks faster than real time.
+
+Usage (from the tts-api directory):
+    python benchmarks/bench_backends.py
+    python benchmarks/bench_backends.py --backend coqui:vits --backend coqui:glow-tts
+    python benchmarks/bench_backends.py --backend onnx:/models/vits.onnx:/models/config.json --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from api.backends import create_backend  # noqa: E402
+
+DEFAULT_BACKENDS = ["coqui:tacotron2", "coqui:vits", "coqui:glow-tts"]
+DEFAULT_SENTENCES = [
+    "On my way to that spot, shouldn't take long!",
+    "Spinning into position, hold tight!",
+    "Starting the bedroom rounds at a gentle pace. Back soon!",
+]
+
+
+def build(spec: str):
+    """Parse ``coqui:<model>`` or ``onnx:<model_path>:<config_path>`` into a backend."""
+    kind, _, rest = spec.partition(":")
+    if kind == "coqui":
+        return create_backend("coqui", model_name=rest or None)
+    if kind == "onnx":
+        model_path, _, config_path = rest.partition(":")
+        return create_backend("onnx", onnx_model_path=model_path, onnx_config_path=config_path)
+    raise ValueError(f"Unsupported backend spec '{spec}'")
+
+
+def bench(spec: str, sentences, runs: int) -> dict:
+    backend = build(spec)
+
+    start = time.perf_counter()
+    backend.load()
+    load_sec = time.perf_counter() - start
+    warmup_sec = backend.warmup()
+
+    rtfs = []
+    latencies = []
+    for _ in range(runs):
+        for text in sentences:
+            start = time.perf_counter()
+            wav, sample_rate = backend.synthesize(text)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            rtfs.append(elapsed / (len(wav) / sample_rate))
+
+    return {
+        "backend": spec,
+        "model": backend.name,
+        "load_sec": round(load_sec, 3),
+        "warmup_sec": round(warmup_sec, 3),
+        "mean_latency_sec": round(statistics.mean(latencies), 3),
+        "mean_rtf": round(statistics.mean(rtfs), 3),
+        "median_rtf": round(statistics.median(rtfs), 3),
+        "samples": len(rtfs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", help="Backend spec; may be repeated")
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the sentence set per backend")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for spec in args.backend or DEFAULT_BACKENDS:
+        try:
+            results.append(bench(spec, DEFAULT_SENTENCES, args.runs))
+        except Exception as e:
+            results.append({"backend": spec, "error": str(e)})
+
+    print(f"{'backend':<28} {'load s':>8} {'warmup s':>9} {'latency s':>10} {'RTF':>7}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<28} error: {r['error']}")
+            continue
+        print(
+            f"{r['backend']:<28} {r['load_sec']:>8} {r['warmup_sec']:>9} "
+            f"{r['mean_latency_sec']:>10} {r['mean_rtf']:>7}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
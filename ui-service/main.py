@@ -1,10 +1,18 @@
 import gradio as gr
-import requests
+import httpx
+import asyncio
 import base64
-import uuid
+import io
+import json
 import os
+from pathlib import Path
+
+import librosa
+import numpy as np
+import soundfile as sf
 
 import gradio_client.utils as gu
+from shato_common import bind, outgoing_headers
 
 # --- PATCH for Gradio's JSON Schema bug ---
 _original_json_schema_to_python_type = gu._json_schema_to_python_type
@@ -19,56 +27,167 @@ gu._json_schema_to_python_type = _patched_json_schema_to_python_type
 # Orchestrator API URL
 ORCHESTRATOR_URL = os.getenv(
     "ORCHESTRATOR_URL",
-    "ORCHESTRATOR_URL=http://orchestrator:8500/voice_flow"  
+    "http://orchestrator:8500/voice_flow"
 )
+# NDJSON variant of the voice flow that reports each stage as it finishes
+ORCHESTRATOR_STREAM_URL = os.getenv("ORCHESTRATOR_STREAM_URL", f"{ORCHESTRATOR_URL}/stream")
+
+# The full voice flow includes LLM generation, so the read timeout is generous;
+# connecting should be quick or the orchestrator is down.
+REQUEST_TIMEOUT_SEC = float(os.getenv("UI_REQUEST_TIMEOUT_SEC", "120"))
+CONNECT_TIMEOUT_SEC = float(os.getenv("UI_CONNECT_TIMEOUT_SEC", "5"))
+MAX_CONNECTIONS = int(os.getenv("UI_MAX_CONNECTIONS", "64"))
+
+# Gradio queue: events processed at once, and how many may wait
+CONCURRENCY_LIMIT = int(os.getenv("UI_CONCURRENCY_LIMIT", "32"))
+QUEUE_MAX_SIZE = int(os.getenv("UI_QUEUE_MAX_SIZE", "256"))
+
+# Microphone captures are often 48 kHz stereo; Whisper only needs 16 kHz mono.
+# "wav" (16-bit PCM, cheapest to decode) or "opus" (OGG/Opus, ~8x fewer bytes again) at
+# UPLOAD_SAMPLE_RATE; "original" sends the file untouched.
+UPLOAD_FORMAT = os.getenv("UI_UPLOAD_FORMAT", "wav")
+UPLOAD_SAMPLE_RATE = int(os.getenv("UI_UPLOAD_SAMPLE_RATE", "16000"))
+UPLOAD_ENCODINGS = {
+    "opus": ("OGG", "OPUS", ".ogg", "audio/ogg"),
+    "wav": ("WAV", "PCM_16", ".wav", "audio/wav"),
+}
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """One pooled client for all sessions, created on Gradio's event loop."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
 
 
-def process_audio(file_path):
+def prepare_upload(file_path: str) -> tuple[str, bytes, str]:
     """
-    Sends the recorded/uploaded audio to the Orchestrator API
-    and returns transcription text and/or TTS audio.
+    Downmix and resample the captured audio and encode it compactly.
+    Returns the (filename, bytes, content_type) multipart tuple for the orchestrator.
     """
-    if not file_path:
-        return "⚠️ Please upload or record an audio file first.", None
+    if UPLOAD_FORMAT not in UPLOAD_ENCODINGS:
+        return Path(file_path).name, Path(file_path).read_bytes(), "application/octet-stream"
+    samples, sample_rate = librosa.load(file_path, sr=None, mono=False)
+    samples = librosa.to_mono(samples)
+    if sample_rate != UPLOAD_SAMPLE_RATE:
+        samples = librosa.resample(samples, orig_sr=sample_rate, target_sr=UPLOAD_SAMPLE_RATE)
+    container, subtype, suffix, content_type = UPLOAD_ENCODINGS[UPLOAD_FORMAT]
+    buf = io.BytesIO()
+    sf.write(buf, samples, UPLOAD_SAMPLE_RATE, format=container, subtype=subtype)
+    return f"input_audio{suffix}", buf.getvalue(), content_type
 
-    try:
-        with open(file_path, "rb") as f:
-            files = {"audio": ("input_audio.wav", f, "audio/wav")}
-            headers = {"id_correlation": str(uuid.uuid4())}
 
-            resp = requests.post(ORCHESTRATOR_URL, files=files, headers=headers)
+def decode_audio(audio_bytes: bytes) -> tuple[int, np.ndarray]:
+    """Decode TTS bytes (wav/flac/mp3/ogg-opus) to Gradio's in-memory (sample_rate, samples) form."""
+    data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype="int16")
+    return sample_rate, data
+
 
-        if not resp.ok:
-            return f"❌ Error {resp.status_code}: {resp.text}", None
+STAGE_LABELS = {"stt": "Transcription", "llm": "Command", "validator": "Validation", "tts": "Speech"}
 
-        try:
-            data = resp.json()
-        except ValueError:
-            return "❌ Invalid JSON response from Orchestrator", None
 
-        # --- Extract pipeline outputs ---
-        transcription = None
-        tts_audio_path = None
+def format_timings(timings: list[tuple[str, float]], total_ms: float | None = None) -> str:
+    """Markdown table of per-stage latency."""
+    if not timings:
+        return ""
+    rows = ["| Stage | ms |", "| --- | ---: |"]
+    rows += [f"| {STAGE_LABELS.get(stage, stage)} | {ms:.0f} |" for stage, ms in timings]
+    if total_ms is not None:
+        rows.append(f"| **Total** | **{total_ms:.0f}** |")
+    return "\n".join(rows)
 
-        # STT
-        if "stt" in data and "text" in data["stt"]:
-            transcription = data["stt"]["text"]
 
-        # TTS audio
-        if "tts" in data and "audio_base64" in data["tts"]:
-            audio_bytes = base64.b64decode(data["tts"]["audio_base64"])
-            tts_audio_path = "tts_output.wav"
-            with open(tts_audio_path, "wb") as out_f:
-                out_f.write(audio_bytes)
+def format_validation(data: dict) -> str:
+    execution = data.get("execution") or {}
+    status = f"✅ {data.get('message', 'Command validated')}"
+    if execution:
+        status += f" (execution {execution.get('status', 'queued')})"
+    return status
+
+
+async def process_audio(file_path):
+    """
+    Streams the recorded/uploaded audio through the Orchestrator and yields
+    (transcription, command, validation, timings, audio) after every stage,
+    so each output appears as soon as its stage completes.
+    """
+    transcription, command, validation, timings, tts_audio = None, None, None, [], None
+
+    def outputs(total_ms=None):
+        return transcription, command, validation, format_timings(timings, total_ms), tts_audio
 
-        return transcription or "⚠️ No transcription available", tts_audio_path
+    if not file_path:
+        transcription = "⚠️ Please upload or record an audio file first."
+        yield outputs()
+        return
 
+    try:
+        files = {"audio": await asyncio.to_thread(prepare_upload, file_path)}
+        # One correlation ID / trace per voice turn, followed through every service
+        bind()
+        headers = outgoing_headers()
+
+        async with get_client().stream("POST", ORCHESTRATOR_STREAM_URL, files=files, headers=headers) as resp:
+            if not resp.is_success:
+                body = (await resp.aread()).decode(errors="replace")
+                transcription = f"❌ Error {resp.status_code}: {body}"
+                yield outputs()
+                return
+
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    transcription = transcription or "❌ Invalid response from Orchestrator"
+                    break
+                stage, data = event.get("stage"), event.get("data") or {}
+
+                if event.get("status") == "error":
+                    message = f"❌ {STAGE_LABELS.get(stage, stage)} failed: {event['error']['message']}"
+                    if stage == "validator":
+                        validation = message
+                    else:
+                        transcription = transcription or message
+                        validation = validation or message
+                    yield outputs(event.get("total_ms"))
+                    return
+
+                if stage == "done":
+                    yield outputs(event.get("total_ms"))
+                    return
+
+                timings.append((stage, event.get("elapsed_ms", 0.0)))
+                if stage == "stt":
+                    transcription = data.get("text") or "⚠️ No transcription available"
+                elif stage == "llm":
+                    command = {"command": data.get("command"), "command_params": data.get("command_params")}
+                elif stage == "validator":
+                    validation = format_validation(data)
+                elif stage == "tts" and "audio_base64" in data:
+                    # Kept in memory so concurrent sessions never share a file
+                    tts_bytes = base64.b64decode(data["audio_base64"])
+                    tts_audio = await asyncio.to_thread(decode_audio, tts_bytes)
+                yield outputs(event.get("total_ms"))
+
+    except httpx.TimeoutException:
+        transcription = transcription or f"❌ Orchestrator timed out after {REQUEST_TIMEOUT_SEC:.0f}s"
+        yield outputs()
     except Exception as e:
-        return f"❌ Connection error: {e}", None
+        transcription = transcription or f"❌ Connection error: {e}"
+        yield outputs()
 
 
 # --- Build Gradio Interface ---
-with gr.Blocks() as demo:
+# Gradio caches returned audio as files; drop entries older than an hour, checked hourly
+with gr.Blocks(delete_cache=(3600, 3600)) as demo:
     gr.Markdown("## 🎙️ SHATO Robot")
     gr.Markdown("Upload or record your **voice command** and let SHATO process it end-to-end.")
 
@@ -81,17 +200,28 @@ with gr.Blocks() as demo:
 
     with gr.Row():
         trans_output = gr.Textbox(label="📝 Transcription")
-        tts_output = gr.Audio(label="🔊 TTS Output", type="filepath")
+        command_output = gr.JSON(label="🤖 Command")
+
+    with gr.Row():
+        validation_output = gr.Textbox(label="🛡️ Validation")
+        timing_output = gr.Markdown(label="⏱️ Stage timings")
+
+    with gr.Row():
+        tts_output = gr.Audio(label="🔊 TTS Output", type="numpy")
 
     submit_btn = gr.Button("🚀 Send to Orchestrator")
 
     submit_btn.click(
         fn=process_audio,
         inputs=audio_input,
-        outputs=[trans_output, tts_output]
+        outputs=[trans_output, command_output, validation_output, timing_output, tts_output]
     )
 
 
+# Async handlers share the event loop, so the limit bounds in-flight orchestrator calls
+demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
+
+
 # Launch the app
 if __name__ == "__main__":
     demo.launch(